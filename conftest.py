@@ -0,0 +1,19 @@
+"""
+Shared pytest fixtures.
+"""
+import pytest
+from django.core.cache import cache
+from edx_django_utils.cache import RequestCache
+
+from sanctions.apps.core.cache import ProcessCache
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Clear the process caches and cached lookups that tests don't expect to outlive their database rows.
+    """
+    ProcessCache.clear_all()
+    RequestCache.clear_all_namespaces()
+    cache.clear()
+    yield
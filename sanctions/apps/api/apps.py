@@ -0,0 +1,15 @@
+"""
+API app config
+"""
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    """
+    Application configuration for the API.
+    """
+    name = 'sanctions.apps.api'
+
+    def ready(self):
+        # Connect the receivers invalidating the cached users of JWTs
+        from sanctions.apps.api import authentication  # pylint: disable=import-outside-toplevel,unused-import
@@ -0,0 +1,121 @@
+"""
+Authentication classes of the API.
+"""
+import copy
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.encoding import force_bytes
+from edx_django_utils.cache import TieredCache
+from edx_django_utils.monitoring import set_custom_attribute
+from edx_rest_framework_extensions.auth.jwt.authentication import JwtAuthentication
+
+from sanctions.apps.core.cache import ProcessCache
+
+# Claims of the JWTs verified by this process, keyed by the digest of the token
+jwt_claims_cache = ProcessCache(
+    'jwt_claims', timeout=settings.JWT_CLAIMS_CACHE_TIMEOUT, max_size=settings.JWT_CLAIMS_CACHE_SIZE
+)
+# Users resolved from the claims of JWTs, keyed by get_jwt_user_cache_key, along with the claims they were
+# resolved from
+jwt_users_cache = ProcessCache(
+    'jwt_users', timeout=settings.JWT_USER_CACHE_TIMEOUT, max_size=settings.JWT_USER_CACHE_SIZE
+)
+
+
+def get_jwt_user_cache_key(username):
+    """
+    Return the key of the user with the given username, in jwt_users_cache and the shared Django cache.
+    """
+    return f'sanctions.jwt_user.{hashlib.sha256(force_bytes(username)).hexdigest()}'
+
+
+class CachedJwtAuthentication(JwtAuthentication):
+    """
+    JwtAuthentication verifying each token once per process.
+
+    Only a few services call the API, reusing their tokens until they expire, so the claims of a verified token
+    are cached until the token expires, or for JWT_CLAIMS_CACHE_TIMEOUT seconds if that's sooner. Tokens that fail
+    verification are never cached, and the blacklist is still checked on every request.
+
+    The user the claims resolve to is cached too, in this process and in the shared Django cache, for
+    JWT_USER_CACHE_TIMEOUT seconds. Saving or deleting the user drops it from the shared cache and from the
+    cache of the process doing it.
+    """
+
+    @classmethod
+    def jwt_decode_token(cls, token):  # pylint: disable=arguments-differ
+        """
+        Return the claims of the token, verifying it unless it was verified already.
+        """
+        key = hashlib.sha256(force_bytes(token)).hexdigest()
+        cached_response = jwt_claims_cache.get_cached_response(key)
+        if cached_response.is_found:
+            # .. custom_attribute_name: jwt_claims_cache
+            # .. custom_attribute_description: 'hit' if the claims of the request's JWT were cached by this
+            #      process, 'miss' if the JWT was verified.
+            set_custom_attribute('jwt_claims_cache', 'hit')
+            return dict(cached_response.value)
+
+        set_custom_attribute('jwt_claims_cache', 'miss')
+        payload = super().jwt_decode_token(token)
+        timeout = settings.JWT_CLAIMS_CACHE_TIMEOUT
+        if 'exp' in payload:
+            timeout = min(timeout, payload['exp'] - time.time())
+        if timeout > 0:
+            jwt_claims_cache.set(key, dict(payload), timeout)
+        return payload
+
+    def authenticate_credentials(self, payload):
+        """
+        Return the user of the claims, getting or creating it unless it was resolved from the same claims already.
+        """
+        username = self._get_username_from_payload(payload)
+        if username is None:
+            return super().authenticate_credentials(payload)
+
+        key = get_jwt_user_cache_key(username)
+        # The user attributes that the claims set, as a different value updates the user
+        claims = tuple(payload.get(claim) for claim in self.get_jwt_claim_attribute_map())
+
+        cached_response = jwt_users_cache.get_cached_response(key)
+        if not cached_response.is_found:
+            cached_response = TieredCache.get_cached_response(key)
+            if cached_response.is_found:
+                jwt_users_cache.set(key, cached_response.value)
+        if cached_response.is_found and cached_response.value[0] == claims:
+            # .. custom_attribute_name: jwt_user_cache
+            # .. custom_attribute_description: 'hit' if the user of the request's JWT was cached, 'miss' if it
+            #      was read from the database.
+            set_custom_attribute('jwt_user_cache', 'hit')
+            return copy.copy(cached_response.value[1])
+
+        set_custom_attribute('jwt_user_cache', 'miss')
+        user = super().authenticate_credentials(payload)
+        TieredCache.set_all_tiers(key, (claims, user), settings.JWT_USER_CACHE_TIMEOUT)
+        jwt_users_cache.set(key, (claims, user))
+        return copy.copy(user)
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid='invalidate_jwt_user_cache_on_save')
+@receiver(post_delete, sender=get_user_model(), dispatch_uid='invalidate_jwt_user_cache_on_delete')
+def invalidate_jwt_user_cache(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Drop a saved or deleted user from the shared Django cache and from the cache of this process.
+
+    The user is dropped once the transaction saving it commits: dropped earlier, a concurrent request could cache
+    the user again as it was before the change. Other processes may use their cached copy of the user for up to
+    JWT_USER_CACHE_TIMEOUT seconds.
+    """
+    key = get_jwt_user_cache_key(instance.username)
+
+    def delete_cached_user():
+        jwt_users_cache.delete(key)
+        TieredCache.delete_all_tiers(key)
+
+    transaction.on_commit(delete_cached_user)
@@ -0,0 +1,17 @@
+"""
+Pagination classes of the API.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class SanctionsCheckFailureCursorPagination(CursorPagination):
+    """
+    Keyset pagination of sanctions check failures, newest first.
+
+    Unlike page numbers or offsets, the cursor is the position of the last failure returned, so that each page
+    is read from the (created) indexes of SanctionsCheckFailure however deep it is.
+    """
+    ordering = ('-created', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -0,0 +1,32 @@
+"""
+Renderers of the API.
+"""
+import json
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+
+class JSONLinesRenderer(renderers.BaseRenderer):
+    """
+    Render a list as JSON Lines, one JSON object per line, and anything else (e.g. errors) as a single line.
+
+    Views supporting it stream their results line by line rather than rendering them with the renderer, see
+    SanctionsCheckFailureReportView.
+    """
+    media_type = 'application/jsonl'
+    format = 'jsonl'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return b''.join(self.render_line(item) for item in items)
+
+    @staticmethod
+    def render_line(item):
+        """
+        Render an item as one line of JSON.
+        """
+        return json.dumps(item, cls=encoders.JSONEncoder, ensure_ascii=False).encode('utf-8') + b'\n'
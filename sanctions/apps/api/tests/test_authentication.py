@@ -0,0 +1,143 @@
+"""
+Tests for the API authentication classes.
+"""
+import time
+from unittest import mock
+
+import jwt
+from django.test import TestCase
+from django.test.utils import override_settings
+from edx_django_utils.cache import TieredCache
+from edx_rest_framework_extensions.auth.jwt.tests.utils import generate_jwt_token, generate_unversioned_payload
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from sanctions.apps.api.authentication import (
+    CachedJwtAuthentication,
+    get_jwt_user_cache_key,
+    jwt_claims_cache,
+    jwt_users_cache
+)
+from sanctions.apps.core.tests.factories import UserFactory
+
+
+@mock.patch('sanctions.apps.api.authentication.JwtAuthentication.jwt_decode_token')
+class CachedJwtAuthenticationDecodeTests(TestCase):
+    """
+    Tests for CachedJwtAuthentication.jwt_decode_token.
+    """
+    def test_verifies_token_once(self, mock_decode):
+        mock_decode.return_value = {'preferred_username': 'ecommerce_worker', 'exp': time.time() + 3600}
+
+        self.assertEqual(CachedJwtAuthentication.jwt_decode_token('token'), mock_decode.return_value)
+        self.assertEqual(CachedJwtAuthentication.jwt_decode_token('token'), mock_decode.return_value)
+
+        mock_decode.assert_called_once_with('token')
+        self.assertEqual((jwt_claims_cache.stats['hits'], jwt_claims_cache.stats['misses']), (1, 1))
+
+    def test_caches_until_expiry(self, mock_decode):
+        mock_decode.return_value = {'preferred_username': 'ecommerce_worker', 'exp': time.time() + 10}
+
+        with mock.patch('sanctions.apps.core.cache.time.monotonic', return_value=1000):
+            CachedJwtAuthentication.jwt_decode_token('token')
+        with mock.patch('sanctions.apps.core.cache.time.monotonic', return_value=1011):
+            CachedJwtAuthentication.jwt_decode_token('token')
+
+        self.assertEqual(mock_decode.call_count, 2)
+
+    @override_settings(JWT_CLAIMS_CACHE_TIMEOUT=0)
+    def test_disabled(self, mock_decode):
+        mock_decode.return_value = {'preferred_username': 'ecommerce_worker', 'exp': time.time() + 3600}
+
+        CachedJwtAuthentication.jwt_decode_token('token')
+        CachedJwtAuthentication.jwt_decode_token('token')
+
+        self.assertEqual(mock_decode.call_count, 2)
+
+    def test_invalid_token_is_not_cached(self, mock_decode):
+        mock_decode.side_effect = jwt.DecodeError
+        request = APIRequestFactory().post('/api/v1/sdn-check/', HTTP_AUTHORIZATION='JWT token')
+
+        for _ in range(2):
+            with self.assertRaises(AuthenticationFailed):
+                CachedJwtAuthentication().authenticate(request)
+
+        self.assertEqual(mock_decode.call_count, 2)
+        self.assertEqual(jwt_claims_cache.stats['size'], 0)
+
+
+class CachedJwtAuthenticationTests(TestCase):
+    """
+    Tests for CachedJwtAuthentication.authenticate.
+    """
+    @mock.patch('sanctions.apps.api.authentication.set_custom_attribute')
+    def test_authenticate(self, mock_set_custom_attribute):
+        user = UserFactory()
+        token = generate_jwt_token(generate_unversioned_payload(user))
+        request = APIRequestFactory().post('/api/v1/sdn-check/', HTTP_AUTHORIZATION=f'JWT {token}')
+
+        self.assertEqual(CachedJwtAuthentication().authenticate(request), (user, token))
+        self.assertEqual(CachedJwtAuthentication().authenticate(request), (user, token))
+
+        mock_set_custom_attribute.assert_has_calls([
+            mock.call('jwt_claims_cache', 'miss'), mock.call('jwt_user_cache', 'miss'),
+            mock.call('jwt_claims_cache', 'hit'), mock.call('jwt_user_cache', 'hit'),
+        ])
+
+    def test_user_is_cached(self):
+        user = UserFactory()
+        request = APIRequestFactory().post(
+            '/api/v1/sdn-check/', HTTP_AUTHORIZATION=f'JWT {generate_jwt_token(generate_unversioned_payload(user))}'
+        )
+        CachedJwtAuthentication().authenticate(request)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedJwtAuthentication().authenticate(request)[0], user)
+
+    def test_user_is_shared_between_processes(self):
+        user = UserFactory()
+        payload = generate_unversioned_payload(user)
+        CachedJwtAuthentication().authenticate_credentials(payload)
+        # As if another process was authenticating the user
+        jwt_users_cache.clear()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedJwtAuthentication().authenticate_credentials(payload), user)
+
+    def test_saving_user_invalidates_cache(self):
+        user = UserFactory(is_active=True)
+        payload = generate_unversioned_payload(user)
+        CachedJwtAuthentication().authenticate_credentials(payload)
+
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user.save()
+            # Until the change is committed, requests authenticate the user as it was
+            self.assertTrue(TieredCache.get_cached_response(get_jwt_user_cache_key(user.username)).is_found)
+        self.assertTrue(callbacks)
+
+        self.assertFalse(TieredCache.get_cached_response(get_jwt_user_cache_key(user.username)).is_found)
+        self.assertFalse(CachedJwtAuthentication().authenticate_credentials(payload).is_active)
+
+    def test_changed_claims_update_user(self):
+        user = UserFactory(is_staff=False)
+        payload = generate_unversioned_payload(user)
+        CachedJwtAuthentication().authenticate_credentials(payload)
+
+        payload['administrator'] = True
+
+        self.assertTrue(CachedJwtAuthentication().authenticate_credentials(payload).is_staff)
+        user.refresh_from_db()
+        self.assertTrue(user.is_staff)
+
+    def test_expired_token(self):
+        user = UserFactory()
+        payload = generate_unversioned_payload(user)
+        payload['exp'] = int(time.time()) - 60
+        request = APIRequestFactory().post(
+            '/api/v1/sdn-check/', HTTP_AUTHORIZATION=f'JWT {generate_jwt_token(payload)}'
+        )
+
+        with self.assertRaises(AuthenticationFailed):
+            CachedJwtAuthentication().authenticate(request)
+        self.assertEqual(jwt_claims_cache.stats['size'], 0)
@@ -0,0 +1,54 @@
+"""
+API v1 serializers.
+"""
+from rest_framework import serializers
+
+from sanctions.apps.sanctions.models import SanctionsCheckFailure
+
+
+class SanctionsCheckFailureSerializer(serializers.ModelSerializer):
+    """
+    Serializer of the sanctions check failures reported to compliance.
+    """
+
+    class Meta:
+        model = SanctionsCheckFailure
+        fields = (
+            'id', 'created', 'modified', 'full_name', 'username', 'lms_user_id', 'city', 'country', 'sanctions_type',
+            'system_identifier', 'metadata', 'sanctions_response', 'occurrence_count', 'last_seen',
+            'repeated_order_identifiers',
+        )
+        read_only_fields = fields
+
+
+class SanctionsCheckFailureFilterSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """
+    Validates the filters of the sanctions check failures report, from the query parameters.
+    """
+    created_after = serializers.DateTimeField(required=False, help_text='Failures created at or after (ISO 8601)')
+    created_before = serializers.DateTimeField(required=False, help_text='Failures created before (ISO 8601)')
+    system_identifier = serializers.CharField(required=False)
+    country = serializers.CharField(required=False, min_length=2, max_length=2)
+    lms_user_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if 'created_after' in attrs and 'created_before' in attrs and attrs['created_after'] >= attrs['created_before']:
+            raise serializers.ValidationError('created_after must be before created_before.')
+        return attrs
+
+    def filter_queryset(self, queryset):
+        """
+        Filter the sanctions check failures with the validated filters.
+        """
+        filters = self.validated_data
+        if 'created_after' in filters:
+            queryset = queryset.filter(created__gte=filters['created_after'])
+        if 'created_before' in filters:
+            queryset = queryset.filter(created__lt=filters['created_before'])
+        if 'system_identifier' in filters:
+            queryset = queryset.filter(system_identifier=filters['system_identifier'])
+        if 'country' in filters:
+            queryset = queryset.filter(country=filters['country'].upper())
+        if 'lms_user_id' in filters:
+            queryset = queryset.filter(lms_user_id=filters['lms_user_id'])
+        return queryset
@@ -2,13 +2,18 @@
 Tests for Sanctions API v1 views.
 """
 import json
+from datetime import timedelta
 from unittest import mock
 
 from django.db.utils import OperationalError
+from django.test.utils import override_settings
+from django.utils import timezone
 from requests.exceptions import HTTPError
 from rest_framework.reverse import reverse
 
 from sanctions.apps.sanctions.models import SanctionsCheckFailure
+from sanctions.apps.sanctions.tests.factories import SanctionsCheckFailureFactory, SDNFallbackMetadataFactory
+from sanctions.apps.sanctions.utils import record_sanctions_check_failure
 from test_utils import APITest
 
 
@@ -92,6 +97,36 @@ class TestSDNCheckView(APITest):
         assert failure_record.metadata == {}
         assert failure_record.sanctions_response == {'total': 4}
 
+    @override_settings(SANCTIONS_CHECK_FAILURE_DEDUPLICATION_WINDOW=3600)
+    @mock.patch('sanctions.apps.api_client.sdn_client.SDNClient.search')
+    def test_sdn_check_repeated_hits_are_counted(self, mock_search):
+        mock_search.return_value = {'total': 4}
+        self.set_jwt_cookie(self.user.id)
+
+        responses = [
+            self.client.post(self.url, content_type='application/json', data=json.dumps(self.post_data))
+            for _ in range(3)
+        ]
+
+        failure = SanctionsCheckFailure.objects.get()
+        assert [response.json()['sanctions_check_failure_id'] for response in responses] == [failure.id] * 3
+        assert failure.occurrence_count == 3
+
+    @mock.patch('sanctions.apps.api_client.sdn_client.SDNClient.search')
+    def test_sdn_check_without_hit_makes_no_queries(self, mock_search):
+        """ Once the caller's token and user are cached, a check without a hit doesn't touch the database. """
+        mock_search.return_value = {'total': 0}
+        # Service callers have no session
+        self.client.logout()
+        self.set_jwt_cookie(self.user.id)
+        self.client.post(self.url, content_type='application/json', data=json.dumps(self.post_data))
+
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, content_type='application/json', data=json.dumps(self.post_data))
+
+        assert response.status_code == 200
+        assert response.json()['hit_count'] == 0
+
     @mock.patch('sanctions.apps.api.v1.views.SanctionsCheckFailure.objects.create')
     @mock.patch('sanctions.apps.api_client.sdn_client.SDNClient.search')
     def test_sdn_check_search_succeeds_despite_DB_issue(
@@ -119,3 +154,97 @@ class TestSDNCheckView(APITest):
         assert response.json()['sanctions_check_failure_id'] is None
 
         assert SanctionsCheckFailure.objects.count() == 0
+
+
+class TestSanctionsCheckFailureReportView(APITest):
+    """ Test SanctionsCheckFailureReportView. """
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:v1:sanctions-check-failures')
+        self.user.is_staff = True
+        self.user.save()
+        self.client.logout()
+        self.set_jwt_cookie(self.user.id)
+        now = timezone.now()
+        self.failures = [
+            SanctionsCheckFailureFactory(created=now - timedelta(days=3), country='IR', lms_user_id=1),
+            SanctionsCheckFailureFactory(created=now - timedelta(days=2), system_identifier='ecommerce'),
+            SanctionsCheckFailureFactory(created=now - timedelta(days=1), lms_user_id=3),
+        ]
+
+    def test_report_paginates_with_cursor(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        assert response.status_code == 200
+        page = response.json()
+        assert [failure['id'] for failure in page['results']] == [self.failures[2].id, self.failures[1].id]
+        assert page['results'][0]['metadata'] == self.failures[2].metadata
+
+        page = self.client.get(page['next']).json()
+        assert [failure['id'] for failure in page['results']] == [self.failures[0].id]
+        assert page['next'] is None
+
+    def test_report_filters(self):
+        for filters, expected_failures in (
+            ({'country': 'ir'}, [self.failures[0]]),
+            ({'system_identifier': 'ecommerce'}, [self.failures[1]]),
+            ({'lms_user_id': 3}, [self.failures[2]]),
+            ({'created_after': self.failures[1].created.isoformat()}, [self.failures[2], self.failures[1]]),
+            ({'created_before': self.failures[1].created.isoformat()}, [self.failures[0]]),
+        ):
+            response = self.client.get(self.url, filters)
+            assert [failure['id'] for failure in response.json()['results']] == [
+                failure.id for failure in expected_failures
+            ], filters
+
+    @override_settings(SANCTIONS_CHECK_FAILURE_DEDUPLICATION_WINDOW=3600)
+    def test_report_deduplicated_failure(self):
+        SDNFallbackMetadataFactory(import_state='Current')
+        for order_identifier in ('EDX-1', 'EDX-2', 'EDX-3'):
+            failure = record_sanctions_check_failure(
+                42, 'Din Grogu', 'Jedi Temple', 'SW', sanctions_type='ISN,SDN',
+                metadata={'order_identifer': order_identifier},
+            )
+
+        response = self.client.get(self.url, {'lms_user_id': 42})
+        assert response.status_code == 200
+        result, = response.json()['results']
+        assert result['id'] == failure.id
+        assert result['metadata'] == {'order_identifer': 'EDX-1'}
+        assert result['occurrence_count'] == 3
+        assert result['last_seen'] is not None
+        assert result['repeated_order_identifiers'] == ['EDX-2', 'EDX-3']
+
+    def test_report_invalid_filters_returns_400(self):
+        response = self.client.get(self.url, {'lms_user_id': 'one', 'country': 'IRN'})
+        assert response.status_code == 400
+        assert set(response.json()) == {'lms_user_id', 'country'}
+
+        response = self.client.get(
+            self.url, {'created_after': '2024-02-01T00:00', 'created_before': '2024-01-01T00:00'}
+        )
+        assert response.status_code == 400
+
+    @override_settings(SANCTIONS_CHECK_FAILURE_REPORT_STREAM_CHUNK_SIZE=2)
+    def test_report_streams_json_lines(self):
+        response = self.client.get(self.url, {'format': 'jsonl'})
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/jsonl'
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        assert [json.loads(line)['id'] for line in lines] == [failure.id for failure in reversed(self.failures)]
+
+        response = self.client.get(self.url, {'format': 'jsonl', 'country': 'IR'}, HTTP_ACCEPT='application/jsonl')
+        assert [json.loads(line)['id'] for line in b''.join(response.streaming_content).splitlines()] == [
+            self.failures[0].id
+        ]
+
+    def test_report_non_staff_returns_403(self):
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get(self.url)
+        assert response.status_code == 403
+
+    def test_report_no_jwt_returns_401(self):
+        self.client.cookies.clear()
+        response = self.client.get(self.url)
+        assert response.status_code == 401
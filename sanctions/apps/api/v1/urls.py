@@ -1,7 +1,7 @@
 """ API v1 URLs. """
 from django.urls import re_path
 
-from sanctions.apps.api.v1.views import SDNCheckView
+from sanctions.apps.api.v1.views import SanctionsCheckFailureReportView, SDNCheckView
 
 app_name = 'v1'
 urlpatterns = []
@@ -10,4 +10,11 @@ SDN_URLS = [
     re_path(r'^sdn-check/$', SDNCheckView.as_view(), name='sdn-check'),
 ]
 
+REPORT_URLS = [
+    re_path(
+        r'^sanctions-check-failures/$', SanctionsCheckFailureReportView.as_view(), name='sanctions-check-failures'
+    ),
+]
+
 urlpatterns += SDN_URLS
+urlpatterns += REPORT_URLS
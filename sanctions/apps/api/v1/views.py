@@ -4,14 +4,18 @@ API v1 Views
 import logging
 
 from django.conf import settings
-from django.http import JsonResponse
-from edx_rest_framework_extensions.auth.jwt.authentication import JwtAuthentication
+from django.http import JsonResponse, StreamingHttpResponse
 from requests.exceptions import HTTPError, Timeout
-from rest_framework import permissions, views
+from rest_framework import generics, permissions, renderers, views
 
+from sanctions.apps.api.authentication import CachedJwtAuthentication
+from sanctions.apps.api.pagination import SanctionsCheckFailureCursorPagination
+from sanctions.apps.api.renderers import JSONLinesRenderer
+from sanctions.apps.api.v1.serializers import SanctionsCheckFailureFilterSerializer, SanctionsCheckFailureSerializer
 from sanctions.apps.api_client.sdn_client import SDNClient
+from sanctions.apps.core.utils import iterate_by_keyset
 from sanctions.apps.sanctions.models import SanctionsCheckFailure
-from sanctions.apps.sanctions.utils import checkSDNFallback
+from sanctions.apps.sanctions.utils import checkSDNFallback, record_sanctions_check_failure
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +26,7 @@ class SDNCheckView(views.APIView):
     """
     http_method_names = ['post']
     permission_classes = (permissions.IsAuthenticated, permissions.IsAdminUser)
-    authentication_classes = (JwtAuthentication,)
+    authentication_classes = (CachedJwtAuthentication,)
 
     def post(self, request):
         """
@@ -95,12 +99,12 @@ class SDNCheckView(views.APIView):
             # API should not be held up if we are having DB troubles. Log the error
             # and continue through the code to reply to them.
             try:
-                sanctions_check_failure = SanctionsCheckFailure.objects.create(
-                    full_name=full_name,
+                sanctions_check_failure = record_sanctions_check_failure(
+                    lms_user_id,
+                    full_name,
+                    city,
+                    country,
                     username=username,
-                    lms_user_id=lms_user_id,
-                    city=city,
-                    country=country,
                     sanctions_type=sdn_api_list,
                     system_identifier=system_identifier,
                     metadata=metadata,
@@ -146,3 +150,40 @@ class SDNCheckView(views.APIView):
         }
 
         return JsonResponse(json_data, status=200)
+
+
+class SanctionsCheckFailureReportView(generics.ListAPIView):
+    """
+    Read-only report of the sanctions check failures, newest first, for compliance.
+
+    Filters (query parameters): created_after (inclusive) and created_before (exclusive) ISO 8601 datetimes,
+    system_identifier, country and lms_user_id.
+
+    Failures are paginated with a cursor (see SanctionsCheckFailureCursorPagination): follow the next link of
+    each page. With ?format=jsonl (or Accept: application/jsonl), all the matching failures are streamed as JSON
+    Lines instead, one failure per line, reading them SANCTIONS_CHECK_FAILURE_REPORT_STREAM_CHUNK_SIZE at a time,
+    so that exporting a large date range doesn't time out.
+    """
+    permission_classes = (permissions.IsAuthenticated, permissions.IsAdminUser)
+    authentication_classes = (CachedJwtAuthentication,)
+    renderer_classes = (renderers.JSONRenderer, JSONLinesRenderer)
+    pagination_class = SanctionsCheckFailureCursorPagination
+    serializer_class = SanctionsCheckFailureSerializer
+
+    def get_queryset(self):
+        filter_serializer = SanctionsCheckFailureFilterSerializer(data=self.request.query_params)
+        filter_serializer.is_valid(raise_exception=True)
+        return filter_serializer.filter_queryset(SanctionsCheckFailure.objects.all())
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != JSONLinesRenderer.format:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.get_queryset()
+        failures = iterate_by_keyset(
+            queryset, descending=True, chunk_size=settings.SANCTIONS_CHECK_FAILURE_REPORT_STREAM_CHUNK_SIZE
+        )
+        # A serializer builds its fields when instantiated, which takes longer than serializing a failure
+        serializer = self.get_serializer()
+        lines = (JSONLinesRenderer.render_line(serializer.to_representation(failure)) for failure in failures)
+        return StreamingHttpResponse(lines, content_type=JSONLinesRenderer.media_type)
@@ -7,8 +7,31 @@ from urllib.parse import urlencode
 import requests
 from django.conf import settings
 
+from sanctions.apps.core.cache import ProcessCache
+
 logger = logging.getLogger(__name__)
 
+# Process-wide session so that connections to the SDN API are pooled (and kept alive) across requests.
+_sdn_api_session = None
+_sdn_api_session_warmed = False
+# Failed warm ups, which aren't tried again until the entry expires
+sdn_api_warm_up_failure_cache = ProcessCache(
+    'sdn_api_warm_up_failure', timeout=settings.SDN_CHECK_WARM_UP_RETRY_INTERVAL, max_size=1
+)
+
+
+def get_sdn_api_session():
+    """
+    Return the process-wide requests Session used to call the SDN API.
+
+    The session is created lazily, so that gunicorn workers forked from a preloaded app
+    don't share sockets with their parent.
+    """
+    global _sdn_api_session  # pylint: disable=global-statement
+    if _sdn_api_session is None:
+        _sdn_api_session = requests.Session()
+    return _sdn_api_session
+
 
 class SDNClient:
     """API client that handles calls to the US Treasury SDN API."""
@@ -57,7 +80,7 @@ class SDNClient:
                 'Sactions SDNCheck: starting the request to the US Treasury SDN API for %s.',
                 lms_user_id
             )
-            response = requests.get(
+            response = get_sdn_api_session().get(
                 sdn_check_url,
                 headers=auth_header,
                 timeout=settings.SDN_CHECK_REQUEST_TIMEOUT
@@ -78,3 +101,26 @@ class SDNClient:
             raise requests.exceptions.HTTPError('Unable to connect to the SDN API')
 
         return response.json()
+
+    def warm_up(self):
+        """
+        Open a pooled connection to the SDN API, so the first check doesn't pay for the TCP/TLS handshake.
+
+        The connection only needs to be established once per process; any HTTP response counts as success.
+        Attempts time out after SDN_CHECK_WARM_UP_TIMEOUT seconds, and after a failure the connection is
+        reported cold without trying again for SDN_CHECK_WARM_UP_RETRY_INTERVAL seconds.
+
+        Returns:
+        bool: whether the process holds a warm connection to the SDN API.
+        """
+        global _sdn_api_session_warmed  # pylint: disable=global-statement
+        if _sdn_api_session_warmed or sdn_api_warm_up_failure_cache.get_cached_response(self.sdn_api_url).is_found:
+            return _sdn_api_session_warmed
+
+        try:
+            get_sdn_api_session().head(self.sdn_api_url, timeout=settings.SDN_CHECK_WARM_UP_TIMEOUT)
+            _sdn_api_session_warmed = True
+        except requests.exceptions.RequestException as e:
+            logger.warning('Sanctions SDNCheck: Unable to warm up the connection to the SDN API: [%s]', e)
+            sdn_api_warm_up_failure_cache.set(self.sdn_api_url, True)
+        return _sdn_api_session_warmed
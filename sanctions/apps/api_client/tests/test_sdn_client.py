@@ -91,3 +91,48 @@ class TestSDNClient(TestCase):
         self.mock_sdn_api_response(json.dumps(sdn_response), status_code=200)
         response = self.sdn_api_client.search(self.lms_user_id, self.name, self.city, self.country)
         assert response == sdn_response
+
+    @responses.activate
+    def test_warm_up(self):
+        """
+        Verify SDNClient warm_up opens a connection to the SDN API once per process.
+        """
+        responses.add(responses.HEAD, self.sdn_api_url, status=405)
+        with mock.patch('sanctions.apps.api_client.sdn_client._sdn_api_session_warmed', False):
+            assert self.sdn_api_client.warm_up()
+            assert self.sdn_api_client.warm_up()
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_warm_up_failure(self):
+        """
+        Verify SDNClient warm_up reports a cold connection if the SDN API can't be reached.
+        """
+        responses.add(responses.HEAD, self.sdn_api_url, body=Timeout())
+        with mock.patch('sanctions.apps.api_client.sdn_client._sdn_api_session_warmed', False):
+            assert not self.sdn_api_client.warm_up()
+
+    @responses.activate
+    def test_warm_up_failure_is_not_retried_right_away(self):
+        """
+        Verify SDNClient warm_up tries again only once SDN_CHECK_WARM_UP_RETRY_INTERVAL has passed after a failure.
+        """
+        responses.add(responses.HEAD, self.sdn_api_url, body=Timeout())
+        with mock.patch('sanctions.apps.api_client.sdn_client._sdn_api_session_warmed', False):
+            with mock.patch('sanctions.apps.core.cache.time.monotonic', return_value=1000):
+                assert not self.sdn_api_client.warm_up()
+                assert not self.sdn_api_client.warm_up()
+            assert len(responses.calls) == 1
+
+            with mock.patch('sanctions.apps.core.cache.time.monotonic', return_value=1011):
+                assert not self.sdn_api_client.warm_up()
+            assert len(responses.calls) == 2
+
+    @mock.patch('sanctions.apps.api_client.sdn_client.get_sdn_api_session')
+    def test_warm_up_timeout(self, mock_get_session):
+        """
+        Verify SDNClient warm_up uses its own, shorter, timeout.
+        """
+        with mock.patch('sanctions.apps.api_client.sdn_client._sdn_api_session_warmed', False):
+            self.sdn_api_client.warm_up()
+        mock_get_session.return_value.head.assert_called_once_with(self.sdn_api_url, timeout=1)
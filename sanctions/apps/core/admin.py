@@ -2,9 +2,33 @@
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from sanctions.apps.core.models import User
+from sanctions.apps.core.utils import get_estimated_row_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for the admin lists of large tables, which counts unfiltered lists from the database statistics.
+
+    A COUNT(*) of a large table reads a whole index on each page load, so the size of the table estimated by the
+    database (see get_estimated_row_count) is used instead, once it's over estimated_count_threshold rows.
+    Filtered lists are still counted, which is cheap when filtering on indexed fields. Use along with
+    show_full_result_count = False, as the admin otherwise counts the whole table again for filtered lists.
+    """
+    estimated_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimated_count = get_estimated_row_count(queryset.model, using=queryset.db)
+            if estimated_count is not None and estimated_count > self.estimated_count_threshold:
+                return estimated_count
+        return queryset.count()
 
 
 class CustomUserAdmin(UserAdmin):
@@ -0,0 +1,93 @@
+""" Cache utilities. """
+import threading
+import time
+from collections import OrderedDict
+
+from edx_django_utils.cache.utils import CachedResponse
+
+
+class ProcessCache:
+    """
+    Bounded, TTL-respecting cache that is local to the current process.
+
+    Complements edx-django-utils' TieredCache: the request cache tier is cleared on every request,
+    and the Django cache tier costs a round trip to the cache server. Values cached here are shared
+    by all requests served by a worker, so they must be safe to be stale for up to `timeout` seconds.
+
+    When `max_size` entries are cached, the least recently used entry is evicted.
+
+    Example:
+        >>> cache = ProcessCache('example', timeout=60, max_size=100)
+        >>> cache.set('key', 'value')
+        >>> cache.get_cached_response('key').value
+        'value'
+    """
+    _instances = []
+
+    def __init__(self, name, timeout, max_size=1024):
+        self.name = name
+        self.timeout = timeout
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        ProcessCache._instances.append(self)
+
+    @classmethod
+    def clear_all(cls):
+        """
+        Clear every process cache, e.g. between tests.
+        """
+        for instance in cls._instances:
+            instance.clear()
+
+    def get_cached_response(self, key):
+        """
+        Retrieve a CachedResponse for the given key, which is_found only if the entry has not expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return CachedResponse(is_found=True, key=key, value=value)
+                del self._data[key]
+            self.misses += 1
+            return CachedResponse(is_found=False, key=key, value=None)
+
+    def set(self, key, value, timeout=None):
+        """
+        Cache the value for `timeout` seconds, or for the default timeout of this cache.
+        """
+        expires = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    @property
+    def stats(self):
+        """
+        Hit, miss and eviction counts since the cache was last cleared, along with its current size.
+        """
+        return {
+            'name': self.name,
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,68 @@
+"""
+WSGI handlers running the API routes through a lean middleware stack.
+
+The API is called machine to machine, authenticated with JWTs in the Authorization header. It doesn't need the
+session, messages, locale, CSRF, clickjacking, CORS, social auth, waffle or cookie monitoring middleware that the
+browser-facing pages (admin, login) rely on, so requests whose path starts with one of API_FAST_LANE_PATH_PREFIXES
+are handled by an APIWSGIHandler, which only runs API_MIDDLEWARE. CommonMiddleware is kept, for its URL
+normalization (APPEND_SLASH) and DISALLOWED_USER_AGENTS checks.
+"""
+import types
+
+from django.conf import settings
+from django.core.handlers import base
+from django.core.handlers.wsgi import WSGIHandler
+
+
+class APISettings:
+    """
+    View of the settings in which MIDDLEWARE is API_MIDDLEWARE.
+    """
+
+    def __getattr__(self, name):
+        if name == 'MIDDLEWARE':
+            return settings.API_MIDDLEWARE
+        return getattr(settings, name)
+
+
+# BaseHandler.load_middleware, reading its settings from APISettings. Running Django's own code, rather than a
+# copy of it, keeps the API middleware chain built exactly as the MIDDLEWARE one is, whatever the Django version.
+_load_api_middleware = types.FunctionType(
+    base.BaseHandler.load_middleware.__code__,
+    dict(vars(base), settings=APISettings()),
+    base.BaseHandler.load_middleware.__name__,
+    base.BaseHandler.load_middleware.__defaults__,
+    base.BaseHandler.load_middleware.__closure__,
+)
+
+
+class APIWSGIHandler(WSGIHandler):
+    """
+    WSGI handler running API_MIDDLEWARE instead of MIDDLEWARE.
+    """
+
+    def load_middleware(self, is_async=False):
+        """
+        Build the middleware chain from API_MIDDLEWARE, as BaseHandler.load_middleware does from MIDDLEWARE.
+        """
+        _load_api_middleware(self, is_async)  # pylint: disable=not-callable
+
+
+class FastLaneDispatcher:
+    """
+    WSGI application handing the requests to the given path prefixes to api_application, and the others to
+    application.
+
+    Example:
+        >>> application = FastLaneDispatcher(get_wsgi_application(), APIWSGIHandler(), ('/api/',))
+    """
+
+    def __init__(self, application, api_application, path_prefixes):
+        self.application = application
+        self.api_application = api_application
+        self.path_prefixes = tuple(path_prefixes)
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(self.path_prefixes):
+            return self.api_application(environ, start_response)
+        return self.application(environ, start_response)
@@ -0,0 +1,50 @@
+"""
+Django management command reporting the import cost of starting the WSGI app.
+"""
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sanctions.apps.core.profiling import parse_import_times, summarize_import_times
+
+PROJECT_PACKAGE = 'sanctions'
+
+
+class Command(BaseCommand):
+    """
+    Command importing the WSGI app and the URLconf in a fresh process, as a new pod does before it can serve
+    requests, and reporting how long the imports took with python -X importtime.
+    """
+    help = 'Report the time taken to import each package and project module when the WSGI app starts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            metavar='N',
+            action='store',
+            type=int,
+            default=20,
+            help='Number of packages and project modules to report, the slowest first'
+        )
+
+    def handle(self, *args, **options):
+        wsgi_module = settings.WSGI_APPLICATION.rsplit('.', 1)[0]
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {wsgi_module}, {settings.ROOT_URLCONF}'],
+            capture_output=True, text=True, check=False,
+        )
+        if process.returncode:
+            raise CommandError(f'Importing the WSGI app failed:\n{process.stderr[-2000:]}')
+
+        summary = summarize_import_times(
+            parse_import_times(process.stderr.splitlines()), PROJECT_PACKAGE, limit=options['limit']
+        )
+        self.stdout.write(f"Startup imports took {summary['total'] / 1000:.1f} ms.")
+        self.stdout.write('Slowest packages (self time):')
+        for package, self_time in summary['packages']:
+            self.stdout.write(f'  {self_time / 1000:8.1f} ms  {package}')
+        self.stdout.write('Slowest project modules (cumulative time):')
+        for module, cumulative_time in summary['project_modules']:
+            self.stdout.write(f'  {cumulative_time / 1000:8.1f} ms  {module}')
@@ -0,0 +1,42 @@
+"""
+Tests for the audit_startup management command.
+"""
+import subprocess
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from sanctions.apps.core.tests.test_profiling import IMPORT_TIME_OUTPUT
+
+
+class AuditStartupCommandTests(TestCase):
+    """
+    Tests for the audit_startup management command.
+    """
+
+    @mock.patch('sanctions.apps.core.management.commands.audit_startup.subprocess.run')
+    def test_reports_import_times(self, mock_run):
+        mock_run.return_value = subprocess.CompletedProcess([], 0, stdout='', stderr=IMPORT_TIME_OUTPUT)
+        out = StringIO()
+
+        call_command('audit_startup', '--limit', '1', stdout=out)
+
+        command = mock_run.call_args[0][0]
+        self.assertEqual(command[1:4], ['-X', 'importtime', '-c'])
+        self.assertEqual(command[4], 'import sanctions.wsgi, sanctions.urls')
+        self.assertEqual(out.getvalue().splitlines(), [
+            'Startup imports took 5.4 ms.',
+            'Slowest packages (self time):',
+            '       2.3 ms  pycountry',
+            'Slowest project modules (cumulative time):',
+            '       5.4 ms  sanctions.wsgi',
+        ])
+
+    @mock.patch('sanctions.apps.core.management.commands.audit_startup.subprocess.run')
+    def test_import_fails(self, mock_run):
+        mock_run.return_value = subprocess.CompletedProcess([], 1, stdout='', stderr='ImportError: no module')
+
+        with self.assertRaisesRegex(CommandError, 'ImportError: no module'):
+            call_command('audit_startup')
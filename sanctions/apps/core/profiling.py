@@ -0,0 +1,138 @@
+""" Profiling utilities. """
+import re
+import resource
+import sys
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+# A line of the output of python -X importtime: self and cumulative microseconds, then the module indented by
+# its import depth
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+class StageProfiler:
+    """
+    Measure the wall and CPU time of the stages of a pipeline, along with its peak memory.
+
+    Stages may be nested, or time the pulls of a streaming stage through timed(). The time of a stage excludes
+    the time of the stages nested in it, so that the stages of a streaming pipeline (e.g. parsing rows while
+    normalizing them) are reported separately. CPU time includes the time of child processes that completed
+    during the stage, such as the workers of a process pool.
+
+    Example:
+        >>> profiler = StageProfiler()
+        >>> with profiler.stage('download'):
+        ...     download()
+        >>> rows = list(profiler.timed('parse', parse()))
+        >>> profiler.stages['parse']['wall']
+        0.42
+    """
+
+    def __init__(self):
+        self.stages = OrderedDict()
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the enclosed block as the given stage, adding to any previous time of the stage.
+        """
+        stats = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+        # Time spent in nested stages, to exclude from this one
+        nested = {'wall': 0.0, 'cpu': 0.0}
+        self._stack.append(nested)
+        start_wall, start_cpu = time.perf_counter(), self._get_cpu_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - start_wall, self._get_cpu_time() - start_cpu
+            self._stack.pop()
+            stats['wall'] += wall - nested['wall']
+            stats['cpu'] += cpu - nested['cpu']
+            if self._stack:
+                self._stack[-1]['wall'] += wall
+                self._stack[-1]['cpu'] += cpu
+
+    def timed(self, name, iterable):
+        """
+        Return an iterator over the items of the iterable, timing each pull as the given stage.
+
+        The stage is registered right away, so that the stages of a pipeline are reported in the order their
+        iterators are chained, rather than in the order they are first pulled.
+        """
+        self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+        return self._timed(name, iter(iterable))
+
+    def _timed(self, name, iterator):
+        """
+        Yield the items of the iterator, timing each pull as the given stage.
+        """
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    @staticmethod
+    def get_peak_rss():
+        """
+        Peak resident set size, in bytes, of this process and of its largest completed child process.
+        """
+        # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+        unit = 1 if sys.platform == 'darwin' else 1024
+        return unit * max(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        )
+
+    @staticmethod
+    def _get_cpu_time():
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return sum((
+            self_usage.ru_utime, self_usage.ru_stime, children_usage.ru_utime, children_usage.ru_stime,
+        ))
+
+
+def parse_import_times(lines):
+    """
+    Parse the output of python -X importtime.
+
+    Returns:
+        list: a (module, self microseconds, cumulative microseconds) tuple per imported module, in the order
+            their imports completed
+    """
+    import_times = []
+    for line in lines:
+        match = IMPORT_TIME_LINE.match(line.rstrip())
+        if match:
+            import_times.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return import_times
+
+
+def summarize_import_times(import_times, project_package, limit=20):
+    """
+    Summarize the import times returned by parse_import_times.
+
+    Returns:
+        dict: the total import time, the self time of the top-level packages that took the longest to import,
+            and the cumulative time of the slowest modules of project_package, in microseconds
+    """
+    package_times = Counter()
+    for module, self_time, _cumulative_time in import_times:
+        package_times[module.split('.')[0]] += self_time
+    project_modules = sorted(
+        (
+            (module, cumulative_time) for module, _self_time, cumulative_time in import_times
+            if module.split('.')[0] == project_package
+        ),
+        key=lambda module_time: module_time[1], reverse=True
+    )
+    return {
+        'total': sum(package_times.values()),
+        'packages': package_times.most_common(limit),
+        'project_modules': project_modules[:limit],
+    }
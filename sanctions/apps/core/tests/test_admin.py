@@ -0,0 +1,40 @@
+""" Tests for the core admin. """
+from unittest import mock
+
+from django.test import TestCase
+
+from sanctions.apps.core.admin import EstimatedCountPaginator
+from sanctions.apps.sanctions.models import SanctionsCheckFailure
+from sanctions.apps.sanctions.tests.factories import SanctionsCheckFailureFactory
+
+
+@mock.patch('sanctions.apps.core.admin.get_estimated_row_count')
+class EstimatedCountPaginatorTests(TestCase):
+    """ Tests for EstimatedCountPaginator. """
+
+    def setUp(self):
+        super().setUp()
+        SanctionsCheckFailureFactory.create_batch(3, country='IR')
+
+    def test_estimates_unfiltered_count(self, mock_estimate):
+        mock_estimate.return_value = 50000
+
+        with self.assertNumQueries(0):
+            self.assertEqual(EstimatedCountPaginator(SanctionsCheckFailure.objects.all(), 100).count, 50000)
+        mock_estimate.assert_called_once_with(SanctionsCheckFailure, using='default')
+
+    def test_counts_small_table(self, mock_estimate):
+        mock_estimate.return_value = 3
+
+        self.assertEqual(EstimatedCountPaginator(SanctionsCheckFailure.objects.all(), 100).count, 3)
+
+    def test_counts_without_estimate(self, mock_estimate):
+        mock_estimate.return_value = None
+
+        self.assertEqual(EstimatedCountPaginator(SanctionsCheckFailure.objects.all(), 100).count, 3)
+
+    def test_counts_filtered_list(self, mock_estimate):
+        paginator = EstimatedCountPaginator(SanctionsCheckFailure.objects.filter(country='US'), 100)
+
+        self.assertEqual(paginator.count, 0)
+        mock_estimate.assert_not_called()
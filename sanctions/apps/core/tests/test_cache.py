@@ -0,0 +1,60 @@
+"""Test core.cache."""
+from unittest import mock
+
+from django.test import TestCase
+
+from sanctions.apps.core.cache import ProcessCache
+
+
+class ProcessCacheTests(TestCase):
+    """Tests of the ProcessCache."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache = ProcessCache('test', timeout=60, max_size=2)
+
+    def test_get_and_set(self):
+        self.assertFalse(self.cache.get_cached_response('key').is_found)
+        self.cache.set('key', 'value')
+        cached_response = self.cache.get_cached_response('key')
+        self.assertTrue(cached_response.is_found)
+        self.assertEqual(cached_response.value, 'value')
+        self.assertEqual(self.cache.stats['hits'], 1)
+        self.assertEqual(self.cache.stats['misses'], 1)
+
+    def test_cached_none(self):
+        self.cache.set('key', None)
+        self.assertTrue(self.cache.get_cached_response('key').is_found)
+
+    def test_expiry(self):
+        with mock.patch('sanctions.apps.core.cache.time.monotonic', return_value=1000):
+            self.cache.set('key', 'value')
+            self.cache.set('short', 'value', timeout=1)
+        with mock.patch('sanctions.apps.core.cache.time.monotonic', return_value=1030):
+            self.assertTrue(self.cache.get_cached_response('key').is_found)
+            self.assertFalse(self.cache.get_cached_response('short').is_found)
+        with mock.patch('sanctions.apps.core.cache.time.monotonic', return_value=1060):
+            self.assertFalse(self.cache.get_cached_response('key').is_found)
+        self.assertEqual(self.cache.stats['size'], 0)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set('first', 1)
+        self.cache.set('second', 2)
+        self.cache.get_cached_response('first')
+        self.cache.set('third', 3)
+
+        self.assertTrue(self.cache.get_cached_response('first').is_found)
+        self.assertFalse(self.cache.get_cached_response('second').is_found)
+        self.assertTrue(self.cache.get_cached_response('third').is_found)
+        self.assertEqual(self.cache.stats['evictions'], 1)
+        self.assertEqual(self.cache.stats['size'], 2)
+
+    def test_delete_and_clear_all(self):
+        self.cache.set('first', 1)
+        self.cache.set('second', 2)
+        self.cache.delete('first')
+        self.assertFalse(self.cache.get_cached_response('first').is_found)
+
+        ProcessCache.clear_all()
+        self.assertEqual(self.cache.stats['size'], 0)
+        self.assertEqual(self.cache.stats['hits'], 0)
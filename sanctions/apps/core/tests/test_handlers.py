@@ -0,0 +1,127 @@
+""" Tests for the WSGI handlers. """
+import asyncio
+import json
+from unittest import mock
+from wsgiref.util import setup_testing_defaults
+
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import TestCase
+from django.test.utils import override_settings
+from edx_rest_framework_extensions.auth.jwt.tests.utils import generate_jwt_token, generate_unversioned_payload
+
+from sanctions.apps.core.handlers import APISettings, APIWSGIHandler, FastLaneDispatcher, _load_api_middleware
+from sanctions.apps.core.tests.factories import UserFactory
+
+
+def unused_middleware(get_response):
+    """ Middleware factory opting out of the middleware chain. """
+    raise MiddlewareNotUsed()
+
+
+def none_middleware(get_response):  # pylint: disable=unused-argument
+    """ Misconfigured middleware factory. """
+    return None
+
+
+def get_environ(path, method='GET', body=b'', **headers):
+    """ Return the WSGI environ of a request. """
+    environ = {
+        'PATH_INFO': path, 'REQUEST_METHOD': method, 'CONTENT_LENGTH': str(len(body)), 'HTTP_HOST': 'testserver',
+    }
+    setup_testing_defaults(environ)
+    environ['wsgi.input'].write(body)
+    environ['wsgi.input'].seek(0)
+    environ.update(headers)
+    return environ
+
+
+def call_application(application, environ):
+    """ Call a WSGI application, returning its status and headers. """
+    start_response = mock.Mock()
+    response = application(environ, start_response)
+    body = b''.join(response)
+    response.close()
+    status, headers = start_response.call_args[0]
+    return status, dict(headers), body
+
+
+class APIWSGIHandlerTests(TestCase):
+    """ Tests for APIWSGIHandler. """
+
+    def test_runs_api_middleware_only(self):
+        # The clickjacking middleware sets X-Frame-Options, and only runs in the full stack
+        _status, headers, _body = call_application(WSGIHandler(), get_environ('/health/'))
+        self.assertIn('X-Frame-Options', headers)
+
+        status, headers, _body = call_application(APIWSGIHandler(), get_environ('/health/'))
+        self.assertEqual(status, '200 OK')
+        self.assertNotIn('X-Frame-Options', headers)
+
+    @override_settings(API_MIDDLEWARE=['django.middleware.clickjacking.XFrameOptionsMiddleware'])
+    def test_honors_api_middleware_setting(self):
+        _status, headers, _body = call_application(APIWSGIHandler(), get_environ('/health/'))
+        self.assertEqual(headers['X-Frame-Options'], 'DENY')
+
+    @override_settings(API_MIDDLEWARE=[
+        'sanctions.apps.core.tests.test_handlers.unused_middleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ])
+    def test_skips_unused_middleware(self):
+        _status, headers, _body = call_application(APIWSGIHandler(), get_environ('/health/'))
+        self.assertEqual(headers['X-Frame-Options'], 'DENY')
+
+    @override_settings(API_MIDDLEWARE=['sanctions.apps.core.tests.test_handlers.none_middleware'])
+    def test_rejects_middleware_factory_returning_none(self):
+        with self.assertRaisesRegex(ImproperlyConfigured, 'none_middleware returned None'):
+            APIWSGIHandler().load_middleware()
+
+    @override_settings(API_MIDDLEWARE=['django.middleware.common.CommonMiddleware'], DEBUG=True)
+    def test_api_settings(self):
+        """ The middleware chain is built by Django's own code, from a view of the settings. """
+        api_settings = APISettings()
+        self.assertEqual(api_settings.MIDDLEWARE, ['django.middleware.common.CommonMiddleware'])
+        self.assertIs(api_settings.DEBUG, True)
+        self.assertIs(_load_api_middleware.__code__, BaseHandler.load_middleware.__code__)  # pylint: disable=no-member
+
+    def test_loads_async_middleware_chain(self):
+        handler = APIWSGIHandler()
+        handler.load_middleware(is_async=True)
+        self.assertTrue(asyncio.iscoroutinefunction(handler._middleware_chain))  # pylint: disable=protected-access
+
+    @mock.patch('sanctions.apps.api.v1.views.SDNClient.search', return_value={'total': 0})
+    def test_sdn_check_with_jwt(self, _mock_search):
+        """ The API authenticates its callers without the session and authentication middleware. """
+        user = UserFactory(is_staff=True)
+        payload = generate_unversioned_payload(user)
+        payload['user_id'] = user.id
+        body = json.dumps({'lms_user_id': 1, 'full_name': 'Din Grogu', 'city': 'Jedi Temple', 'country': 'SW'})
+
+        status, _headers, response_body = call_application(APIWSGIHandler(), get_environ(
+            '/api/v1/sdn-check/', method='POST', body=body.encode('utf-8'), CONTENT_TYPE='application/json',
+            HTTP_AUTHORIZATION=f'JWT {generate_jwt_token(payload)}',
+        ))
+
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(json.loads(response_body)['hit_count'], 0)
+
+    def test_sdn_check_without_jwt(self):
+        status, _headers, _body = call_application(
+            APIWSGIHandler(), get_environ('/api/v1/sdn-check/', method='POST')
+        )
+        self.assertEqual(status, '401 Unauthorized')
+
+
+class FastLaneDispatcherTests(TestCase):
+    """ Tests for FastLaneDispatcher. """
+
+    def test_dispatches_on_path_prefix(self):
+        application, api_application = mock.Mock(), mock.Mock()
+        dispatcher = FastLaneDispatcher(application, api_application, ['/api/'])
+
+        dispatcher({'PATH_INFO': '/api/v1/sdn-check/'}, mock.sentinel.start_response)
+        api_application.assert_called_once_with({'PATH_INFO': '/api/v1/sdn-check/'}, mock.sentinel.start_response)
+
+        dispatcher({'PATH_INFO': '/admin/'}, mock.sentinel.start_response)
+        application.assert_called_once_with({'PATH_INFO': '/admin/'}, mock.sentinel.start_response)
@@ -0,0 +1,82 @@
+""" Tests for profiling utilities. """
+from unittest import mock
+
+from django.test import TestCase
+
+from sanctions.apps.core.profiling import StageProfiler, parse_import_times, summarize_import_times
+
+
+class StageProfilerTests(TestCase):
+    """ Tests for StageProfiler. """
+
+    def setUp(self):
+        super().setUp()
+        self.profiler = StageProfiler()
+        # Every clock reading advances both clocks by one second
+        clock = iter(range(1000))
+        self.patchers = [
+            mock.patch('sanctions.apps.core.profiling.time.perf_counter', side_effect=lambda: next(clock)),
+            mock.patch.object(StageProfiler, '_get_cpu_time', side_effect=lambda: next(clock)),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_stages_accumulate(self):
+        with self.profiler.stage('download'):
+            pass
+        with self.profiler.stage('download'):
+            pass
+        self.assertEqual(list(self.profiler.stages), ['download'])
+        self.assertGreater(self.profiler.stages['download']['wall'], 0)
+        self.assertGreater(self.profiler.stages['download']['cpu'], 0)
+
+    def test_nested_stages_are_excluded(self):
+        def parse():
+            with self.profiler.stage('read'):
+                pass
+            yield 'row'
+
+        rows = list(self.profiler.timed('parse', parse()))
+
+        self.assertEqual(rows, ['row'])
+        # The first pull of 'parse' spans 6 clock ticks, 2 of which are spent in 'read', the last pull 2 ticks
+        self.assertEqual(self.profiler.stages['read'], {'wall': 2, 'cpu': 2})
+        self.assertEqual(self.profiler.stages['parse'], {'wall': 6, 'cpu': 6})
+
+    def test_chained_stages_keep_pipeline_order(self):
+        rows = self.profiler.timed('parse', ['row'])
+        records = self.profiler.timed('normalize', (row.upper() for row in rows))
+        self.assertEqual(list(records), ['ROW'])
+        self.assertEqual(list(self.profiler.stages), ['parse', 'normalize'])
+
+    def test_peak_rss(self):
+        self.assertGreater(StageProfiler.get_peak_rss(), 2 ** 20)
+
+
+IMPORT_TIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       300 |        300 |     pycountry.db
+import time:      2000 |       2300 |   pycountry
+import time:      1000 |       3300 | sanctions.apps.sanctions.constants
+import time:       500 |        500 |   django.utils
+import time:      1500 |       2000 | django
+import time:       100 |       5400 | sanctions.wsgi
+"""
+
+
+class ImportTimesTests(TestCase):
+    """ Tests for parse_import_times and summarize_import_times. """
+
+    def test_parse_import_times(self):
+        import_times = parse_import_times(IMPORT_TIME_OUTPUT.splitlines())
+        self.assertEqual(import_times[0], ('pycountry.db', 300, 300))
+        self.assertEqual(import_times[-1], ('sanctions.wsgi', 100, 5400))
+        self.assertEqual(len(import_times), 6)
+
+    def test_summarize_import_times(self):
+        summary = summarize_import_times(parse_import_times(IMPORT_TIME_OUTPUT.splitlines()), 'sanctions', limit=2)
+        self.assertEqual(summary, {
+            'total': 5400,
+            'packages': [('pycountry', 2300), ('django', 2000)],
+            'project_modules': [('sanctions.wsgi', 5400), ('sanctions.apps.sanctions.constants', 3300)],
+        })
@@ -0,0 +1,75 @@
+""" Tests for core utilities. """
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from sanctions.apps.core.utils import get_estimated_row_count, iterate_by_keyset
+from sanctions.apps.sanctions.models import SanctionsCheckFailure
+from sanctions.apps.sanctions.tests.factories import SanctionsCheckFailureFactory
+
+
+class IterateByKeysetTests(TestCase):
+    """ Tests for iterate_by_keyset. """
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        # Some failures share their created timestamp, which the id breaks ties of
+        self.failures = [
+            SanctionsCheckFailureFactory(created=created)
+            for created in (now, now, now - timezone.timedelta(days=1), now, now - timezone.timedelta(days=2))
+        ]
+
+    def test_ascending(self):
+        with self.assertNumQueries(3):
+            failures = list(iterate_by_keyset(SanctionsCheckFailure.objects.all(), chunk_size=2))
+        self.assertEqual(failures, sorted(self.failures, key=lambda failure: (failure.created, failure.id)))
+
+    def test_descending(self):
+        failures = list(iterate_by_keyset(SanctionsCheckFailure.objects.all(), descending=True, chunk_size=2))
+        self.assertEqual(
+            failures, sorted(self.failures, key=lambda failure: (failure.created, failure.id), reverse=True)
+        )
+
+    def test_filtered_queryset(self):
+        queryset = SanctionsCheckFailure.objects.filter(id__in=[self.failures[0].id, self.failures[4].id])
+        self.assertEqual(list(iterate_by_keyset(queryset, chunk_size=1)), [self.failures[4], self.failures[0]])
+
+    def test_empty_queryset(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(list(iterate_by_keyset(SanctionsCheckFailure.objects.filter(id=0))), [])
+
+
+class GetEstimatedRowCountTests(TestCase):
+    """ Tests for get_estimated_row_count. """
+
+    def test_unsupported_database(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_estimated_row_count(SanctionsCheckFailure))
+
+    def _get_estimated_row_count(self, vendor, row):
+        """ Return the estimate, and the statement run, with a database of the vendor returning the row. """
+        connection = mock.MagicMock(vendor=vendor)
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = row
+        with mock.patch.dict('sanctions.apps.core.utils.connections', {'default': connection}):
+            estimated_count = get_estimated_row_count(SanctionsCheckFailure)
+        return estimated_count, cursor.execute.call_args[0]
+
+    def test_mysql(self):
+        estimated_count, (sql, params) = self._get_estimated_row_count('mysql', (1234,))
+
+        self.assertEqual(estimated_count, 1234)
+        self.assertIn('information_schema.TABLES', sql)
+        self.assertEqual(params, ['sanctions_sanctionscheckfailure'])
+
+    def test_postgresql(self):
+        estimated_count, (sql, _) = self._get_estimated_row_count('postgresql', (1234.0,))
+
+        self.assertEqual(estimated_count, 1234)
+        self.assertIn('pg_class', sql)
+
+    def test_no_statistics(self):
+        self.assertIsNone(self._get_estimated_row_count('postgresql', (-1.0,))[0])
+        self.assertIsNone(self._get_estimated_row_count('mysql', None)[0])
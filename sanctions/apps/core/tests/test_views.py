@@ -4,12 +4,16 @@ from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import DatabaseError
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
 from django.test import TestCase
-from django.test.utils import override_settings
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
 
 from sanctions.apps.core.constants import Status
+from sanctions.apps.core.views import _get_api_docs_view
+from sanctions.apps.sanctions.models import SDNFallbackActiveGeneration
+from sanctions.apps.sanctions.tests.factories import SDNFallbackDataFactory, SDNFallbackMetadataFactory
 
 User = get_user_model()
 
@@ -23,6 +27,8 @@ class HealthTests(TestCase):
 
     def test_database_outage(self):
         """Test that the endpoint reports when the database is unavailable."""
+        # Cache the waffle switches read by the monitoring middleware
+        self.client.get(reverse('health'))
         with mock.patch('django.db.backends.base.base.BaseDatabaseWrapper.cursor', side_effect=DatabaseError):
             self._assert_health(503, Status.UNAVAILABLE, Status.UNAVAILABLE)
 
@@ -42,6 +48,100 @@ class HealthTests(TestCase):
         self.assertJSONEqual(response.content, expected_data)
 
 
+@mock.patch('sanctions.apps.core.views.SDNClient.warm_up', return_value=True)
+class ReadinessTests(TestCase):
+    """Tests of the readiness endpoint."""
+
+    def test_ready(self, mock_warm_up):
+        """Test that the endpoint reports the warm fallback generation."""
+        metadata = SDNFallbackMetadataFactory.create(import_state='Current')
+        SDNFallbackDataFactory.create_batch(2, sdn_fallback_metadata=metadata)
+
+        response = self.client.get(reverse('readiness'))
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['overall_status'], Status.OK)
+        self.assertEqual(data['detailed_status'], {
+            'database_status': Status.OK,
+            'sdn_fallback_status': Status.OK,
+            'sdn_api_status': Status.OK,
+        })
+        generation, = data['sdn_fallback']['generations']
+        self.assertEqual(generation['list_source'], 'CSL')
+        self.assertEqual(generation['file_checksum'], metadata.file_checksum)
+        self.assertGreater(generation['age'], 0)
+        self.assertEqual(data['sdn_fallback']['record_count'], 2)
+        self.assertIn('load_time', data['sdn_fallback'])
+        self.assertEqual(data['sdn_fallback']['processed_text_cache']['name'], 'sdn_fallback_processed_text')
+        self.assertEqual(data['jwt_claims_cache']['name'], 'jwt_claims')
+        self.assertEqual(data['jwt_users_cache']['name'], 'jwt_users')
+        mock_warm_up.assert_called_once()
+
+    def test_generation_is_only_loaded_once(self, _mock_warm_up):
+        """Test that repeated readiness checks don't reload a warm generation."""
+        SDNFallbackActiveGeneration.activate(SDNFallbackMetadataFactory.create(import_state='Current'))
+        self.client.get(reverse('readiness'))
+
+        # SELECT 1 and the current metadata lookup, but no record count
+        with self.assertNumQueries(2), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('readiness'))
+        self.assertEqual(response.status_code, 200)
+        # The token filters are only loaded once, not along with the metadata
+        self.assertFalse([query for query in queries if 'token_filter' in query['sql']])
+
+    def test_no_current_fallback_data(self, _mock_warm_up):
+        """Test that the endpoint reports not ready until fallback data is imported."""
+        SDNFallbackMetadataFactory.create(import_state='New')
+
+        response = self.client.get(reverse('readiness'))
+
+        self.assertEqual(response.status_code, 503)
+        data = response.json()
+        self.assertEqual(data['overall_status'], Status.UNAVAILABLE)
+        self.assertEqual(data['detailed_status']['sdn_fallback_status'], Status.UNAVAILABLE)
+        self.assertIsNone(data['sdn_fallback'])
+
+    def test_sdn_api_unavailable_is_still_ready(self, mock_warm_up):
+        """Test that a cold SDN API connection is reported without failing readiness."""
+        mock_warm_up.return_value = False
+        SDNFallbackMetadataFactory.create(import_state='Current')
+
+        response = self.client.get(reverse('readiness'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['detailed_status']['sdn_api_status'], Status.UNAVAILABLE)
+
+    def test_database_outage(self, _mock_warm_up):
+        """Test that the endpoint reports not ready when the database is unavailable."""
+        # Cache the waffle switches read by the monitoring middleware
+        self.client.get(reverse('health'))
+        with mock.patch('django.db.backends.base.base.BaseDatabaseWrapper.cursor', side_effect=DatabaseError):
+            response = self.client.get(reverse('readiness'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['detailed_status']['database_status'], Status.UNAVAILABLE)
+
+
+class ApiDocsTests(TestCase):
+    """ Tests of the API documentation. """
+
+    def setUp(self):
+        super().setUp()
+        _get_api_docs_view.cache_clear()
+        self.addCleanup(_get_api_docs_view.cache_clear)
+
+    @mock.patch('rest_framework_swagger.views.get_swagger_view')
+    def test_swagger_view_is_built_once(self, mock_get_swagger_view):
+        mock_get_swagger_view.return_value.return_value = HttpResponse('sanctions API')
+
+        self.client.get('/api-docs/')
+        response = self.client.get('/api-docs/')
+
+        self.assertEqual(response.content, b'sanctions API')
+        mock_get_swagger_view.assert_called_once_with(title='sanctions API')
+
+
 class AutoAuthTests(TestCase):
     """ Auto Auth view tests. """
     AUTO_AUTH_PATH = reverse('auto_auth')
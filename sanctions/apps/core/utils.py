@@ -0,0 +1,59 @@
+""" Core utilities. """
+from django.db import connections
+from django.db.models import Q
+
+
+def iterate_by_keyset(queryset, fields=('created', 'id'), descending=False, chunk_size=1000):
+    """
+    Yield the objects of the queryset ordered by the given fields, reading them chunk_size at a time.
+
+    Each chunk is read with a separate query starting right after the last object of the previous chunk
+    (keyset pagination), so that unlike an offset or a single server-side cursor, the cost of a chunk doesn't
+    grow with the number of objects already read and no query stays open while the objects are processed.
+    The last of the fields must be unique.
+
+    Example:
+        >>> for failure in iterate_by_keyset(SanctionsCheckFailure.objects.filter(country='IR'), descending=True):
+        ...     export(failure)
+    """
+    ordering = [f'-{field}' if descending else field for field in fields]
+    lookup = 'lt' if descending else 'gt'
+    chunk = list(queryset.order_by(*ordering)[:chunk_size])
+    while chunk:
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last_values = [getattr(chunk[-1], field) for field in fields]
+        # Objects after the last one, i.e. (a, b) > (last_a, last_b) when ascending, written as a >= last_a AND
+        # (a > last_a OR b > last_b) so that the database scans the index on the first field from the last object
+        after_last = Q(**{f'{fields[-1]}__{lookup}': last_values[-1]})
+        for field, last_value in reversed(list(zip(fields[:-1], last_values[:-1]))):
+            after_last = Q(**{f'{field}__{lookup}e': last_value}) & (
+                Q(**{f'{field}__{lookup}': last_value}) | after_last
+            )
+        chunk = list(queryset.filter(after_last).order_by(*ordering)[:chunk_size])
+
+
+def get_estimated_row_count(model, using='default'):
+    """
+    Return the number of rows of the model's table estimated from the statistics of the database, or None.
+
+    Unlike a COUNT(*), which reads a whole index of the table, this reads a single row of statistics. The
+    estimate can be off by a few percent on MySQL and is only available on MySQL and PostgreSQL: None is
+    returned for other databases, and for tables without statistics yet.
+    """
+    connection = connections[using]
+    if connection.vendor == 'mysql':
+        sql = 'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples FROM pg_class WHERE oid = %s::regclass'
+    else:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [model._meta.db_table])
+        row = cursor.fetchone()
+    # reltuples is -1 for tables never analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
@@ -1,6 +1,7 @@
 """ Core views. """
 import logging
 import uuid
+from functools import lru_cache
 
 from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model, login
@@ -10,7 +11,10 @@ from django.shortcuts import redirect
 from django.views.generic import View
 from edx_django_utils.monitoring import ignore_transaction
 
+from sanctions.apps.api.authentication import jwt_claims_cache, jwt_users_cache
+from sanctions.apps.api_client.sdn_client import SDNClient
 from sanctions.apps.core.constants import Status
+from sanctions.apps.sanctions.utils import warm_sdn_fallback
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -37,14 +41,7 @@ def health(_):
     # Ignores health check in performance monitoring so as to not artifically inflate our response time metrics
     ignore_transaction()
 
-    try:
-        cursor = connection.cursor()
-        cursor.execute("SELECT 1")
-        cursor.fetchone()
-        cursor.close()
-        database_status = Status.OK
-    except DatabaseError:
-        database_status = Status.UNAVAILABLE
+    database_status = _get_database_status()
 
     overall_status = Status.OK if (database_status == Status.OK) else Status.UNAVAILABLE
 
@@ -61,6 +58,100 @@ def health(_):
         return JsonResponse(data, status=503)
 
 
+@transaction.non_atomic_requests
+def readiness(_):
+    """Allows a load balancer to verify this service is warm and ready to serve traffic.
+
+    On top of the database health check, this loads the current SDN fallback generations for this process
+    and opens a pooled connection to the SDN API. The SDN API connection is reported but does not affect
+    the overall status, since the fallback exists for when the SDN API is unavailable. The hits and misses of
+    this process' JWT claims and users caches are reported too.
+
+    Returns:
+        HttpResponse: 200 if the service is ready, with JSON data indicating the status of each required service
+        HttpResponse: 503 if the service is not ready, with JSON data indicating the status of each required service
+
+    Example:
+        >>> response = requests.get('https://sanctions.edx.org/health/ready/')
+        >>> response.status_code
+        200
+        >>> response.content
+        '{"overall_status": "OK", "detailed_status": {"database_status": "OK", "sdn_fallback_status": "OK",
+        "sdn_api_status": "OK"}, "sdn_fallback": {"generations": [{"list_source": "CSL", "file_checksum": "...",
+        "import_timestamp": "...", "age": 412.7}], "record_count": 1830, "load_time": 0.021,
+        "processed_text_cache": {"name": "sdn_fallback_processed_text", "size": 412, "max_size": 10000,
+        "hits": 5127, "misses": 412, "evictions": 0}}, "jwt_claims_cache": {"name": "jwt_claims", "size": 3,
+        "max_size": 1000, "hits": 5536, "misses": 3, "evictions": 0}, "jwt_users_cache": {"name": "jwt_users",
+        "size": 2, "max_size": 100, "hits": 5530, "misses": 9, "evictions": 0}}'
+    """
+    ignore_transaction()
+
+    database_status = _get_database_status()
+
+    sdn_fallback = None
+    sdn_fallback_status = Status.UNAVAILABLE
+    if database_status == Status.OK:
+        try:
+            sdn_fallback = warm_sdn_fallback()
+            sdn_fallback_status = Status.OK
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning('Readiness: unable to warm up the SDN fallback: [%s]', e)
+
+    sdn_client = SDNClient(
+        sdn_api_url=settings.SDN_CHECK_API_URL,
+        sdn_api_key=settings.SDN_CHECK_API_KEY,
+        sdn_api_list=settings.SDN_CHECK_API_LIST
+    )
+    sdn_api_status = Status.OK if sdn_client.warm_up() else Status.UNAVAILABLE
+
+    overall_status = Status.OK if (
+        database_status == Status.OK and sdn_fallback_status == Status.OK
+    ) else Status.UNAVAILABLE
+
+    data = {
+        'overall_status': overall_status,
+        'detailed_status': {
+            'database_status': database_status,
+            'sdn_fallback_status': sdn_fallback_status,
+            'sdn_api_status': sdn_api_status,
+        },
+        'sdn_fallback': sdn_fallback,
+        'jwt_claims_cache': jwt_claims_cache.stats,
+        'jwt_users_cache': jwt_users_cache.stats,
+    }
+
+    if overall_status == Status.OK:
+        return JsonResponse(data)
+    else:
+        return JsonResponse(data, status=503)
+
+
+def api_docs(request, *args, **kwargs):
+    """Serve the Swagger documentation of the API.
+
+    The Swagger stack is only imported when the documentation is first requested, as the API doesn't need it.
+    """
+    return _get_api_docs_view()(request, *args, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def _get_api_docs_view():
+    from rest_framework_swagger.views import get_swagger_view  # pylint: disable=import-outside-toplevel
+    return get_swagger_view(title='sanctions API')
+
+
+def _get_database_status():
+    """Check the status of the database connection on which this service relies."""
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+        return Status.OK
+    except DatabaseError:
+        return Status.UNAVAILABLE
+
+
 class AutoAuth(View):
     """Creates and authenticates a new User with superuser permissions.
 
@@ -1,3 +1,122 @@
 """
 Admin for the sanctions app
+
+The tables of the app are large (tens of thousands of SDNFallbackData rows per generation, and an ever growing
+number of sanctions check failures) and written only by the imports and the API, so their admins are read-only
+lists built to stay fast at full table size: they're paginated with EstimatedCountPaginator, never count the whole
+table for filtered lists, and only filter on indexed fields.
 """
+from django.contrib import admin
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from sanctions.apps.core.admin import EstimatedCountPaginator
+from sanctions.apps.sanctions.exports import EXPORT_FORMATS, stream_export
+from sanctions.apps.sanctions.models import SanctionsCheckFailure, SDNFallbackData, SDNFallbackMetadata
+
+
+def _export_response(queryset, export_format):
+    """
+    Return a response streaming the export of the failures of the queryset, and their history, as an attachment.
+    """
+    response = StreamingHttpResponse(
+        stream_export(queryset, export_format, include_history=True),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    filename = f'sanctions_check_failures_{timezone.now():%Y%m%d%H%M%S}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class ReadOnlyModelAdmin(admin.ModelAdmin):
+    """
+    Admin of a large table that can be browsed but not edited.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class GenerationListFilter(admin.SimpleListFilter):
+    """
+    Filter of the SDN fallback records by generation, which doesn't load the Bloom filters of the generations.
+    """
+    title = 'generation'
+    parameter_name = 'generation'
+
+    def lookups(self, request, model_admin):
+        generations = SDNFallbackMetadata.objects.only('id', 'list_source', 'import_state').order_by('-id')
+        return [
+            (generation.id, f'{generation.id} ({generation.list_source}, {generation.import_state})')
+            for generation in generations
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(sdn_fallback_metadata_id=self.value())
+        return queryset
+
+
+@admin.register(SDNFallbackMetadata)
+class SDNFallbackMetadataAdmin(ReadOnlyModelAdmin):
+    """
+    Admin of the generations of the SDN fallback data.
+    """
+    list_display = ('id', 'list_source', 'import_state', 'download_timestamp', 'import_timestamp', 'file_checksum')
+    list_filter = ('list_source', 'import_state')
+    ordering = ('-created',)
+    # The Bloom filter of the generation's records, see token_filter.py
+    exclude = ('token_filter',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('token_filter')
+
+
+@admin.register(SDNFallbackData)
+class SDNFallbackDataAdmin(ReadOnlyModelAdmin):
+    """
+    Admin of the SDN fallback records, which are filtered by generation to browse one of them.
+    """
+    list_display = ('id', 'generation', 'source', 'sdn_type', 'names', 'countries')
+    list_filter = (GenerationListFilter, 'source', 'sdn_type')
+    list_select_related = ('sdn_fallback_metadata',)
+    raw_id_fields = ('sdn_fallback_metadata',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('sdn_fallback_metadata__token_filter')
+
+    @admin.display(description='Generation', ordering='sdn_fallback_metadata')
+    def generation(self, obj):
+        metadata = obj.sdn_fallback_metadata
+        return f'{metadata.id} ({metadata.list_source}, {metadata.import_state})'
+
+
+@admin.register(SanctionsCheckFailure)
+class SanctionsCheckFailureAdmin(ReadOnlyModelAdmin):
+    """
+    Admin of the sanctions check failures, which can be exported with their history for audits.
+    """
+    list_display = (
+        'id', 'created', 'username', 'lms_user_id', 'full_name', 'country', 'system_identifier', 'sanctions_type',
+        'occurrence_count', 'last_seen',
+    )
+    list_filter = ('country', 'system_identifier')
+    # Newest first, along the created index
+    ordering = ('-created',)
+    actions = ['export_as_csv', 'export_as_jsonl']
+
+    @admin.action(description='Export the selected failures and their history as CSV')
+    def export_as_csv(self, request, queryset):
+        return _export_response(queryset, 'csv')
+
+    @admin.action(description='Export the selected failures and their history as JSON Lines')
+    def export_as_jsonl(self, request, queryset):
+        return _export_response(queryset, 'jsonl')
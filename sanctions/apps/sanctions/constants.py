@@ -0,0 +1,27 @@
+"""
+Constants for the sanctions app.
+"""
+# SDNFallbackMetadata.list_source of the trade.gov consolidated screening list, which SDN_CHECK_API_LIST screens
+SDN_FALLBACK_DEFAULT_LIST_SOURCE = 'CSL'
+
+# Maps the source abbreviations used by the trade.gov SDN API (and SDN_CHECK_API_LIST)
+# to the full source names found in the consolidated screening list CSV.
+SDN_FALLBACK_SOURCES_BY_ABBREVIATION = {
+    'CAP': 'Capta List (CAP) - Treasury Department',
+    'CMIC': 'Non-SDN Chinese Military-Industrial Complex Companies List (CMIC) - Treasury Department',
+    'DPL': 'Denied Persons List (DPL) - Bureau of Industry and Security',
+    'DTC': 'ITAR Debarred (DTC) - State Department',
+    'EL': 'Entity List (EL) - Bureau of Industry and Security',
+    'FSE': 'Foreign Sanctions Evaders (FSE) - Treasury Department',
+    'ISN': 'Nonproliferation Sanctions (ISN) - State Department',
+    'MBS': 'Non-SDN Menu-Based Sanctions List (NS-MBS List) - Treasury Department',
+    'MEU': 'Military End User (MEU) List - Bureau of Industry and Security',
+    'PLC': 'Palestinian Legislative Council List (PLC) - Treasury Department',
+    'SDN': 'Specially Designated Nationals (SDN) - Treasury Department',
+    'SSI': 'Sectoral Sanctions Identifications List (SSI) - Treasury Department',
+    'UVL': 'Unverified List (UVL) - Bureau of Industry and Security',
+}
+
+# The SDN API is queried with type 'individual'. Most lists other than SDN do not classify
+# their records at all, so untyped records are screened as well.
+SDN_FALLBACK_TYPES = ('Individual', '')
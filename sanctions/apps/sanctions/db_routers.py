@@ -0,0 +1,96 @@
+"""
+Database routers for the sanctions app.
+"""
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from sanctions.apps.core.cache import ProcessCache
+
+logger = logging.getLogger(__name__)
+
+read_replica_freshness_cache = ProcessCache('read_replica_freshness', timeout=30, max_size=1)
+
+
+class ReadReplicaRouter:
+    """
+    Send SDN fallback reads and sanctions hit reporting reads to a read replica, when one is configured.
+
+    The replica is only used while it has caught up with the current SDN fallback generations, i.e. while its
+    SDNFallbackActiveGeneration pointers match the writer's. When it is lagging (or unreachable), reads stay
+    on the writer. Everything else, including all writes and migrations, is left to the default database.
+
+    To enable it, add the replica to DATABASES under the SANCTIONS_READ_REPLICA_DATABASE alias.
+    """
+    REPLICA_READ_MODELS = (
+        'sanctions.sdnfallbackdata',
+        'sanctions.sanctionscheckfailure',
+        'sanctions.historicalsanctionscheckfailure',
+    )
+
+    def db_for_read(self, model, **hints):  # pylint: disable=unused-argument
+        """
+        Read fallback data and sanctions hits from the replica, while it is fresh.
+        """
+        replica = self._get_replica_alias()
+        if replica and model._meta.label_lower in self.REPLICA_READ_MODELS and self._is_replica_fresh(replica):
+            return replica
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):  # pylint: disable=unused-argument
+        """
+        Allow relations between objects read from the writer and the replica, which hold the same data.
+        """
+        replica = self._get_replica_alias()
+        if replica:
+            databases = {'default', replica}
+            if obj1._state.db in databases and obj2._state.db in databases:  # pylint: disable=protected-access
+                return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):  # pylint: disable=unused-argument
+        """
+        Never migrate the replica, it gets its schema from the writer.
+        """
+        if db == self._get_replica_alias():
+            return False
+        return None
+
+    @staticmethod
+    def _get_replica_alias():
+        replica = getattr(settings, 'SANCTIONS_READ_REPLICA_DATABASE', None)
+        return replica if replica in settings.DATABASES else None
+
+    @staticmethod
+    def _is_replica_fresh(replica):
+        """
+        Whether the replica serves the same SDN fallback generations as the writer.
+
+        The result is cached in this process for SANCTIONS_READ_REPLICA_FRESHNESS_CACHE_TIMEOUT seconds, for the
+        generations this process reads: once it reads new generations, the replica is checked again, as it may
+        not have caught up with them yet.
+        """
+        # Imported here to avoid loading models while routers are being set up
+        from sanctions.apps.sanctions.models import SDNFallbackMetadata  # pylint: disable=import-outside-toplevel
+        try:
+            current_metadata_ids = SDNFallbackMetadata.get_current_metadata_ids()
+        except (DatabaseError, SDNFallbackMetadata.DoesNotExist) as e:
+            logger.warning('Sanctions read replica: unable to check the freshness of [%s]: %s', replica, e)
+            return False
+
+        key = (replica, current_metadata_ids)
+        cached_response = read_replica_freshness_cache.get_cached_response(key)
+        if cached_response.is_found:
+            return cached_response.value
+
+        try:
+            is_fresh = SDNFallbackMetadata.lookup_current_metadata_ids(using=replica) == current_metadata_ids
+        except (DatabaseError, SDNFallbackMetadata.DoesNotExist) as e:
+            logger.warning('Sanctions read replica: unable to check the freshness of [%s]: %s', replica, e)
+            is_fresh = False
+
+        if not is_fresh:
+            logger.info('Sanctions read replica: [%s] is lagging, reading from the writer.', replica)
+        read_replica_freshness_cache.set(key, is_fresh, settings.SANCTIONS_READ_REPLICA_FRESHNESS_CACHE_TIMEOUT)
+        return is_fresh
@@ -0,0 +1,113 @@
+"""
+Streaming exports of the sanctions check failures and of their history, for audits.
+
+Exports are generated row by row, reading the failures (and then their history rows) in keyset ordered chunks
+(see iterate_by_keyset), so that an export takes the same memory however many failures it has. Each row is
+either a failure ('failure' record_type) or a history row of a failure ('history' record_type, with the
+history_* columns set). History rows outlive their failure, so an export may have history rows (e.g. of deletions)
+of failures it doesn't have.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from sanctions.apps.core.utils import iterate_by_keyset
+from sanctions.apps.sanctions.models import SanctionsCheckFailure
+
+FAILURE_FIELDS = (
+    'id', 'created', 'modified', 'full_name', 'username', 'lms_user_id', 'city', 'country', 'sanctions_type',
+    'system_identifier', 'metadata', 'sanctions_response', 'occurrence_count', 'last_seen',
+    'repeated_order_identifiers',
+)
+HISTORY_FIELDS = ('history_id', 'history_date', 'history_type', 'history_user_id', 'history_change_reason')
+EXPORT_COLUMNS = ('record_type',) + HISTORY_FIELDS + FAILURE_FIELDS
+
+# Content type of each export format
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/jsonl',
+}
+
+
+class _LineBuffer:
+    """
+    File-like object returning what is written to it, for csv.writer to return the lines it formats.
+    """
+
+    def write(self, value):
+        return value
+
+
+def get_history_queryset(queryset):
+    """
+    Return the history rows of the failures of the queryset, read from the database the failures are read from.
+
+    Only the history of the failures that still exist is selected. To also export the history of deleted failures,
+    select the history rows directly, e.g. by their created or history_date range.
+    """
+    history = SanctionsCheckFailure.history.using(queryset.db)  # pylint: disable=no-member
+    return history.filter(id__in=queryset.values('id'))
+
+
+def iterate_export_rows(queryset, include_history=False, history_queryset=None):
+    """
+    Yield a dict per failure of the queryset, oldest first, then per history row of these failures.
+
+    The history rows are those of history_queryset if given, or else those of the failures of the queryset
+    (see get_history_queryset).
+    """
+    chunk_size = settings.SANCTIONS_CHECK_FAILURE_REPORT_STREAM_CHUNK_SIZE
+    for failure in iterate_by_keyset(queryset, chunk_size=chunk_size):
+        yield _get_export_row('failure', failure)
+
+    if include_history:
+        history = get_history_queryset(queryset) if history_queryset is None else history_queryset
+        for record in iterate_by_keyset(history, fields=('history_id',), chunk_size=chunk_size):
+            yield _get_export_row('history', record)
+
+
+def stream_export(queryset, export_format, include_history=False, history_queryset=None):
+    """
+    Yield the lines of the export of the failures of the queryset in the given format, one of EXPORT_FORMATS.
+
+    Example:
+        >>> response = StreamingHttpResponse(stream_export(failures, 'csv'), content_type=EXPORT_FORMATS['csv'])
+    """
+    rows = iterate_export_rows(queryset, include_history=include_history, history_queryset=history_queryset)
+    if export_format == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+    elif export_format == 'csv':
+        writer = csv.writer(_LineBuffer())
+        yield writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            yield writer.writerow([_format_csv_value(row[column]) for column in EXPORT_COLUMNS])
+    else:
+        raise ValueError(f'Unknown export format [{export_format}].')
+
+
+def _get_export_row(record_type, record):
+    """
+    Return the export row of a failure or of a history row of a failure.
+    """
+    row = {'record_type': record_type}
+    for field in HISTORY_FIELDS:
+        row[field] = getattr(record, field, None)
+    for field in FAILURE_FIELDS:
+        row[field] = getattr(record, field)
+    return row
+
+
+def _format_csv_value(value):
+    """
+    Format a value of an export row as a CSV cell: JSON fields as JSON, and nothing for None.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
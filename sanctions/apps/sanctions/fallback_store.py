@@ -0,0 +1,374 @@
+"""
+Compact in-process representation of the current SDN fallback generations.
+
+Every gunicorn worker keeps the screened records of the current SDNFallbackMetadata generations in
+an SDNFallbackRecordStore, so that fallback checks don't need to query the database. Instead of model
+instances or sets of strings, the store keeps each record in a handful of flat arrays:
+
+* name and address tokens are interned once per store and stored as 4 byte token ids,
+  with one 4 byte offset per record and field into the token arrays
+* countries are stored as a bitmap over COUNTRY_CODES, i.e. COUNTRY_WORDS 8 byte words per record
+* source and sdn_type are stored as 1 byte ids into the (few) distinct values
+
+That is 42 bytes per record, plus 4 bytes per name and address token. A typical consolidated
+screening list record has less than 20 tokens, which keeps a record under 128 bytes (plus its share of
+the vocabulary, which is shared by all records). A Django model instance of the same record takes over
+1 KB, and a record holding Python sets of strings several hundred bytes.
+
+Checks don't scan the records. Once loaded, the store is indexed with a posting list per name and address
+token, i.e. the sorted (4 byte) indexes of the records having it, and the number of records of each country.
+
+A check takes the records of the posting of its rarest searched token that have the country (read from their
+country bitmap), and keeps those found, by binary search, in the postings of each other token, rarest first.
+Its cost is proportional to the length of the rarest posting, not to the number of records or to the lengths
+of the other postings. The index adds another 4 bytes per token.
+"""
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, router
+
+from sanctions.apps.core.cache import ProcessCache
+from sanctions.apps.sanctions.country_codes import COUNTRY_INDEXES
+from sanctions.apps.sanctions.models import SDNFallbackData, SDNFallbackMetadata
+
+logger = logging.getLogger(__name__)
+
+# Bit position of each country in the country bitmaps
+COUNTRY_BITS = COUNTRY_INDEXES
+COUNTRY_WORDS = (len(COUNTRY_BITS) + 63) // 64
+
+# Budget, in bytes per record, of everything but the name and address tokens (see module docstring)
+RECORD_FIXED_BYTES = 2 * 4 + COUNTRY_WORDS * 8 + 2
+TOKEN_BYTES = 4
+
+
+class SDNFallbackRecord:
+    """
+    Read-only view of one record of an SDNFallbackRecordStore.
+    """
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def source(self):
+        return self._store.sources[self._store.record_sources[self._index]]
+
+    @property
+    def sdn_type(self):
+        return self._store.sdn_types[self._store.record_types[self._index]]
+
+    @property
+    def names(self):
+        return self._store.get_tokens(self._store.name_offsets, self._store.name_tokens, self._index)
+
+    @property
+    def addresses(self):
+        return self._store.get_tokens(self._store.address_offsets, self._store.address_tokens, self._index)
+
+    @property
+    def countries(self):
+        return self._store.get_countries(self._index)
+
+    def __repr__(self):
+        return '<SDNFallbackRecord {index}: {names}>'.format(index=self._index, names=' '.join(sorted(self.names)))
+
+
+class SDNFallbackRecordStore:
+    """
+    Compact, append-only store of the screened records of the SDNFallbackMetadata generations of one or more lists.
+
+    Records are added with the processed names, addresses and countries strings stored in SDNFallbackData.
+    """
+
+    def __init__(self, generation_ids, sources=(), sdn_types=()):
+        self.generation_ids = tuple(generation_ids)
+        self.screened_sources = tuple(sources)
+        self.screened_sdn_types = tuple(sdn_types)
+        self.vocabulary = {}
+        self.sources, self._source_ids = [], {}
+        self.sdn_types, self._sdn_type_ids = [], {}
+        self.record_sources = array('B')
+        self.record_types = array('B')
+        self.name_offsets, self.name_tokens = array('I', [0]), array('I')
+        self.address_offsets, self.address_tokens = array('I', [0]), array('I')
+        self.countries = array('Q')
+        self.load_time = None
+        self._tokens = []
+        self._name_postings = self._address_postings = self._country_counts = None
+
+    @classmethod
+    def load(cls, generation_ids, sources, sdn_types):
+        """
+        Load the records of the given generations, sources and sdn_types from the database.
+
+        They are read from the read replica only if its current generations are the given ones: a replica still
+        catching up with a swap could hold a part of them, and the store is kept for as long as they are current.
+        """
+        store = cls(generation_ids, sources, sdn_types)
+        database = router.db_for_read(SDNFallbackData)
+        if database != DEFAULT_DB_ALIAS and not _serves_generations(database, generation_ids):
+            database = DEFAULT_DB_ALIAS
+        records = SDNFallbackData.objects.using(database).filter(
+            sdn_fallback_metadata_id__in=list(generation_ids), source__in=list(sources), sdn_type__in=list(sdn_types)
+        ).values_list('source', 'sdn_type', 'names', 'addresses', 'countries')
+        for source, sdn_type, names, addresses, countries in records.iterator(chunk_size=2000):
+            store.add(source, sdn_type, names, addresses, countries)
+        store.build_index()
+        return store
+
+    def add(self, source, sdn_type, names, addresses, countries):
+        """
+        Append a record.
+
+        Args:
+            source (str): source of the record
+            sdn_type (str): type of the record
+            names (str): space separated processed name tokens
+            addresses (str): space separated processed address tokens
+            countries (str): space separated alpha_2 country codes
+        """
+        self.record_sources.append(self._get_value_id(source, self.sources, self._source_ids))
+        self.record_types.append(self._get_value_id(sdn_type, self.sdn_types, self._sdn_type_ids))
+        self.name_tokens.extend(self._intern(token) for token in set(names.split()))
+        self.name_offsets.append(len(self.name_tokens))
+        self.address_tokens.extend(self._intern(token) for token in set(addresses.split()))
+        self.address_offsets.append(len(self.address_tokens))
+        bitmap = [0] * COUNTRY_WORDS
+        for country in countries.split():
+            bit = COUNTRY_BITS.get(country)
+            if bit is not None:
+                bitmap[bit // 64] |= 1 << (bit % 64)
+        self.countries.extend(bitmap)
+        self._country_counts = None
+
+    def build_index(self):
+        """
+        Build the token posting lists and country record counts used by count_hits.
+
+        Called once the store is loaded; count_hits rebuilds the index if records were added since.
+        """
+        self._name_postings = self._build_postings(self.name_offsets, self.name_tokens)
+        self._address_postings = self._build_postings(self.address_offsets, self.address_tokens)
+        country_counts = {}
+        for word_position, word in enumerate(self.countries):
+            while word:
+                low_bit = word & -word
+                bit = (word_position % COUNTRY_WORDS) * 64 + low_bit.bit_length() - 1
+                country_counts[bit] = country_counts.get(bit, 0) + 1
+                word ^= low_bit
+        self._country_counts = country_counts
+
+    def count_hits(self, name_tokens, city_tokens, country):
+        """
+        Count the records in the given country whose names and addresses contain all of the given tokens.
+
+        Args:
+            name_tokens (set): processed name tokens, as returned by process_text
+            city_tokens (set): processed city tokens, as returned by process_text
+            country (str): alpha_2 country code
+
+        Returns:
+            hit_count (int): number of matching records
+        """
+        bit = COUNTRY_BITS.get(country)
+        name_ids, city_ids = self._lookup(name_tokens), self._lookup(city_tokens)
+        if bit is None or name_ids is None or city_ids is None:
+            return 0
+
+        if self._country_counts is None:
+            self.build_index()
+        postings = sorted(
+            [self._get_postings(self._name_postings, token_id) for token_id in name_ids] +
+            [self._get_postings(self._address_postings, token_id) for token_id in city_ids],
+            key=len
+        )
+        if not postings:
+            return self._country_counts.get(bit, 0)
+
+        countries, word_offset, country_mask = self.countries, bit // 64, 1 << (bit % 64)
+        candidates = [
+            index for index in postings[0] if countries[index * COUNTRY_WORDS + word_offset] & country_mask
+        ]
+        for records in postings[1:]:
+            if not candidates:
+                break
+            candidates = self._intersect(candidates, records)
+        return len(candidates)
+
+    def get_tokens(self, offsets, tokens, index):
+        """
+        Return the set of tokens of a record, from one of the token arrays and its offsets.
+        """
+        return {self._tokens[token_id] for token_id in tokens[offsets[index]:offsets[index + 1]]}
+
+    def get_countries(self, index):
+        """
+        Return the set of country codes of a record.
+        """
+        words = self.countries[index * COUNTRY_WORDS:(index + 1) * COUNTRY_WORDS]
+        return {
+            country for country, bit in COUNTRY_BITS.items() if words[bit // 64] & (1 << (bit % 64))
+        }
+
+    @property
+    def nbytes(self):
+        """
+        Bytes used by the record arrays and their index, excluding the shared vocabulary.
+        """
+        buffers = [
+            self.record_sources, self.record_types, self.name_offsets, self.name_tokens,
+            self.address_offsets, self.address_tokens, self.countries,
+        ]
+        for postings in (self._name_postings, self._address_postings):
+            if postings is not None:
+                buffers.extend(postings)
+        return sum(buffer.itemsize * len(buffer) for buffer in buffers)
+
+    def __len__(self):
+        return len(self.record_sources)
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return SDNFallbackRecord(self, index)
+
+    def _intern(self, token):
+        """
+        Return the id of the token, adding it to the vocabulary if needed.
+        """
+        token_id = self.vocabulary.get(token)
+        if token_id is None:
+            token_id = self.vocabulary[token] = len(self._tokens)
+            self._tokens.append(token)
+        return token_id
+
+    def _lookup(self, tokens):
+        """
+        Map tokens to their ids, or return None if any of them is not in the vocabulary (and can't match).
+        """
+        token_ids = set()
+        for token in tokens or ():
+            token_id = self.vocabulary.get(token)
+            if token_id is None:
+                return None
+            token_ids.add(token_id)
+        return token_ids
+
+    def _build_postings(self, offsets, tokens):
+        """
+        Invert one of the token arrays into posting lists, returned as (posting offsets, record indexes).
+
+        The records having token id t are record_indexes[posting_offsets[t]:posting_offsets[t + 1]].
+        """
+        posting_offsets = array('I', [0]) * (len(self._tokens) + 1)
+        for token_id in tokens:
+            posting_offsets[token_id + 1] += 1
+        for token_id in range(len(self._tokens)):
+            posting_offsets[token_id + 1] += posting_offsets[token_id]
+
+        cursors = posting_offsets[:-1]
+        record_indexes = array('I', [0]) * len(tokens)
+        for index in range(len(self)):
+            for token_id in tokens[offsets[index]:offsets[index + 1]]:
+                record_indexes[cursors[token_id]] = index
+                cursors[token_id] += 1
+        return posting_offsets, record_indexes
+
+    @staticmethod
+    def _intersect(candidates, records):
+        """
+        Return the (sorted) candidate record indexes found in the (sorted) records of a posting.
+
+        Each candidate is binary searched from the position of the previous one, so intersecting a few
+        candidates with a long posting only reads a few of its records.
+        """
+        found, low = [], 0
+        for index in candidates:
+            low = bisect_left(records, index, low)
+            if low == len(records):
+                break
+            if records[low] == index:
+                found.append(index)
+        return found
+
+    @staticmethod
+    def _get_postings(postings, token_id):
+        """
+        Return the indexes of the records having the token, from one of the posting lists.
+        """
+        posting_offsets, record_indexes = postings
+        return record_indexes[posting_offsets[token_id]:posting_offsets[token_id + 1]]
+
+    @staticmethod
+    def _get_value_id(value, values, value_ids):
+        """
+        Return the id of a source or sdn_type value, adding it to the known values if needed.
+        """
+        value_id = value_ids.get(value)
+        if value_id is None:
+            value_id = value_ids[value] = len(values)
+            values.append(value)
+        return value_id
+
+
+# Only the store of the current generations is kept, a new generation of any list replaces it
+record_store_cache = ProcessCache('sdn_fallback_record_store', timeout=24 * 60 * 60, max_size=1)
+record_store_lock = threading.Lock()
+
+
+def _serves_generations(database, generation_ids):
+    """
+    Whether the given database's current generations are the given ones.
+    """
+    try:
+        return SDNFallbackMetadata.lookup_current_metadata_ids(using=database) == tuple(generation_ids)
+    except (DatabaseError, SDNFallbackMetadata.DoesNotExist):
+        return False
+
+
+def get_loaded_record_store(sources, sdn_types):
+    """
+    Return this process' record store of the current generations if it is loaded, or None.
+
+    Raises:
+        Exception: if the fallback data is not yet populated
+    """
+    key = (SDNFallbackData.get_current_generation_ids(), tuple(sources), tuple(sdn_types))
+    cached_response = record_store_cache.get_cached_response(key)
+    return cached_response.value if cached_response.is_found else None
+
+
+def get_current_record_store(sources, sdn_types):
+    """
+    Return this process' record store of the current generations, loading it if needed.
+
+    Raises:
+        Exception: if the fallback data is not yet populated
+    """
+    record_store = get_loaded_record_store(sources, sdn_types)
+    if record_store is not None:
+        return record_store
+
+    key = (SDNFallbackData.get_current_generation_ids(), tuple(sources), tuple(sdn_types))
+    with record_store_lock:
+        # Another thread may have loaded the store while we were waiting for the lock
+        cached_response = record_store_cache.get_cached_response(key)
+        if cached_response.is_found:
+            return cached_response.value
+
+        start = time.perf_counter()
+        store = SDNFallbackRecordStore.load(*key)
+        store.load_time = time.perf_counter() - start
+        logger.info(
+            "Sanctions SDNFallback: Loaded %d records of generations %s in %.3f seconds (%d bytes).",
+            len(store), store.generation_ids, store.load_time, store.nbytes
+        )
+        record_store_cache.set(key, store)
+    return store
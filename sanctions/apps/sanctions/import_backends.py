@@ -0,0 +1,239 @@
+"""
+Backends writing the normalized rows of a list into a new SDN fallback generation.
+
+The ORM backend bulk creates SDNFallbackData instances, one chunk at a time. The bulk load backend instead writes
+the rows to a tab separated file, loads the file into a staging table with the database's native bulk loader
+(LOAD DATA LOCAL INFILE on MySQL), and then promotes the whole staging table into the generation with a single
+INSERT ... SELECT, so that the import time is dominated by I/O rather than by building model instances and
+statements in Python.
+
+On MySQL, the bulk load backend needs local_infile to be enabled on the server, and on the client with
+'OPTIONS': {'local_infile': 1} in DATABASES.
+"""
+import abc
+import itertools
+import logging
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router
+
+from sanctions.apps.sanctions.models import SDNFallbackData
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = 'sanctions_sdnfallbackdata_staging'
+# Columns of the staging file and table, in order
+STAGING_COLUMNS = ('source', 'sdn_type', 'names', 'addresses', 'countries')
+
+# The escapes of LOAD DATA's default format (FIELDS TERMINATED BY '\t' ESCAPED BY '\\' LINES TERMINATED BY '\n')
+_ESCAPES = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'}
+_ESCAPE_RE = re.compile('[\\\\\t\n\r\0]')
+_UNESCAPES = {escaped[1]: character for character, escaped in _ESCAPES.items()}
+_UNESCAPE_RE = re.compile(r'\\(.)')
+
+
+class ImportBackend(abc.ABC):
+    """
+    Base class of the backends inserting the records of a new SDN fallback generation.
+
+    Attributes:
+        name (str): identifies the backend in SDN_FALLBACK_IMPORT_BACKEND
+    """
+    name = None
+
+    @abc.abstractmethod
+    def load(self, records, metadata_entry):
+        """
+        Insert the records into the generation of the given metadata.
+
+        Args:
+            records (iterable): normalized (source, sdn_type, names, addresses, countries) tuples, as yielded by
+                utils.iter_normalized_sdn_rows
+            metadata_entry (SDNFallbackMetadata): generation of the records
+        """
+
+
+class ORMImportBackend(ImportBackend):
+    """
+    Bulk create SDNFallbackData instances, SDN_FALLBACK_IMPORT_CHUNK_SIZE records at a time.
+    """
+    name = 'orm'
+
+    def load(self, records, metadata_entry):
+        chunk_size = settings.SDN_FALLBACK_IMPORT_CHUNK_SIZE
+        records = iter(records)
+        while True:
+            processed_records = [
+                SDNFallbackData(
+                    sdn_fallback_metadata=metadata_entry,
+                    source=sdn_source,
+                    sdn_type=sdn_type,
+                    names=processed_names,
+                    addresses=processed_addresses,
+                    countries=countries
+                )
+                for sdn_source, sdn_type, processed_names, processed_addresses, countries
+                in itertools.islice(records, chunk_size)
+            ]
+            if not processed_records:
+                break
+            SDNFallbackData.objects.bulk_create(processed_records)
+
+
+class BulkLoadImportBackend(ImportBackend):
+    """
+    Load the records into a staging table with the database's native bulk loader, then promote them into the
+    generation with a single INSERT ... SELECT.
+    """
+    name = 'bulk_load'
+    vendors = ('mysql', 'sqlite')
+
+    def load(self, records, metadata_entry):
+        connection = connections[router.db_for_write(SDNFallbackData)]
+        with tempfile.NamedTemporaryFile('w+', encoding='utf-8', newline='', suffix='.tsv') as staging_file:
+            write_staging_file(records, staging_file)
+            staging_file.flush()
+            with connection.cursor() as cursor:
+                cursor.execute(self._get_create_staging_table_sql(connection))
+                try:
+                    if connection.vendor == 'mysql':
+                        self._load_staging_file_mysql(cursor, connection, staging_file)
+                    else:
+                        self._load_staging_file_executemany(cursor, connection, staging_file)
+                    cursor.execute(*self._get_promote_sql(connection, metadata_entry))
+                finally:
+                    cursor.execute(self._get_drop_staging_table_sql(connection))
+
+    @staticmethod
+    def _get_create_staging_table_sql(connection):
+        """
+        SQL creating the staging table, a temporary table private to the connection.
+        """
+        quote_name = connection.ops.quote_name
+        columns = ', '.join(
+            '{column} {db_type}'.format(
+                column=quote_name(column), db_type=SDNFallbackData._meta.get_field(column).db_type(connection)
+            )
+            for column in STAGING_COLUMNS
+        )
+        return 'CREATE TEMPORARY TABLE {staging_table} ({columns})'.format(
+            staging_table=quote_name(STAGING_TABLE), columns=columns
+        )
+
+    @staticmethod
+    def _get_drop_staging_table_sql(connection):
+        """
+        SQL dropping the staging table, without committing the import's transaction.
+        """
+        # On MySQL, only DROP TEMPORARY TABLE doesn't implicitly commit
+        return '{drop} {staging_table}'.format(
+            drop='DROP TEMPORARY TABLE' if connection.vendor == 'mysql' else 'DROP TABLE',
+            staging_table=connection.ops.quote_name(STAGING_TABLE),
+        )
+
+    @staticmethod
+    def _load_staging_file_mysql(cursor, connection, staging_file):
+        """
+        Load the staging file with LOAD DATA LOCAL INFILE, in its default format.
+        """
+        cursor.execute(
+            'LOAD DATA LOCAL INFILE %s INTO TABLE {staging_table} CHARACTER SET utf8mb4 ({columns})'.format(
+                staging_table=connection.ops.quote_name(STAGING_TABLE),
+                columns=', '.join(connection.ops.quote_name(column) for column in STAGING_COLUMNS),
+            ),
+            [staging_file.name]
+        )
+
+    @staticmethod
+    def _load_staging_file_executemany(cursor, connection, staging_file):
+        """
+        Load the staging file with batched inserts, for databases without a bulk loader reachable from the client
+        (i.e. SQLite).
+        """
+        sql = 'INSERT INTO {staging_table} ({columns}) VALUES ({placeholders})'.format(
+            staging_table=connection.ops.quote_name(STAGING_TABLE),
+            columns=', '.join(connection.ops.quote_name(column) for column in STAGING_COLUMNS),
+            placeholders=', '.join(['%s'] * len(STAGING_COLUMNS)),
+        )
+        staging_file.seek(0)
+        rows = read_staging_file(staging_file)
+        while True:
+            chunk = list(itertools.islice(rows, settings.SDN_FALLBACK_IMPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+            cursor.executemany(sql, chunk)
+
+    @staticmethod
+    def _get_promote_sql(connection, metadata_entry):
+        """
+        SQL and params inserting the staged records into the generation of the given metadata.
+        """
+        quote_name = connection.ops.quote_name
+        columns = ', '.join(quote_name(SDNFallbackData._meta.get_field(column).column) for column in STAGING_COLUMNS)
+        sql = 'INSERT INTO {table} ({metadata_column}, {columns}) SELECT %s, {columns} FROM {staging_table}'.format(
+            table=quote_name(SDNFallbackData._meta.db_table),
+            metadata_column=quote_name(SDNFallbackData._meta.get_field('sdn_fallback_metadata').column),
+            columns=columns,
+            staging_table=quote_name(STAGING_TABLE),
+        )
+        return sql, [metadata_entry.id]
+
+
+def write_staging_file(records, staging_file):
+    """
+    Write the records to a tab separated file in the default format of LOAD DATA, returning the number of records.
+    """
+    row_count = 0
+    for record in records:
+        staging_file.write('\t'.join(_ESCAPE_RE.sub(lambda match: _ESCAPES[match[0]], value) for value in record))
+        staging_file.write('\n')
+        row_count += 1
+    return row_count
+
+
+def read_staging_file(staging_file):
+    """
+    Yield the records of a staging file, as tuples of values.
+    """
+    for line in staging_file:
+        yield tuple(
+            _UNESCAPE_RE.sub(lambda match: _UNESCAPES.get(match[1], match[1]), value)
+            for value in line.rstrip('\n').split('\t')
+        )
+
+
+IMPORT_BACKENDS = {
+    import_backend.name: import_backend for import_backend in (
+        ORMImportBackend(),
+        BulkLoadImportBackend(),
+    )
+}
+
+
+def get_import_backend(name=None):
+    """
+    Return the import backend with the given name, SDN_FALLBACK_IMPORT_BACKEND by default.
+
+    Raises ImproperlyConfigured for unknown names.
+    Falls back to the ORM backend, with a warning, if the bulk load backend doesn't support the database.
+    """
+    name = name or settings.SDN_FALLBACK_IMPORT_BACKEND
+    import_backend = IMPORT_BACKENDS.get(name)
+    if import_backend is None:
+        raise ImproperlyConfigured(
+            'Unknown SDN fallback import backend [{name}], expected one of: {names}.'.format(
+                name=name, names=', '.join(IMPORT_BACKENDS)
+            )
+        )
+    if isinstance(import_backend, BulkLoadImportBackend):
+        vendor = connections[router.db_for_write(SDNFallbackData)].vendor
+        if vendor not in import_backend.vendors:
+            logger.warning(
+                "Sanctions SDNFallback: The [%s] import backend doesn't support %s, using the [%s] backend instead.",
+                name, vendor, ORMImportBackend.name
+            )
+            return IMPORT_BACKENDS[ORMImportBackend.name]
+    return import_backend
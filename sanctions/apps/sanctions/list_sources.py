@@ -0,0 +1,286 @@
+"""
+Screening lists imported into the SDN fallback.
+
+Each list source downloads one screening list and parses it into rows shaped like the rows of the trade.gov
+consolidated screening list CSV, i.e. dicts with source, type, name, addresses, alt_names and ids keys. All
+lists then share the same normalization (see utils.normalize_sdn_csv_rows), and each list is imported into
+its own SDNFallbackMetadata generations.
+
+Parsers stream the downloaded file, so that lists much larger than the CSV can be imported in constant memory.
+"""
+import abc
+import csv
+import io
+import logging
+from collections import defaultdict
+
+from defusedxml.ElementTree import iterparse
+from django.conf import settings
+
+from sanctions.apps.sanctions.constants import SDN_FALLBACK_DEFAULT_LIST_SOURCE, SDN_FALLBACK_SOURCES_BY_ABBREVIATION
+
+logger = logging.getLogger(__name__)
+
+
+class ListSource(abc.ABC):
+    """
+    Base class of the screening lists imported into the SDN fallback.
+
+    Attributes:
+        name (str): identifies the list, stored in SDNFallbackMetadata.list_source
+        label (str): describes the downloaded file in logs
+        file_type (str): format of the downloaded file
+        url_setting (str): name of the setting holding the download url
+        screened_sources (tuple): SDNFallbackData sources of the list that are always screened by the fallback.
+            The sources of the consolidated screening list are instead screened according to SDN_CHECK_API_LIST.
+    """
+    name = None
+    label = None
+    file_type = None
+    url_setting = None
+    screened_sources = ()
+
+    @property
+    def url(self):
+        return getattr(settings, self.url_setting)
+
+    @abc.abstractmethod
+    def iter_rows(self, sdn_file):
+        """
+        Yield the rows of the downloaded list.
+
+        Args:
+            sdn_file (file): binary file object of the downloaded list
+
+        Yields:
+            row (dict): row with the consolidated screening list CSV's source, type, name, addresses,
+            alt_names and ids keys
+        """
+
+    def __repr__(self):
+        return '<{cls} {name}>'.format(cls=self.__class__.__name__, name=self.name)
+
+
+class ConsolidatedScreeningListSource(ListSource):
+    """
+    The trade.gov consolidated screening list CSV, which consolidates the export screening lists of the
+    Departments of Commerce, State and the Treasury.
+    """
+    name = SDN_FALLBACK_DEFAULT_LIST_SOURCE
+    label = 'SDN CSV'
+    file_type = 'CSV'
+    url_setting = 'CONSOLIDATED_SCREENING_LIST_URL'
+
+    def iter_rows(self, sdn_file):
+        text_file = io.TextIOWrapper(sdn_file, encoding='utf-8', newline='')
+        try:
+            yield from csv.DictReader(text_file)
+        finally:
+            # Leave the downloaded file open, it belongs to the caller
+            text_file.detach()
+
+
+class EUConsolidatedListSource(ListSource):
+    """
+    The EU consolidated list of persons, groups and entities subject to EU financial sanctions, in its
+    XML (version 1.1) format.
+    """
+    name = 'EU'
+    label = 'EU consolidated list XML'
+    file_type = 'XML'
+    url_setting = 'EU_CONSOLIDATED_LIST_URL'
+    source = 'EU Consolidated Financial Sanctions List'
+    screened_sources = (source,)
+
+    def iter_rows(self, sdn_file):
+        root = None
+        for event, element in iterparse(sdn_file, events=('start', 'end')):
+            if root is None:
+                root = element
+            if event == 'end' and _local_name(element.tag) == 'sanctionEntity':
+                yield self._get_row(element)
+                # Drop the parsed entities, so that memory use doesn't grow with the size of the list
+                root.clear()
+
+    def _get_row(self, entity):
+        """
+        Map a sanctionEntity element to a row.
+        """
+        subject_type, names, addresses, ids = '', [], [], []
+        for child in entity:
+            tag = _local_name(child.tag)
+            if tag == 'subjectType':
+                subject_type = child.get('code', '')
+            elif tag == 'nameAlias' and child.get('wholeName'):
+                names.append(child.get('wholeName'))
+            elif tag == 'address':
+                # As in the CSV, the country code ends each address
+                addresses.append(', '.join(filter(None, (
+                    child.get('street'), child.get('city'), child.get('zipCode'), child.get('countryIso2Code'),
+                ))))
+            elif tag == 'identification' and child.get('countryIso2Code'):
+                # As in the CSV, the country code starts each id
+                ids.append('{country}, {number}'.format(
+                    country=child.get('countryIso2Code'), number=child.get('number', '')
+                ))
+        return {
+            'source': self.source,
+            'type': 'Individual' if subject_type == 'person' else 'Entity',
+            'name': names[0] if names else '',
+            'addresses': '; '.join(filter(None, addresses)),
+            'alt_names': '; '.join(names[1:]),
+            'ids': '; '.join(ids),
+        }
+
+
+class OFACAdvancedListSource(ListSource):
+    """
+    The OFAC SDN list in its advanced XML format, an alternative to the SDN records of the consolidated
+    screening list, with structured aliases and locations.
+
+    Its records have the consolidated screening list's SDN source, so they are screened according to
+    SDN_CHECK_API_LIST. Only one of the two lists should be imported.
+
+    The file starts with reference values (countries, party types, ...), locations and id documents, which
+    are kept in memory, as the parties refer to them. The parties, i.e. the bulk of the file, are then mapped
+    to rows one at a time, and dropped once mapped.
+    """
+    name = 'OFAC'
+    label = 'OFAC SDN advanced XML'
+    file_type = 'XML'
+    url_setting = 'OFAC_SDN_ADVANCED_XML_URL'
+    source = SDN_FALLBACK_SOURCES_BY_ABBREVIATION['SDN']
+
+    def iter_rows(self, sdn_file):
+        reference_values = defaultdict(dict)
+        locations, documents = {}, defaultdict(list)
+        # Ancestors of the current element, the root first
+        path = []
+        for event, element in iterparse(sdn_file, events=('start', 'end')):
+            if event == 'start':
+                path.append(element)
+                continue
+
+            path.pop()
+            tag, depth = _local_name(element.tag), len(path)
+            if depth == 3 and _local_name(path[1].tag) == 'ReferenceValueSets':
+                reference_values[tag][element.get('ID')] = (dict(element.attrib), element.text)
+            elif depth == 2:
+                if tag == 'Location':
+                    locations[element.get('ID')] = self._get_address(element, reference_values)
+                elif tag == 'IDRegDocument':
+                    country = reference_values['Country'].get(element.get('IssuedBy-CountryID'))
+                    number = next(_children(element, 'IDRegistrationNo'), None)
+                    if country and country[0].get('ISO2'):
+                        documents[element.get('IdentityID')].append('{country}, {number}'.format(
+                            country=country[0]['ISO2'], number=number.text if number is not None else ''
+                        ))
+                elif tag == 'DistinctParty':
+                    yield self._get_row(element, reference_values, locations, documents)
+                # Drop every finished element of the sections, e.g. the mapped parties and the reference value
+                # sets, so that memory use doesn't grow with the size of the list
+                path[1].clear()
+            elif depth == 1:
+                path[0].clear()
+
+    @staticmethod
+    def _get_address(location, reference_values):
+        """
+        Map a Location element to an address which, as in the CSV, ends with the country code.
+        """
+        parts = [
+            value.text for part in _children(location, 'LocationPart') for value in _descendants(part, 'Value')
+            if value.text
+        ]
+        for location_country in _children(location, 'LocationCountry'):
+            country = reference_values['Country'].get(location_country.get('CountryID'))
+            if country and country[0].get('ISO2'):
+                parts.append(country[0]['ISO2'])
+        return ', '.join(parts)
+
+    def _get_row(self, party, reference_values, locations, documents):
+        """
+        Map a DistinctParty element to a row.
+        """
+        names, addresses, ids, party_type = [], [], [], ''
+        for profile in _children(party, 'Profile'):
+            party_sub_type = reference_values['PartySubType'].get(profile.get('PartySubTypeID'))
+            if party_sub_type:
+                party_type = reference_values['PartyType'].get(party_sub_type[0].get('PartyTypeID'), ({}, ''))[1]
+
+            for identity in _children(profile, 'Identity'):
+                ids.extend(documents.get(identity.get('ID'), ()))
+                for alias in _children(identity, 'Alias'):
+                    for documented_name in _children(alias, 'DocumentedName'):
+                        name = ' '.join(
+                            value.text for value in _descendants(documented_name, 'NamePartValue') if value.text
+                        )
+                        # The primary name comes first
+                        if alias.get('Primary') == 'true':
+                            names.insert(0, name)
+                        else:
+                            names.append(name)
+
+            for feature in _children(profile, 'Feature'):
+                feature_type = reference_values['FeatureType'].get(feature.get('FeatureTypeID'), ({}, ''))[1]
+                if feature_type == 'Location':
+                    addresses.extend(
+                        locations.get(version_location.get('LocationID'))
+                        for version_location in _descendants(feature, 'VersionLocation')
+                    )
+        return {
+            'source': self.source,
+            'type': party_type or '',
+            'name': names[0] if names else '',
+            'addresses': '; '.join(filter(None, addresses)),
+            'alt_names': '; '.join(names[1:]),
+            'ids': '; '.join(ids),
+        }
+
+
+def _local_name(tag):
+    """
+    Strip the namespace of an XML tag.
+    """
+    return tag.rsplit('}', 1)[-1]
+
+
+def _children(element, name):
+    """
+    Yield the children of an element with the given tag, regardless of its namespace.
+    """
+    return (child for child in element if _local_name(child.tag) == name)
+
+
+def _descendants(element, name):
+    """
+    Yield the descendants of an element with the given tag, regardless of its namespace.
+    """
+    return (descendant for descendant in element.iter() if _local_name(descendant.tag) == name)
+
+
+LIST_SOURCES = {
+    list_source.name: list_source for list_source in (
+        ConsolidatedScreeningListSource(),
+        EUConsolidatedListSource(),
+        OFACAdvancedListSource(),
+    )
+}
+
+
+def get_list_sources(names=None):
+    """
+    Return the list sources with the given names, SDN_FALLBACK_LIST_SOURCES by default.
+
+    Unknown names are logged and skipped.
+    """
+    list_sources = []
+    for name in settings.SDN_FALLBACK_LIST_SOURCES if names is None else names:
+        list_source = LIST_SOURCES.get(name)
+        if list_source is None:
+            logger.warning(
+                "Sanctions SDNFallback: Unknown list source [%s] in SDN_FALLBACK_LIST_SOURCES, skipping it.", name
+            )
+            continue
+        list_sources.append(list_source)
+    return list_sources
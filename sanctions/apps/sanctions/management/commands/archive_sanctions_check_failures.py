@@ -0,0 +1,76 @@
+"""
+Django management command archiving the old sanctions check failures and their history out of the database.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from sanctions.apps.sanctions.retention import archive_sanctions_check_failures, get_archive_storage
+
+
+class Command(BaseCommand):
+    """
+    Command moving the sanctions check failures older than the retention period, and their history, to gzip
+    compressed JSON Lines archives. Meant to run daily.
+    """
+    help = 'Move the sanctions check failures older than the retention period, and their history, to archives.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            metavar='N',
+            type=int,
+            default=settings.SANCTIONS_CHECK_FAILURE_RETENTION_DAYS,
+            help='Archive the failures created more than N days ago. Defaults to SANCTIONS_CHECK_FAILURE_RETENTION_DAYS'
+        )
+        parser.add_argument(
+            '--archive-dir',
+            metavar='PATH',
+            help='Local directory to save the archives to, instead of SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE or '
+                 'SANCTIONS_CHECK_FAILURE_ARCHIVE_DIR'
+        )
+        parser.add_argument(
+            '--batch-size',
+            metavar='N',
+            type=int,
+            default=settings.SANCTIONS_CHECK_FAILURE_ARCHIVE_BATCH_SIZE,
+            help='Number of failures archived, and deleted, at a time'
+        )
+        parser.add_argument(
+            '--pause',
+            metavar='SECONDS',
+            type=float,
+            default=settings.SANCTIONS_CHECK_FAILURE_ARCHIVE_PAUSE,
+            help='Time to wait between batches, to leave room for the hits being recorded'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the number of failures to archive without archiving them'
+        )
+
+    def handle(self, *args, **options):
+        if options['retention_days'] < 1:
+            raise CommandError('--retention-days must be at least 1.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        storage = get_archive_storage(options['archive_dir'])
+        if storage is None and not options['dry_run']:
+            raise CommandError(
+                'Set SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE or SANCTIONS_CHECK_FAILURE_ARCHIVE_DIR, or --archive-dir.'
+            )
+
+        created_before = timezone.now() - timedelta(days=options['retention_days'])
+        archived_count = archive_sanctions_check_failures(
+            created_before,
+            storage,
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{archived_count} failures created before {created_before.isoformat()} to archive.')
+        else:
+            self.stdout.write(f'Archived {archived_count} failures created before {created_before.isoformat()}.')
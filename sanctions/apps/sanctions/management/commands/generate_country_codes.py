@@ -0,0 +1,74 @@
+"""
+Django management command generating the static table of country codes from pycountry.
+"""
+import os
+from importlib.metadata import version
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sanctions.apps.sanctions import country_codes
+
+CODES_PER_LINE = 16
+
+MODULE_TEMPLATE = '''"""
+ISO 3166-1 alpha-2 codes of all countries, used to validate the country codes extracted from the screening lists
+and to index the countries of the SDN fallback records.
+
+Generated from pycountry by the generate_country_codes management command, so that workers don't load the ISO 3166
+database of pycountry. Don't edit it by hand.
+"""
+# Version of pycountry the codes were generated from
+COUNTRY_CODES_VERSION = '{version}'
+
+COUNTRY_CODES = (
+{lines}
+)
+
+# Index of each country code in COUNTRY_CODES, e.g. the bit of the country in the country bitmaps
+COUNTRY_INDEXES = {{country_code: index for index, country_code in enumerate(COUNTRY_CODES)}}
+'''
+
+
+def render_country_codes_module():
+    """
+    Return the source of the country_codes module, generated from the installed pycountry.
+    """
+    import pycountry  # pylint: disable=import-outside-toplevel
+
+    codes = sorted(country.alpha_2 for country in pycountry.countries)
+    lines = [
+        '    ' + ' '.join(f"'{code}'," for code in codes[start:start + CODES_PER_LINE])
+        for start in range(0, len(codes), CODES_PER_LINE)
+    ]
+    return MODULE_TEMPLATE.format(version=version('pycountry'), lines='\n'.join(lines))
+
+
+class Command(BaseCommand):
+    """
+    Command regenerating sanctions/apps/sanctions/country_codes.py, e.g. after upgrading pycountry.
+    """
+    help = 'Generate the static table of country codes from pycountry.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Fail if the table doesn't match the installed pycountry, instead of regenerating it"
+        )
+
+    def handle(self, *args, **options):
+        path = os.path.splitext(country_codes.__file__)[0] + '.py'
+        source = render_country_codes_module()
+        with open(path, encoding='utf-8') as module_file:
+            is_current = module_file.read() == source
+
+        if options['check']:
+            if not is_current:
+                raise CommandError(
+                    f'{path} is out of date with pycountry {version("pycountry")}, run generate_country_codes.'
+                )
+            self.stdout.write(f'{path} is up to date.')
+        elif not is_current:
+            with open(path, 'w', encoding='utf-8') as module_file:
+                module_file.write(source)
+            self.stdout.write(f'Generated {path} from pycountry {version("pycountry")}.')
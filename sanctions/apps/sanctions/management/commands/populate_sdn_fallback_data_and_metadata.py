@@ -1,24 +1,43 @@
 """
 Django management command to download SDN CSV for use as fallback if the trade.gov SDN API is down.
 """
+import cProfile
 import logging
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
-import opsgenie_sdk
 import requests
 from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 from requests.exceptions import Timeout
 
-from sanctions.apps.sanctions.utils import populate_sdn_fallback_data_and_metadata
+from sanctions.apps.core.profiling import StageProfiler
+from sanctions.apps.sanctions.list_sources import get_list_sources
+from sanctions.apps.sanctions.models import SDNFallbackMetadata
+from sanctions.apps.sanctions.utils import (
+    dry_run_sdn_fallback_import,
+    get_file_checksum,
+    populate_sdn_fallback_data_and_metadata
+)
 
 logger = logging.getLogger(__name__)
 
+# Outcomes of the import of a list
+IMPORTED = 'imported'
+UNCHANGED = 'unchanged'
+SKIPPED = 'skipped'
+
+# Size of the chunks the lists are downloaded by, so that a list is never held in memory as a whole
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
 
 class Command(BaseCommand):
     """
     Command to download the SDN CSV to be saved as a fallback. Runs every 15 minutes.
+
+    Along with the SDN CSV, downloads the other screening lists configured in SDN_FALLBACK_LIST_SOURCES.
+    Each list is imported into its own generations, independently of the others.
     """
     help = 'Download the SDN CSV from trade.gov, for use as fallback for when their SDN API is down.'
 
@@ -31,11 +50,37 @@ class Command(BaseCommand):
             default=3,  # typical size is > 4 MB; 3 MB would be unexpectedly low
             help='File size MB threshold, under which we will not import it. Use default if argument not specified'
         )
+        parser.add_argument(
+            '--workers',
+            metavar='N',
+            action='store',
+            type=int,
+            default=1,
+            help='Number of worker processes used to process the CSV rows. Defaults to processing them in-process'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Download, parse and normalize the lists without touching the database, and report what was found'
+        )
+        parser.add_argument(
+            '--profile',
+            action='store_true',
+            help='Along with --dry-run, report the time taken by each stage, the rows per second and the peak RSS'
+        )
+        parser.add_argument(
+            '--profile-output',
+            metavar='PATH',
+            help='Along with --dry-run, write cProfile stats of the run to PATH (implies --profile)'
+        )
 
     def _hit_opsgenie_heartbeat(self):
         """
         Hit OpsGenie heartbeat to indicate that the fallback job has run successfully recently.
         """
+        # Only needed once the import succeeded, and slow to import
+        import opsgenie_sdk  # pylint: disable=import-outside-toplevel
+
         og_sdk_config = opsgenie_sdk.configuration.Configuration()
         og_sdk_config.api_key['Authorization'] = settings.OPSGENIE_API_KEY
         og_api_client = opsgenie_sdk.api_client.ApiClient(configuration=og_sdk_config)
@@ -50,52 +95,215 @@ class Command(BaseCommand):
         logger.info(f'result: {response.result}')
 
     def handle(self, *args, **options):
-        # download the CSV locally, to check size and pass along to import
         threshold = options['threshold']
-        url = settings.CONSOLIDATED_SCREENING_LIST_URL
+        workers = options['workers']
+        profile = options['profile'] or bool(options['profile_output'])
+        list_sources = get_list_sources()
+
+        if options['dry_run']:
+            self._dry_run(list_sources, threshold, workers, profile, options['profile_output'])
+            return
+        if profile:
+            raise CommandError('--profile and --profile-output can only be used along with --dry-run.')
+
+        if len(list_sources) == 1:
+            outcomes = [self._import_list_source(list_sources[0], threshold, workers)]
+        else:
+            # Lists are downloaded and imported concurrently, so that a slow list doesn't delay the others
+            with ThreadPoolExecutor(max_workers=len(list_sources)) as executor:
+                futures = [
+                    executor.submit(self._import_list_source_in_thread, list_source, threshold, workers)
+                    for list_source in list_sources
+                ]
+            errors = [future.exception() for future in futures if future.exception()]
+            if errors:
+                raise errors[0]
+            outcomes = [future.result() for future in futures]
+
+        # The heartbeat tells that the fallback data is up to date, which a skipped import doesn't tell
+        if SKIPPED in outcomes:
+            return
+        self._hit_opsgenie_heartbeat()
+
+    def _dry_run(self, list_sources, threshold, workers, profile, profile_output):
+        """
+        Download, parse and normalize each list, one after the other so that their profiles don't overlap.
+        """
+        c_profile = cProfile.Profile() if profile_output else None
+        if c_profile:
+            c_profile.enable()
+        try:
+            for list_source in list_sources:
+                profiler = StageProfiler()
+                file_size_in_MB, summary = self._dry_run_list_source(list_source, threshold, workers, profiler)
+                self._write_dry_run_report(list_source, file_size_in_MB, summary, profiler if profile else None)
+        finally:
+            if c_profile:
+                c_profile.disable()
+                c_profile.dump_stats(profile_output)
+                self.stdout.write(f"Sanctions SDNFallback: DRY RUN: Wrote the cProfile stats to {profile_output}.")
+
+    def _import_list_source_in_thread(self, list_source, threshold, workers):
+        """
+        Import one screening list from a worker thread, logging its failure.
+        """
+        try:
+            return self._import_list_source(list_source, threshold, workers)
+        except Exception:
+            logger.exception("Sanctions SDNFallback: IMPORT FAILURE: Failed to import the %s.", list_source.label)
+            raise
+        finally:
+            # Each thread has its own database connection
+            connections.close_all()
+
+    def _import_list_source(self, list_source, threshold, workers):
+        """
+        Download one screening list and import it into a new generation of its SDNFallbackMetadata.
+
+        Returns:
+            IMPORTED, UNCHANGED if the list's current generation was imported from the same file, or SKIPPED
+            if the list wasn't imported (i.e. while another import of the list is in progress)
+        """
+        with tempfile.TemporaryFile() as temp_file:
+            self._download_list_source(list_source, threshold, temp_file)
+            metadata_entry = populate_sdn_fallback_data_and_metadata(
+                temp_file, list_source=list_source, workers=workers
+            )
+            if metadata_entry:
+                outcome = IMPORTED
+                logger.info(
+                    'Sanctions SDNFallback: IMPORT SUCCESS: Imported %s. Metadata id %s',
+                    list_source.label, metadata_entry.id)
+            elif self._is_current_file(list_source, temp_file):
+                outcome = UNCHANGED
+                logger.info('Sanctions SDNFallback: IMPORT UNCHANGED: The %s has not changed.', list_source.label)
+            else:
+                outcome = SKIPPED
+                logger.warning(
+                    'Sanctions SDNFallback: IMPORT SKIPPED: The %s was not imported, another import is in progress.',
+                    list_source.label
+                )
+
+            logger.info(
+                'Sanctions SDNFallback: DOWNLOAD SUCCESS: Successfully downloaded the %s.', list_source.label
+            )
+            if outcome == SKIPPED:
+                self.stdout.write(
+                    self.style.WARNING(f"Sanctions SDNFallback: Skipped the import of the {list_source.label}.")
+                )
+            else:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Sanctions SDNFallback: Imported {list_source.label} into the SDNFallbackMetadata"
+                        " and SDNFallbackData models."
+                    )
+                )
+        return outcome
+
+    @staticmethod
+    def _is_current_file(list_source, temp_file):
+        """
+        Return whether the current generation of the list was imported from the downloaded file.
+        """
+        temp_file.seek(0)
+        file_checksum = get_file_checksum(temp_file)
+        try:
+            return SDNFallbackMetadata.get_current_metadata(list_source.name).file_checksum == file_checksum
+        except SDNFallbackMetadata.DoesNotExist:
+            return False
+
+    def _dry_run_list_source(self, list_source, threshold, workers, profiler):
+        """
+        Download one screening list, then parse and normalize it without touching the database.
+
+        Returns:
+            the file size in MB, and the dry_run_sdn_fallback_import summary
+        """
+        with tempfile.TemporaryFile() as temp_file:
+            file_size_in_MB = self._download_list_source(list_source, threshold, temp_file, profiler)
+            summary = dry_run_sdn_fallback_import(
+                temp_file, list_source=list_source, workers=workers, profiler=profiler
+            )
+        return file_size_in_MB, summary
+
+    def _download_list_source(self, list_source, threshold, temp_file, profiler=None):
+        """
+        Download one screening list into temp_file, and rewind it once its size is checked.
+
+        Returns:
+            the file size in MB
+        """
+        profiler = profiler or StageProfiler()
+        # download the list locally, to check size and pass along to import
+        url = list_source.url
         timeout = settings.SDN_BACKUP_REQUEST_TIMEOUT
 
         with requests.Session() as s:
             try:
-                download = s.get(url, timeout=timeout)
-                status_code = download.status_code
+                with profiler.stage('download'):
+                    download = s.get(url, timeout=timeout, stream=True)
+                    status_code = download.status_code
+                    try:
+                        if status_code == 200:
+                            for chunk in download.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                                temp_file.write(chunk)
+                    finally:
+                        download.close()
             except Timeout:
                 logger.warning(
-                    "Sanctions SDNFallback: DOWNLOAD FAILURE: Timeout occurred trying to download SDN CSV. "
-                    "Timeout threshold (in seconds): %s", timeout)
+                    "Sanctions SDNFallback: DOWNLOAD FAILURE: Timeout occurred trying to download %s. "
+                    "Timeout threshold (in seconds): %s", list_source.label, timeout)
                 raise
             except Exception as e:
                 logger.exception("Sanctions SDNFallback: DOWNLOAD FAILURE: Exception occurred: [%s]", e)
                 raise
 
-            if download.status_code != 200:
+            if status_code != 200:
                 logger.warning("Sanctions SDNFallback: DOWNLOAD FAILURE: Status code was: [%s]", status_code)
-                raise Exception("CSV download url got an unsuccessful response code: ", status_code)
-
-            with tempfile.TemporaryFile() as temp_csv:
-                temp_csv.write(download.content)
-                file_size_in_bytes = temp_csv.tell()  # get current position in the file (number of bytes)
-                file_size_in_MB = file_size_in_bytes / 10**6
-
-                if file_size_in_MB > threshold:
-                    sdn_file_string = download.content.decode('utf-8')
-                    with transaction.atomic():
-                        metadata_entry = populate_sdn_fallback_data_and_metadata(sdn_file_string)
-                        if metadata_entry:
-                            logger.info(
-                                'Sanctions SDNFallback: IMPORT SUCCESS: Imported SDN CSV. Metadata id %s',
-                                metadata_entry.id)
-
-                        logger.info('Sanctions SDNFallback: DOWNLOAD SUCCESS: Successfully downloaded the SDN CSV.')
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                "Sanctions SDNFallback: Imported SDN CSV into the SDNFallbackMetadata"
-                                " and SDNFallbackData models."
-                            )
-                        )
-                        self._hit_opsgenie_heartbeat()
-                else:
-                    logger.warning(
-                        "Sanctions SDNFallback: DOWNLOAD FAILURE: file too small! "
-                        "(%f MB vs threshold of %s MB)", file_size_in_MB, threshold)
-                    raise Exception("CSV file download did not meet threshold given")
+                raise Exception(f"{list_source.file_type} download url got an unsuccessful response code: ",
+                                status_code)
+
+            file_size_in_bytes = temp_file.tell()  # get current position in the file (number of bytes)
+            file_size_in_MB = file_size_in_bytes / 10**6
+
+        if file_size_in_MB <= threshold:
+            logger.warning(
+                "Sanctions SDNFallback: DOWNLOAD FAILURE: file too small! "
+                "(%f MB vs threshold of %s MB)", file_size_in_MB, threshold)
+            raise Exception(f"{list_source.file_type} file download did not meet threshold given")
+        temp_file.seek(0)
+        return file_size_in_MB
+
+    def _write_dry_run_report(self, list_source, file_size_in_MB, summary, profiler):
+        """
+        Write what a dry run of the import of a list found, along with its profile if one is given.
+        """
+        row_count = summary['row_count']
+        self.stdout.write(self.style.SUCCESS(
+            f"Sanctions SDNFallback: DRY RUN: Parsed {row_count} rows from the {list_source.label} "
+            f"({file_size_in_MB:.2f} MB, checksum {summary['file_checksum']})."
+        ))
+
+        if profiler:
+            parse_and_normalize_time = sum(
+                profiler.stages[stage]['wall'] for stage in ('parse', 'normalize') if stage in profiler.stages
+            )
+            rows_per_second = row_count / parse_and_normalize_time if parse_and_normalize_time else 0
+            self.stdout.write(f"{'stage':<12}{'wall (s)':>12}{'cpu (s)':>12}")
+            for stage, stats in profiler.stages.items():
+                self.stdout.write(f"{stage:<12}{stats['wall']:>12.3f}{stats['cpu']:>12.3f}")
+            self.stdout.write(f"rows/s (parse and normalize): {rows_per_second:.0f}")
+            self.stdout.write(f"peak RSS: {profiler.get_peak_rss() / 2 ** 20:.1f} MB")
+
+        self.stdout.write('rows by source and type:')
+        for (source, sdn_type), count in sorted(summary['rows_by_source_and_type'].items()):
+            self.stdout.write(f"  {count:>8}  {source} / {sdn_type or '(no type)'}")
+
+        rows_with_countries = summary['rows_with_countries']
+        top_countries = ', '.join(
+            f'{country} {count}' for country, count in summary['rows_by_country'].most_common(10)
+        )
+        self.stdout.write(
+            f"countries: {rows_with_countries} rows with countries, {row_count - rows_with_countries} without, "
+            f"{len(summary['rows_by_country'])} distinct countries. Most common: {top_countries or '-'}"
+        )
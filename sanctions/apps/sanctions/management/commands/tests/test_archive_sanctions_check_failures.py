@@ -0,0 +1,89 @@
+"""
+Tests for the archive_sanctions_check_failures management command.
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from sanctions.apps.sanctions.tests.factories import SanctionsCheckFailureFactory
+
+
+@mock.patch('sanctions.apps.sanctions.management.commands.archive_sanctions_check_failures.'
+            'archive_sanctions_check_failures')
+class ArchiveSanctionsCheckFailuresCommandTests(TestCase):
+    """
+    Tests for the archive_sanctions_check_failures management command.
+    """
+
+    @override_settings(
+        SANCTIONS_CHECK_FAILURE_ARCHIVE_DIR='/archives',
+        SANCTIONS_CHECK_FAILURE_RETENTION_DAYS=30,
+        SANCTIONS_CHECK_FAILURE_ARCHIVE_PAUSE=2,
+    )
+    def test_defaults(self, mock_archive):
+        mock_archive.return_value = 3
+        out = StringIO()
+
+        call_command('archive_sanctions_check_failures', stdout=out)
+
+        created_before, storage = mock_archive.call_args[0]
+        self.assertAlmostEqual(created_before, timezone.now() - timedelta(days=30), delta=timedelta(minutes=1))
+        self.assertEqual(storage.location, '/archives')
+        self.assertEqual(mock_archive.call_args[1], {'batch_size': 1000, 'pause': 2, 'dry_run': False})
+        self.assertIn('Archived 3 failures', out.getvalue())
+
+    def test_options(self, mock_archive):
+        mock_archive.return_value = 0
+
+        call_command(
+            'archive_sanctions_check_failures', '--retention-days', '7', '--archive-dir', '/tmp/archives',
+            '--batch-size', '10', '--pause', '0', stdout=StringIO()
+        )
+
+        self.assertEqual(mock_archive.call_args[0][1].location, '/tmp/archives')
+        self.assertEqual(mock_archive.call_args[1], {'batch_size': 10, 'pause': 0, 'dry_run': False})
+
+    @override_settings(
+        SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE='django.core.files.storage.FileSystemStorage',
+        SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE_OPTIONS={'location': '/bucket/archives'},
+        SANCTIONS_CHECK_FAILURE_ARCHIVE_DIR='/archives',
+    )
+    def test_archive_storage(self, mock_archive):
+        mock_archive.return_value = 0
+
+        call_command('archive_sanctions_check_failures', stdout=StringIO())
+
+        self.assertEqual(mock_archive.call_args[0][1].location, '/bucket/archives')
+
+    def test_archive_storage_required(self, mock_archive):
+        with self.assertRaises(CommandError):
+            call_command('archive_sanctions_check_failures', stdout=StringIO())
+
+        mock_archive.assert_not_called()
+
+    def test_invalid_options(self, mock_archive):
+        for option in ('--retention-days', '--batch-size'):
+            with self.assertRaises(CommandError):
+                call_command('archive_sanctions_check_failures', '--archive-dir', '/tmp', option, '0')
+
+        mock_archive.assert_not_called()
+
+
+class ArchiveSanctionsCheckFailuresCommandDryRunTests(TestCase):
+    """
+    Tests for the archive_sanctions_check_failures management command with --dry-run.
+    """
+
+    def test_dry_run(self):
+        SanctionsCheckFailureFactory(created=timezone.now() - timedelta(days=10))
+        SanctionsCheckFailureFactory()
+        out = StringIO()
+
+        call_command('archive_sanctions_check_failures', '--dry-run', '--retention-days', '5', stdout=out)
+
+        self.assertIn('1 failures created before', out.getvalue())
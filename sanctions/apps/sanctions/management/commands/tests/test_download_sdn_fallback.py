@@ -1,15 +1,24 @@
 """
 Tests for Django management command to download CSV for SDN Fallback.
 """
+import hashlib
+import os
+import tempfile
+from io import StringIO
 from unittest import mock
 
 import requests
 import responses
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.test.utils import override_settings
 from mock import patch
 from testfixtures import LogCapture, StringComparison
 
+from sanctions.apps.sanctions.list_sources import LIST_SOURCES
+from sanctions.apps.sanctions.models import SDNFallbackData, SDNFallbackMetadata
+from sanctions.apps.sanctions.tests.factories import SDNFallbackMetadataFactory
+
 
 class TestDownloadSDNFallbackCommand(TestCase):
     """
@@ -20,9 +29,17 @@ class TestDownloadSDNFallbackCommand(TestCase):
 
     def setUp(self):
         class TestResponse:
+            """ A streamed response of the given content and status code. """
             def __init__(self, **kwargs):
                 self.__dict__ = kwargs
 
+            def iter_content(self, chunk_size=1):
+                for start in range(0, len(self.content), chunk_size):
+                    yield self.content[start:start + chunk_size]
+
+            def close(self):
+                pass
+
         # mock response for CSV download: just one row of the CSV
         self.test_response = TestResponse(**{
             'content': bytes(
@@ -71,6 +88,69 @@ class TestDownloadSDNFallbackCommand(TestCase):
                 )
 
             assert mock_og_heartbeat.is_called()
+            # The list is streamed to the file rather than held in memory
+            mock_response.assert_called_once_with(mock.ANY, timeout=mock.ANY, stream=True)
+
+    @patch('requests.Session.get')
+    def test_handle_pass_with_workers(self, mock_response):
+        """
+        Test that the number of worker processes is passed on to the import.
+        """
+        mock_response.return_value = self.test_response
+        with mock.patch(
+            'sanctions.apps.sanctions.management.commands.'
+            'populate_sdn_fallback_data_and_metadata.Command._hit_opsgenie_heartbeat'
+        ), mock.patch(
+            'sanctions.apps.sanctions.management.commands.'
+            'populate_sdn_fallback_data_and_metadata.populate_sdn_fallback_data_and_metadata'
+        ) as mock_populate:
+            call_command('populate_sdn_fallback_data_and_metadata', '--threshold=0.0001', '--workers=4')
+
+        mock_populate.assert_called_once_with(mock.ANY, list_source=LIST_SOURCES['CSL'], workers=4)
+
+    @patch('requests.Session.get')
+    def test_handle_unchanged(self, mock_response):
+        """
+        Test that a list that didn't change since its current generation still hits the heartbeat.
+        """
+        mock_response.return_value = self.test_response
+        SDNFallbackMetadataFactory.create(
+            import_state='Current', file_checksum=hashlib.sha256(self.test_response.content).hexdigest()
+        )
+        with mock.patch(
+            'sanctions.apps.sanctions.management.commands.'
+            'populate_sdn_fallback_data_and_metadata.Command._hit_opsgenie_heartbeat'
+        ) as mock_og_heartbeat, LogCapture(self.LOGGER_NAME) as log:
+            call_command('populate_sdn_fallback_data_and_metadata', '--threshold=0.0001')
+
+        log.check_present(
+            (self.LOGGER_NAME, 'INFO', 'Sanctions SDNFallback: IMPORT UNCHANGED: The SDN CSV has not changed.')
+        )
+        mock_og_heartbeat.assert_called_once()
+
+    @patch('requests.Session.get')
+    def test_handle_skipped(self, mock_response):
+        """
+        Test that a list not imported because of an import in progress is reported, and doesn't hit the heartbeat.
+        """
+        mock_response.return_value = self.test_response
+        SDNFallbackMetadataFactory.create(import_state='Current', file_checksum='previous')
+        SDNFallbackMetadataFactory.create(import_state='New')
+        with mock.patch(
+            'sanctions.apps.sanctions.management.commands.'
+            'populate_sdn_fallback_data_and_metadata.Command._hit_opsgenie_heartbeat'
+        ) as mock_og_heartbeat, LogCapture(self.LOGGER_NAME) as log:
+            call_command('populate_sdn_fallback_data_and_metadata', '--threshold=0.0001')
+
+        log.check_present(
+            (
+                self.LOGGER_NAME,
+                'WARNING',
+                'Sanctions SDNFallback: IMPORT SKIPPED: The SDN CSV was not imported, another import is in progress.'
+            )
+        )
+        self.assertNotIn('IMPORT SUCCESS', str(log))
+        mock_og_heartbeat.assert_not_called()
 
     @patch('requests.Session.get')
     def test_handle_fail_size(self, mock_response):
@@ -110,6 +190,71 @@ class TestDownloadSDNFallbackCommand(TestCase):
             )
             assert "('CSV download url got an unsuccessful response code: ', 500)" == str(e.exception)
 
+    @patch('requests.Session.get')
+    def test_handle_dry_run_with_profile(self, mock_response):
+        """
+        Test that a dry run parses the downloaded CSV and reports it, without importing it.
+        """
+        mock_response.return_value = self.test_response
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as temp_dir, mock.patch(
+            'sanctions.apps.sanctions.management.commands.'
+            'populate_sdn_fallback_data_and_metadata.Command._hit_opsgenie_heartbeat'
+        ) as mock_og_heartbeat:
+            profile_output = os.path.join(temp_dir, 'import.prof')
+            call_command(
+                'populate_sdn_fallback_data_and_metadata', '--threshold=0.0001', '--dry-run',
+                f'--profile-output={profile_output}', stdout=out
+            )
+            self.assertTrue(os.path.getsize(profile_output))
+
+        report = out.getvalue()
+        self.assertIn('Sanctions SDNFallback: DRY RUN: Parsed 1 rows from the SDN CSV', report)
+        self.assertRegex(report, r'(?s)\ndownload .*\nchecksum .*\nparse .*\nnormalize ')
+        self.assertIn('peak RSS', report)
+        self.assertRegex(
+            report, r'\n +1  Denied Persons List \(DPL\) - Bureau of Industry and Security / \(no type\)\n'
+        )
+        self.assertIn('countries: 0 rows with countries, 1 without, 0 distinct countries.', report)
+        mock_og_heartbeat.assert_not_called()
+        self.assertFalse(SDNFallbackMetadata.objects.exists())
+        self.assertFalse(SDNFallbackData.objects.exists())
+
+    def test_handle_profile_without_dry_run(self):
+        with self.assertRaisesRegex(CommandError, 'can only be used along with --dry-run'):
+            call_command('populate_sdn_fallback_data_and_metadata', '--profile')
+
+
+@override_settings(SDN_FALLBACK_LIST_SOURCES=['CSL', 'EU'])
+class TestDownloadSDNFallbackCommandListSources(TestCase):
+    """
+    Tests for the import of several screening lists by the populate_sdn_fallback_data_and_metadata command.
+    """
+    COMMAND = 'sanctions.apps.sanctions.management.commands.populate_sdn_fallback_data_and_metadata.Command'
+
+    def test_imports_each_list(self):
+        with mock.patch(f'{self.COMMAND}._hit_opsgenie_heartbeat') as mock_og_heartbeat, \
+                mock.patch(f'{self.COMMAND}._import_list_source') as mock_import:
+            call_command('populate_sdn_fallback_data_and_metadata', '--threshold=0.0001')
+
+        self.assertEqual(
+            sorted(call.args[0].name for call in mock_import.call_args_list), ['CSL', 'EU']
+        )
+        mock_og_heartbeat.assert_called_once()
+
+    def test_failed_list_doesnt_stop_others(self):
+        def import_list_source(list_source, *_args):
+            if list_source.name == 'EU':
+                raise Exception('EU list unavailable')
+
+        with mock.patch(f'{self.COMMAND}._hit_opsgenie_heartbeat') as mock_og_heartbeat, \
+                mock.patch(f'{self.COMMAND}._import_list_source', side_effect=import_list_source) as mock_import:
+            with self.assertRaisesRegex(Exception, 'EU list unavailable'):
+                call_command('populate_sdn_fallback_data_and_metadata')
+
+        self.assertEqual(mock_import.call_count, 2)
+        mock_og_heartbeat.assert_not_called()
+
 
 class TestDownloadSDNFallbackCommandExceptions(TestCase):
     """
@@ -0,0 +1,73 @@
+"""
+Tests for the export_sanctions_check_failures management command.
+"""
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from sanctions.apps.sanctions.tests.factories import SanctionsCheckFailureFactory
+
+
+class ExportSanctionsCheckFailuresCommandTests(TestCase):
+    """
+    Tests for the export_sanctions_check_failures management command.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.old = SanctionsCheckFailureFactory(created=datetime(2023, 1, 1, tzinfo=timezone.utc))
+        self.new = SanctionsCheckFailureFactory(created=datetime(2023, 6, 1, tzinfo=timezone.utc))
+
+    def test_csv_to_stdout(self):
+        out, err = StringIO(), StringIO()
+        call_command('export_sanctions_check_failures', stdout=out, stderr=err)
+
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual([int(row['id']) for row in rows], [self.old.id, self.new.id])
+        self.assertEqual(err.getvalue(), 'Exported 2 rows.\n')
+
+    def test_jsonl_to_file_with_history(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.jsonl')
+            call_command(
+                'export_sanctions_check_failures', '--format', 'jsonl', '--output', path, '--include-history',
+                stderr=StringIO()
+            )
+            with open(path, encoding='utf-8') as export:
+                rows = [json.loads(line) for line in export]
+
+        self.assertEqual([row['record_type'] for row in rows], ['failure', 'failure', 'history', 'history'])
+
+    def test_history_of_deleted_failures(self):
+        deleted_id = self.old.id
+        self.old.delete()
+        out = StringIO()
+        call_command(
+            'export_sanctions_check_failures', '--format', 'jsonl', '--include-history', stdout=out, stderr=StringIO()
+        )
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            [(row['record_type'], row['history_type']) for row in rows if row['id'] == deleted_id],
+            [('history', '+'), ('history', '-')]
+        )
+
+    def test_created_range(self):
+        out = StringIO()
+        call_command(
+            'export_sanctions_check_failures', '--format', 'jsonl', '--created-after', '2023-03-01',
+            '--created-before', '2023-07-01T00:00:00+00:00', stdout=out, stderr=StringIO()
+        )
+
+        self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()], [self.new.id])
+
+    def test_invalid_datetime(self):
+        with self.assertRaises(CommandError):
+            call_command('export_sanctions_check_failures', '--created-after', 'yesterday', stderr=StringIO())
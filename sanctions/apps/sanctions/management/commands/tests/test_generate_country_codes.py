@@ -0,0 +1,47 @@
+"""
+Tests for the generate_country_codes management command.
+"""
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+import pycountry
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from sanctions.apps.sanctions import country_codes
+from sanctions.apps.sanctions.management.commands.generate_country_codes import render_country_codes_module
+
+
+class GenerateCountryCodesCommandTests(TestCase):
+    """
+    Tests for the generate_country_codes management command.
+    """
+
+    def test_table_matches_pycountry(self):
+        """ Fails after upgrading pycountry until the table is regenerated. """
+        self.assertEqual(set(country_codes.COUNTRY_CODES), {country.alpha_2 for country in pycountry.countries})
+        self.assertEqual(list(country_codes.COUNTRY_CODES), sorted(country_codes.COUNTRY_CODES))
+        self.assertEqual(country_codes.COUNTRY_INDEXES['AD'], 0)
+        call_command('generate_country_codes', '--check', stdout=StringIO())
+
+    def test_check_fails_when_out_of_date(self):
+        with mock.patch(
+            'sanctions.apps.sanctions.management.commands.generate_country_codes.render_country_codes_module',
+            return_value='COUNTRY_CODES = ()\n'
+        ):
+            with self.assertRaisesRegex(CommandError, 'is out of date'):
+                call_command('generate_country_codes', '--check')
+
+    def test_regenerates_table(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'country_codes.py')
+            with open(path, 'w', encoding='utf-8') as module_file:
+                module_file.write('COUNTRY_CODES = ()\n')
+
+            with mock.patch.object(country_codes, '__file__', path):
+                call_command('generate_country_codes', stdout=StringIO())
+
+            with open(path, encoding='utf-8') as module_file:
+                self.assertEqual(module_file.read(), render_country_codes_module())
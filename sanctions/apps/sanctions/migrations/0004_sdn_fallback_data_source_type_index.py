@@ -0,0 +1,17 @@
+# Generated by Django 3.2.24 on 2026-10-19 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sanctions', '0003_auto_20231109_2121'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sdnfallbackdata',
+            index=models.Index(fields=['sdn_fallback_metadata', 'source', 'sdn_type'], name='sdn_fallback_gen_src_type_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.24 on 2026-10-19 18:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def activate_current_generation(apps, schema_editor):
+    """ Point the new active generation row at the existing 'Current' SDNFallbackMetadata, if any. """
+    SDNFallbackMetadata = apps.get_model('sanctions', 'SDNFallbackMetadata')
+    SDNFallbackActiveGeneration = apps.get_model('sanctions', 'SDNFallbackActiveGeneration')
+    current_metadata = SDNFallbackMetadata.objects.filter(import_state='Current').first()
+    if current_metadata:
+        SDNFallbackActiveGeneration.objects.create(
+            id=1, sdn_fallback_metadata=current_metadata, activated=timezone.now()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sanctions', '0004_sdn_fallback_data_source_type_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SDNFallbackActiveGeneration',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(default=1, primary_key=True, serialize=False)),
+                ('activated', models.DateTimeField(null=True)),
+                ('sdn_fallback_metadata', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sanctions.sdnfallbackmetadata')),
+            ],
+        ),
+        migrations.RunPython(activate_current_generation, migrations.RunPython.noop),
+    ]
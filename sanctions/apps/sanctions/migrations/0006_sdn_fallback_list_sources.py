@@ -0,0 +1,48 @@
+# Generated by Django 3.2.24 on 2026-10-19 18:48
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sanctions', '0005_sdn_fallback_active_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalsdnfallbackmetadata',
+            name='list_source',
+            field=models.CharField(default='CSL', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='sdnfallbackactivegeneration',
+            name='list_source',
+            field=models.CharField(default='CSL', max_length=32, unique=True),
+        ),
+        migrations.AddField(
+            model_name='sdnfallbackmetadata',
+            name='list_source',
+            field=models.CharField(default='CSL', max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='historicalsdnfallbackmetadata',
+            name='import_state',
+            field=models.CharField(choices=[('New', 'New'), ('Current', 'Current'), ('Discard', 'Discard')], default='New', max_length=255, validators=[django.core.validators.MinLengthValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='sdnfallbackactivegeneration',
+            name='id',
+            field=models.SmallAutoField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='sdnfallbackmetadata',
+            name='import_state',
+            field=models.CharField(choices=[('New', 'New'), ('Current', 'Current'), ('Discard', 'Discard')], default='New', max_length=255, validators=[django.core.validators.MinLengthValidator(1)]),
+        ),
+        migrations.AddConstraint(
+            model_name='sdnfallbackmetadata',
+            constraint=models.UniqueConstraint(fields=('list_source', 'import_state'), name='sdn_fallback_source_state_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.24 on 2026-10-19 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sanctions', '0006_sdn_fallback_list_sources'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sdnfallbackmetadata',
+            name='token_filter',
+            field=models.BinaryField(null=True),
+        ),
+    ]
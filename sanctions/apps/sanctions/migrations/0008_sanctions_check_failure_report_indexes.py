@@ -0,0 +1,25 @@
+# Generated by Django 3.2.24 on 2026-10-19 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sanctions', '0007_sdn_fallback_token_filter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sanctionscheckfailure',
+            index=models.Index(fields=['created'], name='sanctions_failure_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sanctionscheckfailure',
+            index=models.Index(fields=['system_identifier', 'created'], name='sanctions_failure_system_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sanctionscheckfailure',
+            index=models.Index(fields=['country', 'created'], name='sanctions_failure_country_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.24 on 2026-10-19 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sanctions', '0008_sanctions_check_failure_report_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalsanctionscheckfailure',
+            name='fingerprint',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalsanctionscheckfailure',
+            name='last_seen',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalsanctionscheckfailure',
+            name='occurrence_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='sanctionscheckfailure',
+            name='fingerprint',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='sanctionscheckfailure',
+            name='last_seen',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='sanctionscheckfailure',
+            name='occurrence_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='sanctionscheckfailure',
+            index=models.Index(fields=['fingerprint', 'created'], name='sanctions_failure_dedup_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.24 on 2026-10-19 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sanctions', '0009_sanctions_check_failure_deduplication'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalsanctionscheckfailure',
+            name='repeated_order_identifiers',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='sanctionscheckfailure',
+            name='repeated_order_identifiers',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -2,17 +2,25 @@
 Models for the sanctions app
 """
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import MinLengthValidator
-from django.db import models
-from django.db.transaction import atomic
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django_extensions.db.models import TimeStampedModel
+from edx_django_utils.cache import TieredCache
 from simple_history.models import HistoricalRecords
 
+from sanctions.apps.core.cache import ProcessCache
+from sanctions.apps.sanctions.constants import SDN_FALLBACK_DEFAULT_LIST_SOURCE
+
 logger = logging.getLogger(__name__)
 
+CURRENT_SDN_FALLBACK_METADATA_IDS_CACHE_KEY = 'sanctions.sdn_fallback.current_metadata_ids'
+current_sdn_fallback_metadata_ids_cache = ProcessCache('current_sdn_fallback_metadata_ids', timeout=60, max_size=1)
+
 
 class SanctionsCheckFailure(TimeStampedModel):
     """
@@ -25,10 +33,24 @@ class SanctionsCheckFailure(TimeStampedModel):
     system_identifier (Charfield): which system/service is making the request to the sanctions service.
 
     metadata (JSONField): JSON containing information associated to the sanctions failure,
-    like order_identifer, total, and purchase_type (single, program, bulk).
+    like order_identifer (sic, as callers send it), total, and purchase_type (single, program, bulk).
 
     sdn_check_response (JSONField): response received for a hit when calling the trade.gov SDN API.
 
+    fingerprint (CharField): digest of the checked user, name, city and country, of the calling system and
+    sanctions type and of the current screening list generations, set when hits are deduplicated (see
+    record_sanctions_check_failure).
+
+    occurrence_count (PositiveIntegerField): number of identical hits counted on this failure, the hits with the
+    same fingerprint within SANCTIONS_CHECK_FAILURE_DEDUPLICATION_WINDOW seconds of it.
+
+    last_seen (DateTimeField): when the last of these hits was received, None for failures recorded before hits
+    were counted.
+
+    repeated_order_identifiers (JSONField): order identifiers (from their metadata) of the hits counted on this
+    failure after the first one, in the order they were received. Only the last
+    SANCTIONS_CHECK_FAILURE_REPEATED_ORDER_IDENTIFIERS_MAX are kept.
+
     Example:
         >>> SanctionsCheckFailure.objects.create(
         full_name='Keyser Söze',
@@ -52,9 +74,21 @@ class SanctionsCheckFailure(TimeStampedModel):
     system_identifier = models.CharField(null=True, max_length=255)
     metadata = models.JSONField(null=True)
     sanctions_response = models.JSONField(null=True)
+    fingerprint = models.CharField(null=True, max_length=64)
+    occurrence_count = models.PositiveIntegerField(default=1)
+    last_seen = models.DateTimeField(null=True)
+    repeated_order_identifiers = models.JSONField(default=list)
 
     class Meta:
         verbose_name = 'Sanctions Check Failure'
+        # For the report, which filters on these fields and orders by created (see SanctionsCheckFailureReportView)
+        indexes = [
+            models.Index(fields=['created'], name='sanctions_failure_created_idx'),
+            models.Index(fields=['system_identifier', 'created'], name='sanctions_failure_system_idx'),
+            models.Index(fields=['country', 'created'], name='sanctions_failure_country_idx'),
+            # For the lookup of the failure an identical hit is counted on (see record_sanctions_check_failure)
+            models.Index(fields=['fingerprint', 'created'], name='sanctions_failure_dedup_idx'),
+        ]
 
     def __str__(self):
         return 'Sanctions check failure [{username}]'.format(
@@ -68,11 +102,19 @@ class SDNFallbackMetadata(TimeStampedModel):
     This table is used to track the state of the SDN CSV file data that are currently
     being used or about to be updated/deprecated.
     This table does not keep track of the SDN files over time.
+
+    Each screening list (list_source, see list_sources.py) has its own generations, which are imported
+    and activated independently of the other lists'.
+
+    token_filter (BinaryField): Bloom filter over the country and token pairs of the generation's records,
+    built at import time (see token_filter.py). Not kept in the history, as it is derived from the records.
     """
-    history = HistoricalRecords()
+    history = HistoricalRecords(excluded_fields=['token_filter'])
+    list_source = models.CharField(max_length=32, default=SDN_FALLBACK_DEFAULT_LIST_SOURCE)
     file_checksum = models.CharField(max_length=255, validators=[MinLengthValidator(1)])
     download_timestamp = models.DateTimeField()
     import_timestamp = models.DateTimeField(null=True, blank=True)
+    token_filter = models.BinaryField(null=True)
 
     IMPORT_STATES = [
         ('New', 'New'),
@@ -83,19 +125,24 @@ class SDNFallbackMetadata(TimeStampedModel):
     import_state = models.CharField(
         max_length=255,
         validators=[MinLengthValidator(1)],
-        unique=True,
         choices=IMPORT_STATES,
         default='New',
     )
 
+    class Meta(TimeStampedModel.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['list_source', 'import_state'], name='sdn_fallback_source_state_uniq'),
+        ]
+
     @classmethod
-    def insert_new_sdn_fallback_metadata_entry(cls, file_checksum):
+    def insert_new_sdn_fallback_metadata_entry(cls, file_checksum, list_source=SDN_FALLBACK_DEFAULT_LIST_SOURCE):
         """
         Insert a new SDNFallbackMetadata entry if the new CSV differs from the current one.
         If there is no current metadata entry, create a new one and log a warning.
 
         Args:
             file_checksum (str): Hash of the CSV content
+            list_source (str): screening list the CSV was downloaded from
 
         Returns:
             sdn_fallback_metadata_entry (SDNFallbackMetadata): Instance of the current SDNFallbackMetadata class
@@ -103,79 +150,229 @@ class SDNFallbackMetadata(TimeStampedModel):
         """
         now = datetime.utcnow()
         try:
-            if file_checksum == SDNFallbackMetadata.objects.get(import_state='Current').file_checksum:
+            if file_checksum == SDNFallbackMetadata.get_current_metadata(list_source).file_checksum:
                 logger.info(
                     "Sanctions SDNFallback: The CSV file has not changed, so skipping import. The file_checksum was %s",
                     file_checksum)
                 # Update download timestamp even though we're not importing this list
-                SDNFallbackMetadata.objects.filter(import_state="New").update(download_timestamp=now)
+                SDNFallbackMetadata.objects.filter(
+                    list_source=list_source, import_state="New"
+                ).update(download_timestamp=now)
                 return None
         except SDNFallbackMetadata.DoesNotExist:
             logger.warning("Sanctions SDNFallback: SDNFallbackMetadata has no record with import_state Current")
 
+        # Generations are imported outside of a transaction, so a 'New' row is either an import in progress, or
+        # what was left of an import that was interrupted before it could clean up after itself
+        new_generations = SDNFallbackMetadata.objects.filter(list_source=list_source, import_state='New')
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.SDN_FALLBACK_IMPORT_TIMEOUT)
+        if new_generations.filter(created__gt=stale_before).exists():
+            logger.warning(
+                "Sanctions SDNFallback: Another import of list %s is in progress, so skipping import.", list_source
+            )
+            return None
+        for stale_generation in new_generations:
+            logger.warning(
+                "Sanctions SDNFallback: Deleting SDNFallbackMetadata generation %s of list %s, left partially "
+                "imported by an interrupted import.", stale_generation.id, list_source
+            )
+            stale_generation.delete()
+
         sdn_fallback_metadata_entry = SDNFallbackMetadata.objects.create(
+            list_source=list_source,
             file_checksum=file_checksum,
             download_timestamp=now,
         )
         return sdn_fallback_metadata_entry
 
     @classmethod
-    @atomic
-    def swap_all_states(cls):
-        """
-        Shifts all of the existing metadata table rows to the next import_state
-        in the row's lifecycle (see _swap_state).
-
-        This method is done in a transaction to gurantee that existing metadata rows are
-        shifted into their next states in sync and tries to ensure that there is always a row
-        in the 'Current' state. Rollbacks of all row's import_state changes will happen if:
-        1) There are multiple rows & none of them are 'Current', or
-        2) There are any issues with the existing rows + updating them (e.g. a row with a
-        duplicate import_state is manually inserted into the table during the transaction)
-        """
-        SDNFallbackMetadata._swap_state('Discard')
-        SDNFallbackMetadata._swap_state('Current')
-        SDNFallbackMetadata._swap_state('New')
-
-        # After the above swaps happen:
-        # If there are 0 rows in the table, there cannot be a row in the 'Current' status.
-        # If there is 1 row in the table, it is expected to be in the 'Current' status
-        # (e.g. when the first file is added + just swapped).
-        # If there are 2 rows in the table, after the swaps, we expect to have one row in
-        # the 'Current' status and one row in the 'Discard' status.
-        if len(SDNFallbackMetadata.objects.all()) >= 1:
-            try:
-                SDNFallbackMetadata.objects.get(import_state='Current')
-            except SDNFallbackMetadata.DoesNotExist:
-                logger.warning(
-                    "Sanctions SDNFallback: Expected a row in the 'Current' import_state after swapping,"
-                    " but there are none.",
-                )
-                raise
+    def get_current_metadata(cls, list_source=SDN_FALLBACK_DEFAULT_LIST_SOURCE):
+        """
+        Return the generation of the given screening list that fallback checks read from.
+
+        The generation is resolved through the list's SDNFallbackActiveGeneration pointer. Until a generation
+        has been activated through the pointer, the list's row in the 'Current' import_state is used. Its
+        token_filter is deferred, it is only read through get_token_filters.
+
+        Raises:
+            SDNFallbackMetadata.DoesNotExist: if there is no current generation
+        """
+        active_generation = SDNFallbackActiveGeneration.objects.select_related('sdn_fallback_metadata').defer(
+            'sdn_fallback_metadata__token_filter'
+        ).filter(list_source=list_source).first()
+        if active_generation and active_generation.sdn_fallback_metadata:
+            return active_generation.sdn_fallback_metadata
+        return cls.objects.defer('token_filter').get(list_source=list_source, import_state='Current')
+
+    @classmethod
+    def lookup_current_metadata_ids(cls, using='default'):
+        """
+        Return the sorted ids of the current generations of all screening lists, from the given database.
+
+        Raises:
+            SDNFallbackMetadata.DoesNotExist: if there is no current generation
+        """
+        current_metadata_ids = dict(
+            SDNFallbackActiveGeneration.objects.using(using).filter(
+                sdn_fallback_metadata__isnull=False
+            ).values_list('list_source', 'sdn_fallback_metadata_id')
+        )
+        # Lists that were never activated through a pointer
+        for list_source, metadata_id in cls.objects.using(using).filter(
+            import_state='Current'
+        ).values_list('list_source', 'id'):
+            current_metadata_ids.setdefault(list_source, metadata_id)
+        if not current_metadata_ids:
+            raise cls.DoesNotExist('There is no current SDNFallbackMetadata generation.')
+        return tuple(sorted(current_metadata_ids.values()))
+
+    @classmethod
+    def get_current_metadata_ids(cls):
+        """
+        Return the ids of the generations that fallback checks read from, one per screening list.
+
+        The ids are cached in this process and in the shared Django cache. Once swap_all_states commits the
+        activation of a new generation, it writes the new ids to the shared cache, and readers only add ids to
+        the shared cache when it has none, so a reader that looked the ids up before the swap committed can't
+        overwrite them with the previous ones. Other processes may keep reading the previous generation for up
+        to SDN_FALLBACK_CURRENT_METADATA_PROCESS_CACHE_TIMEOUT seconds, which is safe because that generation
+        is kept (in the 'Discard' import_state) until the next swap.
+
+        Raises:
+            SDNFallbackMetadata.DoesNotExist: if there is no current generation
+        """
+        cached_response = current_sdn_fallback_metadata_ids_cache.get_cached_response(
+            CURRENT_SDN_FALLBACK_METADATA_IDS_CACHE_KEY
+        )
+        if cached_response.is_found:
+            return cached_response.value
+
+        current_metadata_ids = cache.get(CURRENT_SDN_FALLBACK_METADATA_IDS_CACHE_KEY)
+        if current_metadata_ids is None:
+            current_metadata_ids = cls.lookup_current_metadata_ids()
+            if not cache.add(
+                CURRENT_SDN_FALLBACK_METADATA_IDS_CACHE_KEY,
+                current_metadata_ids,
+                settings.SDN_FALLBACK_CURRENT_METADATA_CACHE_TIMEOUT
+            ):
+                # Cached in the meantime, possibly by a swap that committed after the lookup
+                current_metadata_ids = cache.get(CURRENT_SDN_FALLBACK_METADATA_IDS_CACHE_KEY, current_metadata_ids)
+        current_sdn_fallback_metadata_ids_cache.set(
+            CURRENT_SDN_FALLBACK_METADATA_IDS_CACHE_KEY,
+            current_metadata_ids,
+            settings.SDN_FALLBACK_CURRENT_METADATA_PROCESS_CACHE_TIMEOUT
+        )
+        return current_metadata_ids
 
     @classmethod
-    def _swap_state(cls, import_state):
+    def refresh_current_metadata_ids_cache(cls):
         """
-        Update the row in the given import_state parameter to the next import_state.
-        Rows in this table should progress from New -> Current -> Discard -> (row deleted).
-        There can be at most one row in each import_state at a given time.
+        Write the ids of the current generations, read from the writer, to the cache of this process and the
+        shared Django cache.
         """
         try:
-            existing_metadata = SDNFallbackMetadata.objects.get(import_state=import_state)
-            if import_state == 'Discard':
-                existing_metadata.delete()
-            else:
-                if import_state == 'New':
-                    existing_metadata.import_state = 'Current'
-                elif import_state == 'Current':
-                    existing_metadata.import_state = 'Discard'
-                existing_metadata.full_clean()
-                existing_metadata.save()
-        except SDNFallbackMetadata.DoesNotExist:
-            logger.info(
-                "Sanctions SDNFallback: Cannot update import_state of %s row if there is no row in this state.",
-                import_state
+            current_metadata_ids = cls.lookup_current_metadata_ids()
+        except cls.DoesNotExist:
+            cls.invalidate_current_metadata_ids_cache()
+            return
+        cache.set(
+            CURRENT_SDN_FALLBACK_METADATA_IDS_CACHE_KEY,
+            current_metadata_ids,
+            settings.SDN_FALLBACK_CURRENT_METADATA_CACHE_TIMEOUT
+        )
+        current_sdn_fallback_metadata_ids_cache.set(
+            CURRENT_SDN_FALLBACK_METADATA_IDS_CACHE_KEY,
+            current_metadata_ids,
+            settings.SDN_FALLBACK_CURRENT_METADATA_PROCESS_CACHE_TIMEOUT
+        )
+
+    @classmethod
+    def invalidate_current_metadata_ids_cache(cls):
+        """
+        Drop the cached ids of the current generations from this process and the shared Django cache.
+        """
+        current_sdn_fallback_metadata_ids_cache.delete(CURRENT_SDN_FALLBACK_METADATA_IDS_CACHE_KEY)
+        TieredCache.delete_all_tiers(CURRENT_SDN_FALLBACK_METADATA_IDS_CACHE_KEY)
+
+    @classmethod
+    def swap_all_states(cls, list_source=SDN_FALLBACK_DEFAULT_LIST_SOURCE):
+        """
+        Activates the 'New' row of the screening list and shifts all of the list's existing metadata table
+        rows to the next import_state in the row's lifecycle: New -> Current -> Discard -> (row deleted).
+
+        Readers resolve the current generation through SDNFallbackActiveGeneration, so the activation
+        itself is a single UPDATE of that pointer, regardless of the generation size. The import_state
+        bookkeeping that follows takes one statement per state, ordered so that no two rows ever share
+        an import_state. Only the activation and the bookkeeping run in a transaction: the records of the
+        'Discard' generation are deleted beforehand, so the transaction doesn't grow with the generation size.
+
+        Nothing is changed, and DoesNotExist is raised, if the swap would leave the table without a row
+        in the 'Current' state (i.e. there is a 'Current' row but no 'New' row to replace it).
+        """
+        generations = cls.objects.filter(list_source=list_source)
+        new_metadata = generations.filter(import_state='New').first()
+        if new_metadata is None and generations.filter(import_state='Current').exists():
+            logger.warning(
+                "Sanctions SDNFallback: Expected a row in the 'Current' import_state after swapping,"
+                " but there are none.",
             )
+            raise SDNFallbackMetadata.DoesNotExist('There is no New SDNFallbackMetadata row to swap in.')
+
+        SDNFallbackData.objects.filter(
+            sdn_fallback_metadata__in=generations.filter(import_state='Discard')
+        ).delete()
+
+        with transaction.atomic():
+            if new_metadata:
+                SDNFallbackActiveGeneration.activate(new_metadata)
+                # Cache the new ids once the activation is visible to other processes
+                transaction.on_commit(cls.refresh_current_metadata_ids_cache)
+
+            generations.filter(import_state='Discard').delete()
+            generations.filter(import_state='Current').update(import_state='Discard')
+            if new_metadata:
+                cls.objects.filter(id=new_metadata.id).update(import_state='Current')
+
+
+class SDNFallbackActiveGeneration(models.Model):
+    """
+    Pointer to the SDNFallbackMetadata generation of a screening list that fallback checks read from,
+    one row per list.
+
+    Activating a generation is one UPDATE of the list's row, so readers never wait on the import_state
+    bookkeeping of SDNFallbackMetadata.swap_all_states.
+
+    Fields:
+    list_source (CharField): the screening list, see SDNFallbackMetadata.list_source.
+
+    sdn_fallback_metadata (ForeignKey): the active generation. Set to null if that generation is deleted.
+
+    activated (DateTimeField): when the generation was activated.
+    """
+    id = models.SmallAutoField(primary_key=True)
+    list_source = models.CharField(max_length=32, unique=True, default=SDN_FALLBACK_DEFAULT_LIST_SOURCE)
+    sdn_fallback_metadata = models.ForeignKey(
+        SDNFallbackMetadata, null=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    activated = models.DateTimeField(null=True)
+
+    @classmethod
+    def activate(cls, sdn_fallback_metadata):
+        """
+        Point fallback checks at the given SDNFallbackMetadata generation, for its screening list.
+        """
+        now = datetime.now(timezone.utc)
+        list_source = sdn_fallback_metadata.list_source
+        updated = cls.objects.filter(list_source=list_source).update(
+            sdn_fallback_metadata=sdn_fallback_metadata, activated=now
+        )
+        if not updated:
+            # First activation of the list, its pointer row doesn't exist yet
+            cls.objects.create(list_source=list_source, sdn_fallback_metadata=sdn_fallback_metadata, activated=now)
+        logger.info(
+            "Sanctions SDNFallback: Activated SDNFallbackMetadata generation %s of list %s.",
+            sdn_fallback_metadata.id, list_source
+        )
 
 
 class SDNFallbackData(models.Model):
@@ -213,13 +410,45 @@ class SDNFallbackData(models.Model):
     addresses = models.TextField(default='')
     countries = models.CharField(default='', max_length=255)
 
+    class Meta:
+        indexes = [
+            # Lets the fallback check resolve each (source, sdn_type) pair of the current
+            # generation with a single index probe instead of scanning the generation.
+            models.Index(
+                fields=['sdn_fallback_metadata', 'source', 'sdn_type'],
+                name='sdn_fallback_gen_src_type_idx',
+            ),
+        ]
+
     @classmethod
     def get_current_records_and_filter_by_source_and_type(cls, source, sdn_type):
         """
         Query the records that have 'Current' import state, and filter by source and sdn_type.
         """
+        return cls.get_current_records_and_filter_by_sources_and_types([source], [sdn_type])
+
+    @classmethod
+    def get_current_records_and_filter_by_sources_and_types(cls, sources, sdn_types):
+        """
+        Query the records that have 'Current' import state, and filter by any of the given sources and sdn_types.
+        """
+        query_params = {
+            'sdn_fallback_metadata_id__in': cls.get_current_generation_ids(),
+            'source__in': list(sources),
+            'sdn_type__in': list(sdn_types),
+        }
+        return SDNFallbackData.objects.filter(**query_params)
+
+    @classmethod
+    def get_current_generation_ids(cls):
+        """
+        Return the ids of the SDNFallbackMetadata generations that have 'Current' import state, one per list.
+
+        Raises:
+            Exception: if the fallback data is not yet populated
+        """
         try:
-            current_metadata = SDNFallbackMetadata.objects.get(import_state='Current')
+            return SDNFallbackMetadata.get_current_metadata_ids()
 
         # The 'get' relies on the manage command having been run. If it fails, tell engineer what's needed
         except SDNFallbackMetadata.DoesNotExist as fallback_metadata_no_exist:
@@ -230,5 +459,3 @@ class SDNFallbackData(models.Model):
             raise Exception(
                 'Sanctions SDNFallback empty error when calling checkSDNFallback, data is not yet populated.'
             ) from fallback_metadata_no_exist
-        query_params = {'source': source, 'sdn_fallback_metadata': current_metadata, 'sdn_type': sdn_type}
-        return SDNFallbackData.objects.filter(**query_params)
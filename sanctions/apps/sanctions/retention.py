@@ -0,0 +1,195 @@
+"""
+Retention of the sanctions check failures: archival of the old failures, and of their history, out of the database.
+
+Every sanctions hit adds a failure and a history row, and nothing ever removed them, so the tables grew forever. The
+failures created before the retention period, and their history rows, are moved to gzip compressed JSON Lines
+files (in the format of the exports, see exports.py) a batch at a time, pausing between batches so that the
+archival doesn't compete with the hits being recorded. Then so are the history rows created before the retention
+period that are left, i.e. those of the failures deleted since.
+
+Archives are saved to a Django storage (see get_archive_storage), e.g. an object storage bucket. Each archive is
+read back from the storage and checked against what was written before its rows are deleted, so an interrupted
+archival loses nothing and can just be run again. An archive left behind by an interrupted archival only holds
+rows that weren't deleted, and that the next run archives again.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, get_storage_class
+from django.db import transaction
+
+from sanctions.apps.core.utils import iterate_by_keyset
+from sanctions.apps.sanctions.exports import stream_export
+from sanctions.apps.sanctions.models import SanctionsCheckFailure
+
+logger = logging.getLogger(__name__)
+
+# The archived failures are read from, and deleted in, the writer, as a lagging replica could return failures
+# that were archived already
+ARCHIVE_DATABASE = 'default'
+
+
+def get_archive_storage(archive_dir=None):
+    """
+    Return the storage the archives are saved to, or None if none is configured.
+
+    That is a file system storage of archive_dir if given, or else an instance of the
+    SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE class (with SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE_OPTIONS), or else
+    a file system storage of SANCTIONS_CHECK_FAILURE_ARCHIVE_DIR.
+    """
+    if archive_dir:
+        return FileSystemStorage(location=archive_dir)
+    if settings.SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE:
+        storage_class = get_storage_class(settings.SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE)
+        return storage_class(**settings.SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE_OPTIONS)
+    if settings.SANCTIONS_CHECK_FAILURE_ARCHIVE_DIR:
+        return FileSystemStorage(location=settings.SANCTIONS_CHECK_FAILURE_ARCHIVE_DIR)
+    return None
+
+
+def archive_sanctions_check_failures(created_before, storage, batch_size=1000, pause=0, dry_run=False):
+    """
+    Move the failures created before created_before, and their history, to archives saved to the storage.
+
+    Each batch of batch_size failures is written to its own archive, under a year/month directory of the creation
+    date of its first failure, then each batch of the history rows of deleted failures. Returns the number of
+    failures archived, or that would be with dry_run.
+    """
+    failures = SanctionsCheckFailure.objects.using(ARCHIVE_DATABASE).filter(created__lt=created_before)
+    if dry_run:
+        return failures.count()
+
+    # Each batch is read after the previous one, so that the deleted failures aren't scanned again
+    keys = iterate_by_keyset(failures.only('id', 'created'), chunk_size=batch_size)
+    archived_count = 0
+    while batch_keys := list(islice(keys, batch_size)):
+        batch_ids = [failure.id for failure in batch_keys]
+        batch = failures.filter(id__in=batch_ids)
+        history = SanctionsCheckFailure.history.using(ARCHIVE_DATABASE).filter(  # pylint: disable=no-member
+            id__in=batch_ids
+        )
+        first = batch_keys[0]
+        filename = f'sanctions_check_failures_{first.created:%Y%m%d%H%M%S}_{first.id}-{batch_keys[-1].id}.jsonl.gz'
+        name = _save_archive(storage, batch, history, first.created, filename)
+
+        # Raw deletes, as QuerySet.delete would load the failures and record a deletion history row for each
+        with transaction.atomic(using=ARCHIVE_DATABASE):
+            history_count = history._raw_delete(ARCHIVE_DATABASE)  # pylint: disable=protected-access
+            batch._raw_delete(ARCHIVE_DATABASE)  # pylint: disable=protected-access
+
+        archived_count += len(batch_ids)
+        logger.info(
+            'Sanctions retention: archived %d failures and %d history rows to [%s].',
+            len(batch_ids), history_count, name,
+        )
+        if pause:
+            time.sleep(pause)
+
+    _archive_orphan_history(created_before, storage, batch_size, pause)
+    return archived_count
+
+
+def _archive_orphan_history(created_before, storage, batch_size, pause):
+    """
+    Move the history rows created before created_before that are left once the failures are archived, i.e. those
+    of the failures deleted since, to archives saved to the storage.
+
+    The history rows are selected by their own created, rather than through the failures they no longer have.
+    """
+    orphan_history = SanctionsCheckFailure.history.using(ARCHIVE_DATABASE).filter(  # pylint: disable=no-member
+        created__lt=created_before
+    )
+    keys = iterate_by_keyset(
+        orphan_history.only('history_id', 'created'), fields=('history_id',), chunk_size=batch_size
+    )
+    while batch_keys := list(islice(keys, batch_size)):
+        batch_ids = [record.history_id for record in batch_keys]
+        history = orphan_history.filter(history_id__in=batch_ids)
+        first = batch_keys[0]
+        filename = (
+            f'sanctions_check_failure_history_{first.created:%Y%m%d%H%M%S}_{first.history_id}-{batch_ids[-1]}.jsonl.gz'
+        )
+        name = _save_archive(storage, SanctionsCheckFailure.objects.none(), history, first.created, filename)
+
+        with transaction.atomic(using=ARCHIVE_DATABASE):
+            history._raw_delete(ARCHIVE_DATABASE)  # pylint: disable=protected-access
+
+        logger.info(
+            'Sanctions retention: archived %d history rows of deleted failures to [%s].', len(batch_ids), name
+        )
+        if pause:
+            time.sleep(pause)
+
+
+def _save_archive(storage, failures, history, created, filename):
+    """
+    Save the failures and history rows to a new archive, and return its name in the storage.
+
+    The archive is saved under a year/month directory of the given creation date, then read back from the storage
+    and checked against what was written.
+
+    Raises:
+        OSError: if the saved archive differs from what was written
+    """
+    content_hash, row_count = hashlib.sha256(), 0
+    with tempfile.TemporaryFile() as raw_archive:
+        with gzip.open(raw_archive, 'wb') as archive:
+            for line in stream_export(failures, 'jsonl', include_history=True, history_queryset=history):
+                line = line.encode('utf-8')
+                archive.write(line)
+                content_hash.update(line)
+                row_count += 1
+        raw_archive.seek(0)
+        name = storage.save(f'{created:%Y}/{created:%m}/{filename}', File(raw_archive))
+
+    _sync_local_file(storage, name)
+    _verify_archive(storage, name, content_hash.hexdigest(), row_count)
+    return name
+
+
+def _sync_local_file(storage, name):
+    """
+    Flush a file saved to a file system storage, and its directory entry, to disk.
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        # Not a file system storage, the file is durable once saved
+        return
+
+    file_descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+    directory_descriptor = os.open(os.path.dirname(path), os.O_RDONLY)
+    try:
+        os.fsync(directory_descriptor)
+    finally:
+        os.close(directory_descriptor)
+
+
+def _verify_archive(storage, name, expected_hash, expected_row_count):
+    """
+    Read an archive back from the storage, and check that it holds what was written.
+
+    Raises:
+        OSError: if the archive's content differs
+    """
+    content_hash, row_count = hashlib.sha256(), 0
+    with storage.open(name, 'rb') as raw_archive, gzip.open(raw_archive, 'rb') as archive:
+        for line in archive:
+            content_hash.update(line)
+            row_count += 1
+    if content_hash.hexdigest() != expected_hash or row_count != expected_row_count:
+        raise OSError(
+            f'Sanctions retention: archive [{name}] has {row_count} rows that differ from the '
+            f'{expected_row_count} rows written, not deleting them.'
+        )
@@ -7,7 +7,7 @@ import factory
 from django.utils import timezone
 from faker import Faker
 
-from sanctions.apps.sanctions.models import SDNFallbackData, SDNFallbackMetadata
+from sanctions.apps.sanctions.models import SanctionsCheckFailure, SDNFallbackData, SDNFallbackMetadata
 
 # Silence faker locale warnings
 logging.getLogger("faker").setLevel(logging.ERROR)
@@ -38,3 +38,33 @@ class SDNFallbackDataFactory(factory.django.DjangoModelFactory):
 
     class Meta:
         model = SDNFallbackData
+
+
+class SanctionsCheckFailureFactory(factory.django.DjangoModelFactory):
+    """
+    Test factory for the `SanctionsCheckFailure` model.
+    """
+    full_name = factory.Faker('name')
+    username = factory.Faker('user_name')
+    lms_user_id = factory.Sequence(lambda n: n + 1)
+    city = 'Boston'
+    country = 'US'
+    sanctions_type = 'ISN,SDN'
+    system_identifier = 'commerce-coordinator'
+    metadata = factory.LazyFunction(lambda: {'order_identifer': 'EDX-123456'})
+    sanctions_response = factory.LazyFunction(lambda: {'total': 1})
+
+    class Meta:
+        model = SanctionsCheckFailure
+
+    @classmethod
+    def _create(cls, model_class, *args, **kwargs):
+        """
+        Create the failure, then set its created timestamp if one was given, as it is overwritten on creation.
+        """
+        created = kwargs.pop('created', None)
+        failure = super()._create(model_class, *args, **kwargs)
+        if created is not None:
+            model_class.objects.filter(pk=failure.pk).update(created=created)
+            failure.created = created
+        return failure
@@ -0,0 +1,86 @@
+"""
+Tests for the admin of the sanctions app.
+"""
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from sanctions.apps.core.tests.factories import UserFactory
+from sanctions.apps.sanctions.tests.factories import (
+    SanctionsCheckFailureFactory,
+    SDNFallbackDataFactory,
+    SDNFallbackMetadataFactory
+)
+
+
+class SanctionsAdminTests(TestCase):
+    """
+    Tests for the admin lists of the sanctions models.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(UserFactory(is_staff=True, is_superuser=True))
+        self.metadata = SDNFallbackMetadataFactory(import_state='Current', token_filter=b'\x00' * 1024)
+        SDNFallbackDataFactory.create_batch(3, sdn_fallback_metadata=self.metadata)
+        SDNFallbackDataFactory.create_batch(2, sdn_fallback_metadata=SDNFallbackMetadataFactory())
+        SanctionsCheckFailureFactory.create_batch(3)
+        SanctionsCheckFailureFactory(country='IR', system_identifier='ecommerce')
+
+    def _get_changelist(self, model_name, **params):
+        """
+        Return the changelist page of the model, and the queries it ran.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:sanctions_{model_name}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_sdn_fallback_data_list(self):
+        response, queries = self._get_changelist('sdnfallbackdata')
+
+        self.assertEqual(response.context['cl'].result_count, 5)
+        self.assertContains(response, f'{self.metadata.id} (CSL, Current)')
+        # The generations are joined, without their token filters
+        self.assertFalse([sql for sql in queries if 'token_filter' in sql])
+        self.assertFalse([sql for sql in queries if 'FROM "sanctions_sdnfallbackmetadata" WHERE' in sql])
+
+    def test_sdn_fallback_data_list_by_generation(self):
+        response, queries = self._get_changelist('sdnfallbackdata', generation=self.metadata.id)
+
+        self.assertEqual(response.context['cl'].result_count, 3)
+        # Only the filtered list is counted
+        self.assertEqual(len([sql for sql in queries if 'COUNT(*)' in sql]), 1)
+
+    def test_sdn_fallback_metadata_list(self):
+        _, queries = self._get_changelist('sdnfallbackmetadata')
+
+        self.assertFalse([sql for sql in queries if 'token_filter' in sql])
+
+    def test_sanctions_check_failure_list(self):
+        response, _ = self._get_changelist('sanctionscheckfailure', country='IR')
+
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertContains(response, 'Export the selected failures and their history as CSV')
+
+    @mock.patch('sanctions.apps.core.admin.get_estimated_row_count', return_value=2000000)
+    def test_large_table_is_not_counted(self, mock_estimate):  # pylint: disable=unused-argument
+        response, queries = self._get_changelist('sanctionscheckfailure')
+
+        self.assertEqual(response.context['cl'].result_count, 2000000)
+        self.assertFalse([sql for sql in queries if 'COUNT(*)' in sql])
+
+    def test_read_only(self):
+        self.assertEqual(self.client.get(reverse('admin:sanctions_sanctionscheckfailure_add')).status_code, 403)
+
+        failure = SanctionsCheckFailureFactory()
+        change_url = reverse('admin:sanctions_sanctionscheckfailure_change', args=[failure.id])
+        response = self.client.get(change_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'name="full_name"')
+        self.client.post(change_url, {'full_name': 'Changed'})
+        failure.refresh_from_db()
+        self.assertNotEqual(failure.full_name, 'Changed')
@@ -0,0 +1,106 @@
+"""
+Tests for the sanctions database routers.
+"""
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from sanctions.apps.core.cache import ProcessCache
+from sanctions.apps.sanctions.db_routers import ReadReplicaRouter
+from sanctions.apps.sanctions.models import (
+    SanctionsCheckFailure,
+    SDNFallbackActiveGeneration,
+    SDNFallbackData,
+    SDNFallbackMetadata
+)
+from sanctions.apps.sanctions.tests.factories import SDNFallbackMetadataFactory
+
+DATABASES_WITH_REPLICA = dict(settings.DATABASES, read_replica=settings.DATABASES['default'])
+
+
+class ReadReplicaRouterTests(TestCase):
+    """
+    Tests for ReadReplicaRouter.
+    """
+    def setUp(self):
+        super().setUp()
+        self.router = ReadReplicaRouter()
+
+    def test_no_replica_configured(self):
+        self.assertIsNone(self.router.db_for_read(SDNFallbackData))
+        self.assertIsNone(self.router.allow_migrate('default', 'sanctions'))
+
+    @override_settings(DATABASES=DATABASES_WITH_REPLICA)
+    @mock.patch.object(ReadReplicaRouter, '_is_replica_fresh', return_value=True)
+    def test_fresh_replica(self, _mock_is_fresh):
+        self.assertEqual(self.router.db_for_read(SDNFallbackData), 'read_replica')
+        self.assertEqual(self.router.db_for_read(SanctionsCheckFailure), 'read_replica')
+        historical_model = apps.get_model('sanctions', 'HistoricalSanctionsCheckFailure')
+        self.assertEqual(self.router.db_for_read(historical_model), 'read_replica')
+        # The generation bookkeeping and everything else stays on the writer
+        self.assertIsNone(self.router.db_for_read(SDNFallbackMetadata))
+        self.assertIsNone(self.router.db_for_read(SDNFallbackActiveGeneration))
+
+    @override_settings(DATABASES=DATABASES_WITH_REPLICA)
+    @mock.patch.object(ReadReplicaRouter, '_is_replica_fresh', return_value=False)
+    def test_lagging_replica(self, _mock_is_fresh):
+        self.assertIsNone(self.router.db_for_read(SDNFallbackData))
+
+    @override_settings(DATABASES=DATABASES_WITH_REPLICA)
+    def test_no_migrations_on_replica(self):
+        self.assertFalse(self.router.allow_migrate('read_replica', 'sanctions'))
+        self.assertIsNone(self.router.allow_migrate('default', 'sanctions'))
+
+    @override_settings(SANCTIONS_READ_REPLICA_DATABASE='default')
+    def test_is_replica_fresh(self):
+        """ The replica is fresh when its active generations match the writer's. """
+        SDNFallbackActiveGeneration.activate(SDNFallbackMetadataFactory.create(import_state='Current'))
+        self.assertTrue(ReadReplicaRouter._is_replica_fresh('default'))  # pylint: disable=protected-access
+
+        # The result is cached
+        with self.assertNumQueries(0):
+            self.assertTrue(ReadReplicaRouter._is_replica_fresh('default'))  # pylint: disable=protected-access
+
+    @override_settings(SANCTIONS_READ_REPLICA_DATABASE='default')
+    def test_is_replica_fresh_lagging(self):
+        """ The replica is lagging when its active generation differs from the writer's. """
+        SDNFallbackActiveGeneration.activate(SDNFallbackMetadataFactory.create(import_state='Current'))
+        with mock.patch.object(SDNFallbackMetadata, 'get_current_metadata_ids', return_value=(-1,)):
+            self.assertFalse(ReadReplicaRouter._is_replica_fresh('default'))  # pylint: disable=protected-access
+
+    @override_settings(DATABASES=DATABASES_WITH_REPLICA)
+    def test_is_replica_fresh_across_swap(self):
+        """ A replica found fresh is checked again once the writer swaps to new generations. """
+        old_metadata = SDNFallbackMetadataFactory.create(import_state='Current')
+        SDNFallbackActiveGeneration.activate(old_metadata)
+        lookup_current_metadata_ids = SDNFallbackMetadata.lookup_current_metadata_ids
+
+        def lagging_lookup(using='default'):
+            # The replica never replicates the swap
+            if using == 'read_replica':
+                return (old_metadata.id,)
+            return lookup_current_metadata_ids(using=using)
+
+        with mock.patch.object(SDNFallbackMetadata, 'lookup_current_metadata_ids', side_effect=lagging_lookup):
+            self.assertTrue(ReadReplicaRouter._is_replica_fresh('read_replica'))  # pylint: disable=protected-access
+
+            SDNFallbackMetadataFactory.create(import_state='New')
+            with self.captureOnCommitCallbacks(execute=True):
+                SDNFallbackMetadata.swap_all_states()
+
+            self.assertFalse(ReadReplicaRouter._is_replica_fresh('read_replica'))  # pylint: disable=protected-access
+            self.assertIsNone(self.router.db_for_read(SDNFallbackData))
+
+    @override_settings(SANCTIONS_READ_REPLICA_DATABASE='default')
+    def test_is_replica_fresh_errors(self):
+        """ The replica is not used if it can't be checked, or there is no generation at all. """
+        self.assertFalse(ReadReplicaRouter._is_replica_fresh('default'))  # pylint: disable=protected-access
+
+        ProcessCache.clear_all()
+        SDNFallbackActiveGeneration.activate(SDNFallbackMetadataFactory.create(import_state='Current'))
+        with mock.patch.object(SDNFallbackMetadata, 'get_current_metadata_ids', side_effect=DatabaseError):
+            self.assertFalse(ReadReplicaRouter._is_replica_fresh('default'))  # pylint: disable=protected-access
@@ -0,0 +1,118 @@
+"""
+Tests for the exports of the sanctions check failures.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from sanctions.apps.core.tests.factories import UserFactory
+from sanctions.apps.sanctions.exports import EXPORT_COLUMNS, iterate_export_rows, stream_export
+from sanctions.apps.sanctions.models import SanctionsCheckFailure
+from sanctions.apps.sanctions.tests.factories import SanctionsCheckFailureFactory
+
+
+class ExportTests(TestCase):
+    """
+    Tests for stream_export.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.first = SanctionsCheckFailureFactory(created=datetime(2023, 1, 1, tzinfo=timezone.utc), full_name='Añil')
+        self.second = SanctionsCheckFailureFactory(created=datetime(2023, 2, 1, tzinfo=timezone.utc))
+        self.second.city = 'Cambridge'
+        self.second.save()
+
+    def test_rows(self):
+        rows = list(iterate_export_rows(SanctionsCheckFailure.objects.all()))
+
+        self.assertEqual([row['id'] for row in rows], [self.first.id, self.second.id])
+        self.assertEqual({row['record_type'] for row in rows}, {'failure'})
+        self.assertIsNone(rows[0]['history_id'])
+        self.assertEqual(rows[0]['metadata'], {'order_identifer': 'EDX-123456'})
+
+    def test_rows_with_history(self):
+        rows = list(iterate_export_rows(SanctionsCheckFailure.objects.filter(id=self.second.id), include_history=True))
+
+        self.assertEqual([row['record_type'] for row in rows], ['failure', 'history', 'history'])
+        self.assertEqual({row['id'] for row in rows}, {self.second.id})
+        self.assertEqual([row['history_type'] for row in rows[1:]], ['+', '~'])
+        self.assertEqual([row['city'] for row in rows[1:]], ['Boston', 'Cambridge'])
+
+    @override_settings(SANCTIONS_CHECK_FAILURE_REPORT_STREAM_CHUNK_SIZE=1)
+    def test_reads_in_chunks(self):
+        lines = stream_export(SanctionsCheckFailure.objects.all(), 'jsonl', include_history=True)
+
+        # A query per chunk of failures and of history rows, plus the last (empty) chunk of each
+        with self.assertNumQueries(3 + 4):
+            self.assertEqual(len(list(lines)), 5)
+
+    def test_csv(self):
+        content = ''.join(stream_export(SanctionsCheckFailure.objects.all(), 'csv', include_history=True))
+        rows = list(csv.DictReader(io.StringIO(content)))
+
+        self.assertEqual(tuple(rows[0]), EXPORT_COLUMNS)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['full_name'], 'Añil')
+        self.assertEqual(rows[0]['created'], '2023-01-01T00:00:00+00:00')
+        self.assertEqual(rows[0]['history_id'], '')
+        self.assertEqual(json.loads(rows[0]['sanctions_response']), {'total': 1})
+        self.assertEqual(rows[2]['record_type'], 'history')
+
+    def test_jsonl(self):
+        lines = list(stream_export(SanctionsCheckFailure.objects.all(), 'jsonl'))
+
+        self.assertEqual(len(lines), 2)
+        row = json.loads(lines[0])
+        self.assertEqual(tuple(row), EXPORT_COLUMNS)
+        self.assertEqual(row['full_name'], 'Añil')
+        self.assertEqual(row['metadata'], {'order_identifer': 'EDX-123456'})
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            list(stream_export(SanctionsCheckFailure.objects.all(), 'xml'))
+
+
+class SanctionsCheckFailureAdminExportTests(TestCase):
+    """
+    Tests for the export actions of SanctionsCheckFailureAdmin.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserFactory(is_staff=True, is_superuser=True)
+        self.client.force_login(self.user)
+        self.failures = SanctionsCheckFailureFactory.create_batch(2)
+        SanctionsCheckFailureFactory()
+
+    def _export(self, action):
+        return self.client.post(reverse('admin:sanctions_sanctionscheckfailure_changelist'), {
+            'action': action,
+            '_selected_action': [failure.id for failure in self.failures],
+        })
+
+    def test_export_as_csv(self):
+        response = self._export('export_as_csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="sanctions_check_failures_\d+\.csv"$')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(row['record_type'], int(row['id'])) for row in rows], [
+            ('failure', self.failures[0].id), ('failure', self.failures[1].id),
+            ('history', self.failures[0].id), ('history', self.failures[1].id),
+        ])
+
+    def test_export_as_jsonl(self):
+        response = self._export('export_as_jsonl')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/jsonl')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['record_type'] for line in lines], ['failure'] * 2 + ['history'] * 2)
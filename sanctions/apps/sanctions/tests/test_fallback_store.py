@@ -0,0 +1,159 @@
+"""
+Tests for the SDN fallback record store.
+"""
+from unittest import mock
+
+from django.test import TestCase
+
+from sanctions.apps.sanctions.fallback_store import (
+    COUNTRY_BITS,
+    RECORD_FIXED_BYTES,
+    TOKEN_BYTES,
+    SDNFallbackRecordStore,
+    get_current_record_store
+)
+from sanctions.apps.sanctions.models import SDNFallbackActiveGeneration, SDNFallbackMetadata
+from sanctions.apps.sanctions.tests.factories import SDNFallbackDataFactory, SDNFallbackMetadataFactory
+
+SDN_SOURCE = 'Specially Designated Nationals (SDN) - Treasury Department'
+ISN_SOURCE = 'Nonproliferation Sanctions (ISN) - State Department'
+
+
+class SDNFallbackRecordStoreTests(TestCase):
+    """
+    Tests for SDNFallbackRecordStore.
+    """
+    def setUp(self):
+        super().setUp()
+        self.store = SDNFallbackRecordStore(generation_ids=[1])
+        self.store.add(SDN_SOURCE, 'Individual', 'maria giuseppe', '123 main street boston', 'US IT')
+        self.store.add(ISN_SOURCE, '', 'maria rossi', 'via roma 1 milan', 'IT')
+
+    def test_record_views(self):
+        self.assertEqual(len(self.store), 2)
+        record = self.store[0]
+        self.assertEqual(record.source, SDN_SOURCE)
+        self.assertEqual(record.sdn_type, 'Individual')
+        self.assertEqual(record.names, {'maria', 'giuseppe'})
+        self.assertEqual(record.addresses, {'123', 'main', 'street', 'boston'})
+        self.assertEqual(record.countries, {'US', 'IT'})
+        self.assertEqual(self.store[1].countries, {'IT'})
+        with self.assertRaises(AttributeError):
+            record.extra = 'not allowed'  # pylint: disable=assigning-non-slot
+        with self.assertRaises(IndexError):
+            self.store[2]  # pylint: disable=pointless-statement
+
+    def test_count_hits(self):
+        self.assertEqual(self.store.count_hits({'giuseppe', 'maria'}, {'boston'}, 'US'), 1)
+        self.assertEqual(self.store.count_hits({'maria'}, set(), 'IT'), 2)
+        self.assertEqual(self.store.count_hits({'maria'}, {'milan'}, 'IT'), 1)
+
+    def test_count_hits_no_match(self):
+        self.assertEqual(self.store.count_hits({'maria'}, {'boston'}, 'CA'), 0)
+        self.assertEqual(self.store.count_hits({'maria', 'unknown'}, {'boston'}, 'US'), 0)
+        self.assertEqual(self.store.count_hits({'maria', 'rossi'}, {'boston'}, 'IT'), 0)
+        self.assertEqual(self.store.count_hits({'maria'}, {'boston'}, 'XX'), 0)
+
+    def test_count_hits_reindexes_added_records(self):
+        self.assertEqual(self.store.count_hits({'maria'}, set(), 'IT'), 2)
+        self.store.add(SDN_SOURCE, 'Individual', 'maria bianchi', 'turin', 'IT')
+        self.assertEqual(self.store.count_hits({'maria'}, set(), 'IT'), 3)
+        self.assertEqual(self.store.count_hits({'bianchi'}, {'turin'}, 'IT'), 1)
+
+    def test_count_hits_across_country_words(self):
+        """ Countries are spread over several bitmap words, every one of them must be indexed. """
+        last_country = max(COUNTRY_BITS, key=COUNTRY_BITS.get)
+        self.store.add(SDN_SOURCE, 'Individual', 'maria', 'harare', 'AD ' + last_country)
+        self.assertEqual(self.store.count_hits({'maria'}, {'harare'}, 'AD'), 1)
+        self.assertEqual(self.store.count_hits({'maria'}, {'harare'}, last_country), 1)
+        self.assertEqual(self.store.count_hits({'maria'}, set(), 'US'), 1)
+
+    def test_count_hits_intersects_long_postings(self):
+        """ A rare token is only looked up in the postings of the frequent ones. """
+        for index in range(200):
+            self.store.add(SDN_SOURCE, 'Individual', f'maria name{index}', 'boston', 'US' if index % 2 else 'IT')
+        self.assertEqual(self.store.count_hits({'maria', 'name7'}, {'boston'}, 'US'), 1)
+        self.assertEqual(self.store.count_hits({'maria', 'name8'}, {'boston'}, 'US'), 0)
+        self.assertEqual(self.store.count_hits({'maria'}, {'boston'}, 'US'), 101)
+        self.assertEqual(self.store.count_hits(set(), set(), 'IT'), 102)
+
+    def test_bytes_per_record_budget(self):
+        token_count = len(self.store.name_tokens) + len(self.store.address_tokens)
+        # The offset arrays have one extra leading entry each
+        self.assertEqual(
+            self.store.nbytes,
+            len(self.store) * RECORD_FIXED_BYTES + TOKEN_BYTES * token_count + 2 * 4
+        )
+
+    def test_index_bytes_budget(self):
+        nbytes = self.store.nbytes
+        self.store.build_index()
+        token_count = len(self.store.name_tokens) + len(self.store.address_tokens)
+        # Posting lists take one index per token and one offset per vocabulary entry and field (plus one)
+        self.assertEqual(
+            self.store.nbytes - nbytes,
+            TOKEN_BYTES * token_count + 2 * 4 * (len(self.store.vocabulary) + 1)
+        )
+
+
+class GetCurrentRecordStoreTests(TestCase):
+    """
+    Tests for get_current_record_store.
+    """
+    def setUp(self):
+        super().setUp()
+        self.metadata = SDNFallbackMetadataFactory.create(import_state='Current')
+        SDNFallbackActiveGeneration.activate(self.metadata)
+        SDNFallbackDataFactory.create(
+            sdn_fallback_metadata=self.metadata, source=SDN_SOURCE, sdn_type='Individual',
+            names='maria giuseppe', addresses='boston', countries='US',
+        )
+        SDNFallbackDataFactory.create(sdn_fallback_metadata=self.metadata, source=SDN_SOURCE, sdn_type='Entity')
+
+    def test_loads_screened_records_once(self):
+        store = get_current_record_store([SDN_SOURCE], ['Individual'])
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.generation_ids, (self.metadata.id,))
+        self.assertIsNotNone(store.load_time)
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_current_record_store([SDN_SOURCE], ['Individual']), store)
+
+    def test_reloads_new_generation(self):
+        store = get_current_record_store([SDN_SOURCE], ['Individual'])
+        new_metadata = SDNFallbackMetadataFactory.create(import_state='New')
+        with self.captureOnCommitCallbacks(execute=True):
+            SDNFallbackMetadata.swap_all_states()
+
+        new_store = get_current_record_store([SDN_SOURCE], ['Individual'])
+        self.assertIsNot(new_store, store)
+        self.assertEqual(new_store.generation_ids, (new_metadata.id,))
+        self.assertEqual(len(new_store), 0)
+
+    def test_lagging_replica_across_swap(self):
+        """ The new generations are read from the writer while the replica still serves the old ones. """
+        new_metadata = SDNFallbackMetadataFactory.create(import_state='New')
+        SDNFallbackDataFactory.create(
+            sdn_fallback_metadata=new_metadata, source=SDN_SOURCE, sdn_type='Individual', names='maria rossi',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            SDNFallbackMetadata.swap_all_states()
+        lookup_current_metadata_ids = SDNFallbackMetadata.lookup_current_metadata_ids
+
+        def lagging_lookup(using='default'):
+            if using == 'read_replica':
+                return (self.metadata.id,)
+            return lookup_current_metadata_ids(using=using)
+
+        with mock.patch('sanctions.apps.sanctions.fallback_store.router.db_for_read', return_value='read_replica'), \
+                mock.patch.object(SDNFallbackMetadata, 'lookup_current_metadata_ids', side_effect=lagging_lookup):
+            store = get_current_record_store([SDN_SOURCE], ['Individual'])
+
+        self.assertEqual(store.generation_ids, (new_metadata.id,))
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store[0].names, {'maria', 'rossi'})
+
+    def test_no_current_generation(self):
+        SDNFallbackMetadata.objects.all().delete()
+        with self.assertRaises(Exception):
+            get_current_record_store([SDN_SOURCE], ['Individual'])
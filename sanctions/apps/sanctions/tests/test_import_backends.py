@@ -0,0 +1,136 @@
+"""
+Tests for the SDN fallback import backends.
+"""
+import io
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import override_settings
+from testfixtures import LogCapture
+
+from sanctions.apps.sanctions.import_backends import (
+    STAGING_TABLE,
+    BulkLoadImportBackend,
+    ImportBackend,
+    ORMImportBackend,
+    get_import_backend,
+    read_staging_file,
+    write_staging_file
+)
+from sanctions.apps.sanctions.models import SDNFallbackData
+from sanctions.apps.sanctions.tests.factories import SDNFallbackMetadataFactory
+
+RECORDS = [
+    ('Specially Designated Nationals (SDN) - Treasury Department', 'Individual', 'maria giuseppe', 'boston us',
+     'US IT'),
+    ('Nonproliferation Sanctions (ISN) - State Department', '', 'acme\tcorp', 'line\nbreak \\ backslash', ''),
+]
+
+
+class ImportBackendTests(TestCase):
+    """
+    Tests for the ImportBackend base class.
+    """
+    def test_backends_must_implement_load(self):
+        class IncompleteImportBackend(ImportBackend):
+            name = 'incomplete'
+
+        with self.assertRaises(TypeError):
+            IncompleteImportBackend()  # pylint: disable=abstract-class-instantiated
+
+
+class StagingFileTests(TestCase):
+    """
+    Tests for the staging file format.
+    """
+    def test_round_trip(self):
+        staging_file = io.StringIO()
+        self.assertEqual(write_staging_file(RECORDS, staging_file), 2)
+        # One line per record, with the separators in values escaped
+        self.assertEqual(staging_file.getvalue().count('\n'), 2)
+        self.assertIn('acme\\tcorp\tline\\nbreak \\\\ backslash\t\n', staging_file.getvalue())
+
+        staging_file.seek(0)
+        self.assertEqual(list(read_staging_file(staging_file)), RECORDS)
+
+
+@override_settings(SDN_FALLBACK_IMPORT_CHUNK_SIZE=1)
+class BulkLoadImportBackendTests(TestCase):
+    """
+    Tests for BulkLoadImportBackend.
+    """
+    def _get_records(self, metadata):
+        return list(
+            SDNFallbackData.objects.filter(sdn_fallback_metadata=metadata).order_by('id').values_list(
+                'source', 'sdn_type', 'names', 'addresses', 'countries'
+            )
+        )
+
+    def test_load(self):
+        metadata = SDNFallbackMetadataFactory.create(import_state='New')
+        BulkLoadImportBackend().load(iter(RECORDS), metadata)
+        self.assertEqual(self._get_records(metadata), RECORDS)
+
+        # The staging table is dropped, so that another generation can be loaded on the same connection
+        other_metadata = SDNFallbackMetadataFactory.create(import_state='Current')
+        BulkLoadImportBackend().load(iter(RECORDS[:1]), other_metadata)
+        self.assertEqual(self._get_records(other_metadata), RECORDS[:1])
+        self.assertNotIn(STAGING_TABLE, connection.introspection.table_names())
+
+    def test_load_matches_orm_backend(self):
+        bulk_load_metadata = SDNFallbackMetadataFactory.create(import_state='New')
+        orm_metadata = SDNFallbackMetadataFactory.create(import_state='Current')
+        BulkLoadImportBackend().load(RECORDS, bulk_load_metadata)
+        ORMImportBackend().load(RECORDS, orm_metadata)
+        self.assertEqual(self._get_records(bulk_load_metadata), self._get_records(orm_metadata))
+
+    def test_load_mysql(self):
+        """ On MySQL, the staging file is loaded with LOAD DATA LOCAL INFILE. """
+        cursor = mock.MagicMock()
+        mock_connection = mock.MagicMock(vendor='mysql', ops=connection.ops)
+        mock_connection.cursor.return_value.__enter__.return_value = cursor
+        metadata = SDNFallbackMetadataFactory.create(import_state='New')
+
+        with mock.patch('sanctions.apps.sanctions.import_backends.connections', {'default': mock_connection}):
+            BulkLoadImportBackend().load(RECORDS, metadata)
+
+        statements = [call[0][0] for call in cursor.execute.call_args_list]
+        self.assertEqual(len(statements), 4)
+        self.assertTrue(statements[0].startswith('CREATE TEMPORARY TABLE'))
+        self.assertTrue(statements[1].startswith('LOAD DATA LOCAL INFILE %s INTO TABLE'))
+        self.assertTrue(cursor.execute.call_args_list[1][0][1][0].endswith('.tsv'))
+        self.assertTrue(statements[2].startswith('INSERT INTO "sanctions_sdnfallbackdata"'))
+        self.assertEqual(cursor.execute.call_args_list[2][0][1], [metadata.id])
+        self.assertTrue(statements[3].startswith('DROP TEMPORARY TABLE'))
+
+
+class GetImportBackendTests(TestCase):
+    """
+    Tests for get_import_backend.
+    """
+    LOGGER_NAME = 'sanctions.apps.sanctions.import_backends'
+
+    def test_defaults_to_configured_backend(self):
+        self.assertIsInstance(get_import_backend(), ORMImportBackend)
+        with override_settings(SDN_FALLBACK_IMPORT_BACKEND='bulk_load'):
+            self.assertIsInstance(get_import_backend(), BulkLoadImportBackend)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_import_backend('foo')
+
+    def test_unsupported_database_falls_back_to_orm(self):
+        mock_connection = mock.Mock(vendor='oracle')
+        with LogCapture(self.LOGGER_NAME) as log, \
+                mock.patch('sanctions.apps.sanctions.import_backends.connections', {'default': mock_connection}):
+            self.assertIsInstance(get_import_backend('bulk_load'), ORMImportBackend)
+            log.check(
+                (
+                    self.LOGGER_NAME,
+                    'WARNING',
+                    "Sanctions SDNFallback: The [bulk_load] import backend doesn't support oracle, "
+                    "using the [orm] backend instead."
+                ),
+            )
@@ -0,0 +1,245 @@
+"""
+Tests for the screening list sources.
+"""
+import io
+import tracemalloc
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from testfixtures import LogCapture
+
+from sanctions.apps.sanctions.list_sources import (
+    ConsolidatedScreeningListSource,
+    EUConsolidatedListSource,
+    ListSource,
+    OFACAdvancedListSource,
+    get_list_sources
+)
+from sanctions.apps.sanctions.utils import normalize_sdn_csv_rows
+
+EU_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<export xmlns="http://eu.europa.ec/fpi/fsd/export" generationDate="2026-10-19T10:00:00.000+02:00">
+  <sanctionEntity designationDate="2022-02-23" logicalId="13">
+    <subjectType code="person" classificationCode="P"/>
+    <nameAlias firstName="Maria" lastName="Giuseppe" wholeName="Maria Giuseppe"/>
+    <nameAlias wholeName="Мария Джузеппе"/>
+    <address city="Boston" street="123 Main Street" zipCode="02108" countryIso2Code="US"/>
+    <address city="Milan" countryIso2Code="IT"/>
+    <identification number="AB123" countryIso2Code="FR"/>
+  </sanctionEntity>
+  <sanctionEntity designationDate="2022-02-23" logicalId="14">
+    <subjectType code="enterprise" classificationCode="E"/>
+    <nameAlias wholeName="ACME Corp"/>
+  </sanctionEntity>
+</export>
+'''.encode('utf-8')
+
+OFAC_NAMESPACE = 'https://sanctionslistservice.ofac.treas.gov/api/PublicationPreview/exports/ADVANCED_XML'
+
+
+def get_ofac_party(fixed_ref, party_sub_type, aliases, location_ids=()):
+    """ Return a DistinctParty element of the OFAC advanced XML. """
+    alias_elements = ''.join(
+        f'<Alias AliasTypeID="1403" Primary="{str(primary).lower()}"><DocumentedName>'
+        + ''.join(f'<DocumentedNamePart><NamePartValue>{part}</NamePartValue></DocumentedNamePart>' for part in name)
+        + '</DocumentedName></Alias>'
+        for name, primary in aliases
+    )
+    features = ''.join(
+        f'<Feature FeatureTypeID="25"><FeatureVersion><VersionLocation LocationID="{location_id}"/>'
+        '</FeatureVersion></Feature>'
+        for location_id in location_ids
+    )
+    return (
+        f'<DistinctParty FixedRef="{fixed_ref}"><Comment/><Profile ID="{fixed_ref}" PartySubTypeID="{party_sub_type}">'
+        f'<Identity ID="{fixed_ref}0" Primary="true">{alias_elements}</Identity>{features}</Profile></DistinctParty>'
+    )
+
+
+def get_ofac_xml(parties, sanctions_entries=None):
+    """ Return an OFAC advanced XML file with the given DistinctParty (and SanctionsEntry) elements. """
+    if sanctions_entries is None:
+        sanctions_entries = ['<SanctionsEntry ID="1" ProfileID="36" ListID="1550"/>']
+    return (
+        f'<?xml version="1.0" encoding="utf-8"?><Sanctions xmlns="{OFAC_NAMESPACE}">'
+        '<DateOfIssue><Year>2026</Year></DateOfIssue>'
+        '<ReferenceValueSets>'
+        '<CountryValues><Country ID="11036" ISO2="AF">Afghanistan</Country>'
+        '<Country ID="11108" ISO2="CU">Cuba</Country></CountryValues>'
+        '<FeatureTypeValues><FeatureType ID="25">Location</FeatureType>'
+        '<FeatureType ID="8">Birthdate</FeatureType></FeatureTypeValues>'
+        '<PartySubTypeValues><PartySubType ID="3" PartyTypeID="2">Unknown</PartySubType>'
+        '<PartySubType ID="4" PartyTypeID="1">Unknown</PartySubType></PartySubTypeValues>'
+        '<PartyTypeValues><PartyType ID="1">Individual</PartyType><PartyType ID="2">Entity</PartyType>'
+        '</PartyTypeValues>'
+        '</ReferenceValueSets>'
+        '<Locations>'
+        '<Location ID="25"><LocationCountry CountryID="11108"/><LocationPart LocPartTypeID="1452">'
+        '<LocationPartValue><Value>Calle 1</Value></LocationPartValue></LocationPart>'
+        '<LocationPart LocPartTypeID="1451"><LocationPartValue><Value>Havana</Value></LocationPartValue>'
+        '</LocationPart></Location>'
+        '<Location ID="26"><LocationCountry CountryID="11036"/><LocationPart LocPartTypeID="1451">'
+        '<LocationPartValue><Value>Kabul</Value></LocationPartValue></LocationPart></Location>'
+        '</Locations>'
+        '<IDRegDocuments><IDRegDocument ID="1" IDRegDocTypeID="1571" IdentityID="360" IssuedBy-CountryID="11036">'
+        '<IDRegistrationNo>P123</IDRegistrationNo></IDRegDocument></IDRegDocuments>'
+        f'<DistinctParties>{"".join(parties)}</DistinctParties>'
+        f'<SanctionsEntries>{"".join(sanctions_entries)}</SanctionsEntries>'
+        '</Sanctions>'
+    ).encode('utf-8')
+
+
+class ListSourceTests(TestCase):
+    """
+    Tests for the ListSource base class.
+    """
+    def test_list_sources_must_implement_iter_rows(self):
+        class IncompleteListSource(ListSource):
+            name = 'INCOMPLETE'
+
+        with self.assertRaises(TypeError):
+            IncompleteListSource()  # pylint: disable=abstract-class-instantiated
+
+
+class ConsolidatedScreeningListSourceTests(TestCase):
+    """
+    Tests for ConsolidatedScreeningListSource.
+    """
+    def test_iter_rows(self):
+        sdn_csv = 'source,type,name,addresses,alt_names,ids\nSDN,Individual,Maria Giuseppe,"Boston, US",,\n'
+        rows = list(ConsolidatedScreeningListSource().iter_rows(io.BytesIO(sdn_csv.encode('utf-8'))))
+        self.assertEqual(rows, [{
+            'source': 'SDN', 'type': 'Individual', 'name': 'Maria Giuseppe', 'addresses': 'Boston, US',
+            'alt_names': '', 'ids': '',
+        }])
+
+
+class EUConsolidatedListSourceTests(TestCase):
+    """
+    Tests for EUConsolidatedListSource.
+    """
+    def test_iter_rows(self):
+        rows = list(EUConsolidatedListSource().iter_rows(io.BytesIO(EU_XML)))
+        self.assertEqual(rows, [
+            {
+                'source': EUConsolidatedListSource.source,
+                'type': 'Individual',
+                'name': 'Maria Giuseppe',
+                'addresses': '123 Main Street, Boston, 02108, US; Milan, IT',
+                'alt_names': 'Мария Джузеппе',
+                'ids': 'FR, AB123',
+            },
+            {
+                'source': EUConsolidatedListSource.source,
+                'type': 'Entity',
+                'name': 'ACME Corp',
+                'addresses': '',
+                'alt_names': '',
+                'ids': '',
+            },
+        ])
+
+    def test_rows_are_normalized_like_csv_rows(self):
+        rows = EUConsolidatedListSource().iter_rows(io.BytesIO(EU_XML))
+        source, sdn_type, names, addresses, countries = normalize_sdn_csv_rows(rows)[0]
+        self.assertEqual((source, sdn_type), (EUConsolidatedListSource.source, 'Individual'))
+        self.assertTrue({'maria', 'giuseppe'}.issubset(names.split()))
+        self.assertTrue({'boston', 'milan'}.issubset(addresses.split()))
+        self.assertEqual(set(countries.split()), {'US', 'IT', 'FR'})
+
+
+class OFACAdvancedListSourceTests(TestCase):
+    """
+    Tests for OFACAdvancedListSource.
+    """
+    def test_iter_rows(self):
+        ofac_xml = get_ofac_xml([
+            get_ofac_party(
+                36, 4, [(['Maria', 'Giuseppe'], False), (['Giuseppe', 'Maria', 'Rossi'], True)], location_ids=[25, 26]
+            ),
+            get_ofac_party(37, 3, [(['AEROCARIBBEAN', 'AIRLINES'], True)]),
+        ])
+        rows = list(OFACAdvancedListSource().iter_rows(io.BytesIO(ofac_xml)))
+        self.assertEqual(rows, [
+            {
+                'source': OFACAdvancedListSource.source,
+                'type': 'Individual',
+                'name': 'Giuseppe Maria Rossi',
+                'addresses': 'Calle 1, Havana, CU; Kabul, AF',
+                'alt_names': 'Maria Giuseppe',
+                'ids': 'AF, P123',
+            },
+            {
+                'source': OFACAdvancedListSource.source,
+                'type': 'Entity',
+                'name': 'AEROCARIBBEAN AIRLINES',
+                'addresses': '',
+                'alt_names': '',
+                'ids': '',
+            },
+        ])
+
+        source, sdn_type, names, addresses, countries = normalize_sdn_csv_rows(rows)[0]
+        self.assertEqual((source, sdn_type), (OFACAdvancedListSource.source, 'Individual'))
+        self.assertEqual(set(names.split()), {'giuseppe', 'maria', 'rossi'})
+        self.assertEqual(set(addresses.split()), {'calle', '1', 'havana', 'cu', 'kabul', 'af'})
+        self.assertEqual(set(countries.split()), {'CU', 'AF'})
+
+    def test_iter_rows_streams_parties(self):
+        """ Parties are dropped once mapped, so memory use doesn't grow with the number of parties. """
+        def get_peak_memory(party_count):
+            ofac_xml = io.BytesIO(get_ofac_xml([
+                get_ofac_party(fixed_ref, 4, [(['Party', str(fixed_ref)], True)], location_ids=[25])
+                for fixed_ref in range(party_count)
+            ]))
+            tracemalloc.start()
+            try:
+                self.assertEqual(sum(1 for _ in OFACAdvancedListSource().iter_rows(ofac_xml)), party_count)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        self.assertLess(get_peak_memory(5000), 1.5 * get_peak_memory(500))
+
+    def test_iter_rows_streams_unmapped_elements(self):
+        """ The elements of the other sections are dropped too, so memory use doesn't grow with them either. """
+        def get_peak_memory(entry_count):
+            ofac_xml = io.BytesIO(get_ofac_xml(
+                [get_ofac_party(36, 4, [(['Maria', 'Rossi'], True)])],
+                [
+                    f'<SanctionsEntry ID="{entry_id}" ProfileID="36" ListID="1550"><EntryEvent ID="{entry_id}">'
+                    '<Date><Year>2026</Year></Date><Comment>Added</Comment></EntryEvent></SanctionsEntry>'
+                    for entry_id in range(entry_count)
+                ],
+            ))
+            tracemalloc.start()
+            try:
+                self.assertEqual(sum(1 for _ in OFACAdvancedListSource().iter_rows(ofac_xml)), 1)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        self.assertLess(get_peak_memory(5000), 1.5 * get_peak_memory(500))
+
+
+class GetListSourcesTests(TestCase):
+    """
+    Tests for get_list_sources.
+    """
+    LOGGER_NAME = 'sanctions.apps.sanctions.list_sources'
+
+    def test_defaults_to_configured_sources(self):
+        self.assertEqual([list_source.name for list_source in get_list_sources()], ['CSL'])
+        with override_settings(SDN_FALLBACK_LIST_SOURCES=['CSL', 'EU']):
+            self.assertEqual([list_source.name for list_source in get_list_sources()], ['CSL', 'EU'])
+
+    def test_skips_unknown_sources(self):
+        with LogCapture(self.LOGGER_NAME) as log:
+            self.assertEqual([list_source.name for list_source in get_list_sources(['FOO', 'EU'])], ['EU'])
+            log.check(
+                (
+                    self.LOGGER_NAME,
+                    'WARNING',
+                    'Sanctions SDNFallback: Unknown list source [FOO] in SDN_FALLBACK_LIST_SOURCES, skipping it.'
+                ),
+            )
@@ -1,12 +1,20 @@
 """
 Tests for Sanctions models.
 """
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
+from django.core.cache import cache
 from django.test import TestCase
 from testfixtures import LogCapture
 
-from sanctions.apps.sanctions.models import SanctionsCheckFailure, SDNFallbackData, SDNFallbackMetadata
+from sanctions.apps.core.cache import ProcessCache
+from sanctions.apps.sanctions.models import (
+    SanctionsCheckFailure,
+    SDNFallbackActiveGeneration,
+    SDNFallbackData,
+    SDNFallbackMetadata
+)
 from sanctions.apps.sanctions.tests.factories import SDNFallbackDataFactory, SDNFallbackMetadataFactory
 
 
@@ -172,6 +180,179 @@ class SDNFallbackMetadataTests(TestCase):
             file_checksum=original_discard.file_checksum)[0]
         self.assertEqual(former_discard_metadata.import_state, 'Discard')
 
+    def test_swap_activates_new_row(self):
+        """Swapping points the active generation at the former New row."""
+        original_current = SDNFallbackMetadataFactory.create(import_state="Current")
+        SDNFallbackActiveGeneration.activate(original_current)
+        original_new = SDNFallbackMetadataFactory.create(import_state="New")
+
+        SDNFallbackMetadata.swap_all_states()
+
+        active_generation = SDNFallbackActiveGeneration.objects.get()
+        self.assertEqual(active_generation.sdn_fallback_metadata, original_new)
+        self.assertIsNotNone(active_generation.activated)
+        self.assertEqual(SDNFallbackMetadata.get_current_metadata(), original_new)
+
+    def test_swap_rollback_keeps_active_generation(self):
+        """A failed swap doesn't move the active generation."""
+        original_current = SDNFallbackMetadataFactory.create(import_state="Current")
+        SDNFallbackActiveGeneration.activate(original_current)
+
+        with self.assertRaises(SDNFallbackMetadata.DoesNotExist):
+            SDNFallbackMetadata.swap_all_states()
+
+        self.assertEqual(SDNFallbackMetadata.get_current_metadata(), original_current)
+
+    def test_get_current_metadata_follows_active_generation(self):
+        """The active generation pointer wins over the import_state label."""
+        SDNFallbackMetadataFactory.create(import_state="Current")
+        activated = SDNFallbackMetadataFactory.create(import_state="New")
+        SDNFallbackActiveGeneration.activate(activated)
+
+        with self.assertNumQueries(1):
+            current = SDNFallbackMetadata.get_current_metadata()
+        self.assertEqual(current, activated)
+        self.assertEqual(current.get_deferred_fields(), {"token_filter"})
+
+    def test_get_current_metadata_without_active_generation(self):
+        """Until a generation is activated, the 'Current' row is used."""
+        current = SDNFallbackMetadataFactory.create(import_state="Current")
+        self.assertEqual(SDNFallbackMetadata.get_current_metadata(), current)
+        self.assertEqual(SDNFallbackMetadata.get_current_metadata().get_deferred_fields(), {"token_filter"})
+
+        # The pointer is cleared if the active generation is deleted
+        SDNFallbackActiveGeneration.activate(SDNFallbackMetadataFactory.create(import_state="Discard"))
+        SDNFallbackMetadata.objects.filter(import_state="Discard").delete()
+        self.assertEqual(SDNFallbackMetadata.get_current_metadata(), current)
+
+    def test_get_current_metadata_ids_is_cached(self):
+        """The current generation ids are looked up once, then served from the process and shared caches."""
+        current = SDNFallbackMetadataFactory.create(import_state="Current")
+        SDNFallbackActiveGeneration.activate(current)
+
+        # The active generation pointers, then the 'Current' rows of lists without a pointer
+        with self.assertNumQueries(2):
+            self.assertEqual(SDNFallbackMetadata.get_current_metadata_ids(), (current.id,))
+            self.assertEqual(SDNFallbackMetadata.get_current_metadata_ids(), (current.id,))
+
+        # Another process only has the shared cache
+        ProcessCache.clear_all()
+        with self.assertNumQueries(0):
+            self.assertEqual(SDNFallbackMetadata.get_current_metadata_ids(), (current.id,))
+
+    def test_swap_refreshes_current_metadata_ids_cache(self):
+        """Swapping caches the new current generation ids once the swap is committed."""
+        SDNFallbackActiveGeneration.activate(SDNFallbackMetadataFactory.create(import_state="Current"))
+        SDNFallbackMetadata.get_current_metadata_ids()
+        new = SDNFallbackMetadataFactory.create(import_state="New")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SDNFallbackMetadata.swap_all_states()
+
+        self.assertEqual(cache.get('sanctions.sdn_fallback.current_metadata_ids'), (new.id,))
+        with self.assertNumQueries(0):
+            self.assertEqual(SDNFallbackMetadata.get_current_metadata_ids(), (new.id,))
+
+    def test_lookup_before_swap_does_not_overwrite_new_ids(self):
+        """A reader that looked the ids up before a swap committed doesn't cache them over the new ones."""
+        current = SDNFallbackMetadataFactory.create(import_state="Current")
+        SDNFallbackActiveGeneration.activate(current)
+        new = SDNFallbackMetadataFactory.create(import_state="New")
+        lookup_current_metadata_ids = SDNFallbackMetadata.lookup_current_metadata_ids
+
+        def lookup_then_swap(*args, **kwargs):
+            """ The swap commits while the reader is looking up the ids. """
+            current_metadata_ids = lookup_current_metadata_ids(*args, **kwargs)
+            mock_lookup.side_effect = lookup_current_metadata_ids
+            with self.captureOnCommitCallbacks(execute=True):
+                SDNFallbackMetadata.swap_all_states()
+            return current_metadata_ids
+
+        with mock.patch.object(
+            SDNFallbackMetadata, 'lookup_current_metadata_ids', side_effect=lookup_then_swap
+        ) as mock_lookup:
+            self.assertEqual(SDNFallbackMetadata.get_current_metadata_ids(), (new.id,))
+
+        self.assertEqual(cache.get('sanctions.sdn_fallback.current_metadata_ids'), (new.id,))
+
+    def test_lists_have_independent_generations(self):
+        """Each list source is swapped and activated on its own."""
+        csl_current = SDNFallbackMetadataFactory.create(import_state="Current")
+        SDNFallbackActiveGeneration.activate(csl_current)
+        eu_current = SDNFallbackMetadataFactory.create(list_source="EU", import_state="Current")
+        self.assertEqual(SDNFallbackMetadata.lookup_current_metadata_ids(), (csl_current.id, eu_current.id))
+
+        eu_new = SDNFallbackMetadataFactory.create(list_source="EU", import_state="New")
+        SDNFallbackMetadata.swap_all_states("EU")
+
+        self.assertEqual(SDNFallbackMetadata.get_current_metadata(), csl_current)
+        self.assertEqual(SDNFallbackMetadata.get_current_metadata("EU"), eu_new)
+        self.assertEqual(SDNFallbackMetadata.lookup_current_metadata_ids(), (csl_current.id, eu_new.id))
+        self.assertEqual(
+            SDNFallbackMetadata.objects.get(id=eu_current.id).import_state, "Discard"
+        )
+        self.assertEqual(SDNFallbackActiveGeneration.objects.count(), 2)
+
+    def test_swap_deletes_discard_records(self):
+        """The records of the Discard generation are deleted, the others' are kept."""
+        discard = SDNFallbackMetadataFactory.create(import_state="Discard")
+        current = SDNFallbackMetadataFactory.create(import_state="Current")
+        new = SDNFallbackMetadataFactory.create(import_state="New")
+        for metadata in (discard, current, new):
+            SDNFallbackDataFactory.create(sdn_fallback_metadata=metadata)
+
+        SDNFallbackMetadata.swap_all_states()
+
+        self.assertEqual(
+            set(SDNFallbackData.objects.values_list('sdn_fallback_metadata_id', flat=True)), {current.id, new.id}
+        )
+
+    def test_insert_skips_import_in_progress(self):
+        """A recent New row is an import in progress, which isn't interrupted."""
+        new = SDNFallbackMetadataFactory.create(import_state="New")
+        with LogCapture(self.LOGGER_NAME) as log:
+            self.assertIsNone(SDNFallbackMetadata.insert_new_sdn_fallback_metadata_entry('foobar'))
+            log.check_present(
+                (
+                    self.LOGGER_NAME,
+                    'WARNING',
+                    "Sanctions SDNFallback: Another import of list CSL is in progress, so skipping import."
+                ),
+            )
+        self.assertEqual(list(SDNFallbackMetadata.objects.all()), [new])
+
+    def test_insert_deletes_stale_new_generation(self):
+        """A New row older than the import timeout was left by an interrupted import."""
+        stale = SDNFallbackMetadataFactory.create(import_state="New")
+        SDNFallbackDataFactory.create(sdn_fallback_metadata=stale)
+        SDNFallbackMetadata.objects.filter(id=stale.id).update(
+            created=datetime.now(timezone.utc) - timedelta(hours=1)
+        )
+        # Other lists are left alone
+        eu_new = SDNFallbackMetadataFactory.create(list_source="EU", import_state="New")
+
+        new = SDNFallbackMetadata.insert_new_sdn_fallback_metadata_entry('foobar')
+
+        self.assertEqual(new.import_state, 'New')
+        self.assertEqual(set(SDNFallbackMetadata.objects.all()), {new, eu_new})
+        self.assertFalse(SDNFallbackData.objects.exists())
+
+    def test_no_current_metadata_ids(self):
+        SDNFallbackMetadataFactory.create(import_state="New")
+        with self.assertRaises(SDNFallbackMetadata.DoesNotExist):
+            SDNFallbackMetadata.lookup_current_metadata_ids()
+
+    def test_activate_updates_single_row(self):
+        """Activating generations keeps a single pointer row per list."""
+        first = SDNFallbackMetadataFactory.create(import_state="Current")
+        second = SDNFallbackMetadataFactory.create(import_state="New")
+
+        SDNFallbackActiveGeneration.activate(first)
+        SDNFallbackActiveGeneration.activate(second)
+
+        self.assertEqual(SDNFallbackActiveGeneration.objects.count(), 1)
+        self.assertEqual(SDNFallbackActiveGeneration.objects.get().sdn_fallback_metadata, second)
+
 
 class SDNFallbackDataTests(TestCase):
     """
@@ -255,3 +436,25 @@ class SDNFallbackDataTests(TestCase):
 
         with self.assertRaises(Exception):
             SDNFallbackData.get_current_records_and_filter_by_source_and_type(sdn_source, sdn_type)
+
+    def test_get_current_records_and_filter_by_sources_and_types(self):
+        """ Verify the query matches any of the given sources and types of the current generation. """
+        sdn_metadata_current = SDNFallbackMetadataFactory.create(import_state="Current")
+        sdn_source = "Specially Designated Nationals (SDN) - Treasury Department"
+        isn_source = "Nonproliferation Sanctions (ISN) - State Department"
+        dpl_source = "Denied Persons List (DPL) - Bureau of Industry and Security"
+
+        for source, sdn_type in [[sdn_source, "Individual"], [sdn_source, "Entity"], [isn_source, ""],
+                                 [dpl_source, ""]]:
+            SDNFallbackDataFactory.create(
+                sdn_fallback_metadata=sdn_metadata_current,
+                source=source,
+                sdn_type=sdn_type,
+            )
+
+        filtered_records = SDNFallbackData.get_current_records_and_filter_by_sources_and_types(
+            [sdn_source, isn_source], ["Individual", ""])
+        self.assertEqual(
+            sorted((record.source, record.sdn_type) for record in filtered_records),
+            [(isn_source, ""), (sdn_source, "Individual")]
+        )
@@ -0,0 +1,135 @@
+"""
+Tests for the retention of the sanctions check failures.
+"""
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase
+from django.utils import timezone
+
+from sanctions.apps.sanctions.models import SanctionsCheckFailure
+from sanctions.apps.sanctions.retention import archive_sanctions_check_failures
+from sanctions.apps.sanctions.tests.factories import SanctionsCheckFailureFactory
+
+
+class ArchiveSanctionsCheckFailuresTests(TestCase):
+    """
+    Tests for archive_sanctions_check_failures.
+    """
+
+    def setUp(self):
+        super().setUp()
+        archive_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(archive_dir.cleanup)
+        self.archive_dir = archive_dir.name
+        self.storage = FileSystemStorage(location=self.archive_dir)
+        self.old = [
+            SanctionsCheckFailureFactory(created=datetime(2018, 1, 1, tzinfo=timezone.utc)),
+            SanctionsCheckFailureFactory(created=datetime(2018, 1, 2, tzinfo=timezone.utc)),
+            SanctionsCheckFailureFactory(created=datetime(2018, 2, 1, tzinfo=timezone.utc)),
+        ]
+        self.old[0].city = 'Cambridge'
+        self.old[0].save()
+        self.recent = SanctionsCheckFailureFactory(created=datetime(2023, 1, 1, tzinfo=timezone.utc))
+        self.created_before = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    def _read_archives(self):
+        """
+        Return the rows of each archive file, by path relative to the archive directory.
+        """
+        archives = {}
+        for directory, _, filenames in os.walk(self.archive_dir):
+            for filename in filenames:
+                with gzip.open(os.path.join(directory, filename), 'rt', encoding='utf-8') as archive:
+                    relative_path = os.path.relpath(os.path.join(directory, filename), self.archive_dir)
+                    archives[relative_path] = [json.loads(line) for line in archive]
+        return archives
+
+    def test_archive(self):
+        archived_count = archive_sanctions_check_failures(self.created_before, self.storage, batch_size=2)
+
+        self.assertEqual(archived_count, 3)
+        self.assertEqual(list(SanctionsCheckFailure.objects.values_list('id', flat=True)), [self.recent.id])
+        self.assertEqual(
+            set(SanctionsCheckFailure.history.values_list('id', flat=True)),  # pylint: disable=no-member
+            {self.recent.id},
+        )
+
+        archives = self._read_archives()
+        first, second = self.old[0], self.old[2]
+        self.assertEqual(sorted(archives), [
+            f'2018/01/sanctions_check_failures_20180101000000_{first.id}-{self.old[1].id}.jsonl.gz',
+            f'2018/02/sanctions_check_failures_20180201000000_{second.id}-{second.id}.jsonl.gz',
+        ])
+        first_archive = archives[sorted(archives)[0]]
+        self.assertEqual(
+            [(row['record_type'], row['id'], row['city']) for row in first_archive],
+            [
+                ('failure', first.id, 'Cambridge'), ('failure', self.old[1].id, 'Boston'),
+                ('history', first.id, 'Boston'), ('history', self.old[1].id, 'Boston'),
+                ('history', first.id, 'Cambridge'),
+            ]
+        )
+
+    def test_batches_read_after_previous(self):
+        # Per batch: its read, the archive reads of its failures and history, and the deletes in their savepoint;
+        # then the empty read ending the archival of the failures, and the empty read of the orphan history
+        with self.assertNumQueries(3 * 7 + 1 + 1):
+            archive_sanctions_check_failures(self.created_before, self.storage, batch_size=1)
+
+    @mock.patch('sanctions.apps.sanctions.retention.time.sleep')
+    def test_pause(self, mock_sleep):
+        archive_sanctions_check_failures(self.created_before, self.storage, batch_size=2, pause=0.5)
+
+        self.assertEqual(mock_sleep.call_args_list, [mock.call(0.5), mock.call(0.5)])
+
+    def test_archives_history_of_deleted_failures(self):
+        deleted_id = self.old[1].id
+        self.old[1].delete()
+        # The factory sets created once the failure and its first history row are saved
+        SanctionsCheckFailure.history.filter(id=deleted_id).update(  # pylint: disable=no-member
+            created=self.old[1].created
+        )
+        history_count = SanctionsCheckFailure.history.count()  # pylint: disable=no-member
+
+        archive_sanctions_check_failures(self.created_before, self.storage, batch_size=2)
+
+        self.assertEqual(
+            SanctionsCheckFailure.history.count(), history_count - 5  # pylint: disable=no-member
+        )
+        archives = self._read_archives()
+        history_archives = [name for name in archives if 'sanctions_check_failure_history_' in name]
+        self.assertEqual(len(history_archives), 1)
+        self.assertEqual(
+            [(row['record_type'], row['id'], row['history_type']) for row in archives[history_archives[0]]],
+            [('history', deleted_id, '+'), ('history', deleted_id, '-')]
+        )
+
+    def test_failed_save_deletes_nothing(self):
+        with mock.patch.object(self.storage, 'save', side_effect=OSError):
+            with self.assertRaises(OSError):
+                archive_sanctions_check_failures(self.created_before, self.storage)
+
+        self.assertEqual(SanctionsCheckFailure.objects.count(), 4)
+
+    def test_corrupted_archive_deletes_nothing(self):
+        def save_truncated(name, _content):
+            return FileSystemStorage.save(self.storage, name, io.BytesIO(gzip.compress(b'{}\n')))
+
+        with mock.patch.object(self.storage, 'save', side_effect=save_truncated):
+            with self.assertRaisesRegex(OSError, 'not deleting them'):
+                archive_sanctions_check_failures(self.created_before, self.storage)
+
+        self.assertEqual(SanctionsCheckFailure.objects.count(), 4)
+
+    def test_dry_run(self):
+        self.assertEqual(archive_sanctions_check_failures(self.created_before, self.storage, dry_run=True), 3)
+
+        self.assertEqual(SanctionsCheckFailure.objects.count(), 4)
+        self.assertEqual(self._read_archives(), {})
@@ -0,0 +1,89 @@
+"""
+Tests for the SDN fallback token filters.
+"""
+from django.test import TestCase
+
+from sanctions.apps.sanctions.tests.factories import SDNFallbackMetadataFactory
+from sanctions.apps.sanctions.token_filter import TokenFilter, get_filter_keys, get_token_filters, rules_out_hits
+
+
+class TokenFilterTests(TestCase):
+    """
+    Tests for TokenFilter.
+    """
+    def test_contains_its_keys(self):
+        keys = [f'US:n:name{index}' for index in range(1000)]
+        token_filter = TokenFilter.build(keys, false_positive_rate=0.01)
+        self.assertTrue(all(key in token_filter for key in keys))
+
+    def test_false_positive_rate(self):
+        token_filter = TokenFilter.build((f'US:n:name{index}' for index in range(10000)), false_positive_rate=0.01)
+        false_positives = sum(f'US:n:other{index}' in token_filter for index in range(10000))
+        self.assertLess(false_positives, 200)
+        # About 1.2 bytes per key for a 1% false positive rate
+        self.assertLess(len(token_filter.bits), 1.3 * 10000)
+
+    def test_empty_filter(self):
+        token_filter = TokenFilter.build([], false_positive_rate=0.01)
+        self.assertNotIn('US', token_filter)
+
+    def test_serialization(self):
+        token_filter = TokenFilter.build(['US', 'US:n:maria'], false_positive_rate=0.01)
+        loaded_filter = TokenFilter.from_bytes(memoryview(token_filter.to_bytes()))
+        self.assertEqual((loaded_filter.bit_count, loaded_filter.hash_count),
+                         (token_filter.bit_count, token_filter.hash_count))
+        self.assertIn('US:n:maria', loaded_filter)
+
+    def test_might_match(self):
+        token_filter = TokenFilter.build(
+            get_filter_keys('maria giuseppe', '123 main street boston', 'US IT'), false_positive_rate=0.001
+        )
+        self.assertTrue(token_filter.might_match({'giuseppe', 'maria'}, {'boston'}, 'IT'))
+        self.assertTrue(token_filter.might_match({'maria'}, '', 'US'))
+        self.assertFalse(token_filter.might_match({'maria', 'rossi'}, {'boston'}, 'US'))
+        self.assertFalse(token_filter.might_match({'maria'}, {'milan'}, 'US'))
+        self.assertFalse(token_filter.might_match({'maria'}, {'boston'}, 'CA'))
+
+
+class GetFilterKeysTests(TestCase):
+    """
+    Tests for get_filter_keys.
+    """
+    def test_pairs_countries_with_tokens(self):
+        self.assertEqual(
+            set(get_filter_keys('maria', 'boston us', 'US IT')),
+            {'US', 'US:n:maria', 'US:a:boston', 'US:a:us', 'IT', 'IT:n:maria', 'IT:a:boston', 'IT:a:us'}
+        )
+
+    def test_records_without_countries_have_no_keys(self):
+        self.assertEqual(list(get_filter_keys('maria', 'boston', '')), [])
+
+
+class RulesOutHitsTests(TestCase):
+    """
+    Tests for rules_out_hits.
+    """
+    def setUp(self):
+        super().setUp()
+        self.metadata = SDNFallbackMetadataFactory.create(import_state='Current')
+        self.metadata.token_filter = TokenFilter.build(
+            get_filter_keys('maria giuseppe', 'boston', 'US'), false_positive_rate=0.001
+        ).to_bytes()
+        self.metadata.save()
+
+    def test_rules_out_hits(self):
+        generation_ids = (self.metadata.id,)
+        self.assertTrue(rules_out_hits(generation_ids, {'jane'}, {'boston'}, 'US'))
+        self.assertFalse(rules_out_hits(generation_ids, {'maria'}, {'boston'}, 'US'))
+
+    def test_generation_without_filter(self):
+        """ Hits can't be ruled out in a generation imported before filters were built. """
+        other_metadata = SDNFallbackMetadataFactory.create(list_source='EU', import_state='Current')
+        generation_ids = (self.metadata.id, other_metadata.id)
+        self.assertFalse(rules_out_hits(generation_ids, {'jane'}, {'boston'}, 'US'))
+
+    def test_filters_are_cached(self):
+        generation_ids = (self.metadata.id,)
+        get_token_filters(generation_ids)
+        with self.assertNumQueries(0):
+            self.assertTrue(rules_out_hits(generation_ids, {'jane'}, {'boston'}, 'US'))
@@ -0,0 +1,380 @@
+"""
+Tests for Sanctions utils.
+"""
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from testfixtures import LogCapture
+
+from sanctions.apps.sanctions.list_sources import ConsolidatedScreeningListSource, EUConsolidatedListSource
+from sanctions.apps.sanctions.models import SanctionsCheckFailure, SDNFallbackData, SDNFallbackMetadata
+from sanctions.apps.sanctions.tests.factories import (
+    SanctionsCheckFailureFactory,
+    SDNFallbackDataFactory,
+    SDNFallbackMetadataFactory
+)
+from sanctions.apps.sanctions.utils import (
+    checkSDNFallback,
+    dry_run_sdn_fallback_import,
+    get_order_identifier,
+    get_sanctions_check_failure_fingerprint,
+    get_sdn_fallback_screened_sources,
+    get_sdn_fallback_sources,
+    iter_normalized_sdn_rows,
+    populate_sdn_fallback_data,
+    populate_sdn_fallback_data_and_metadata,
+    process_query_text,
+    process_text,
+    processed_text_cache,
+    record_sanctions_check_failure
+)
+
+SDN_SOURCE = 'Specially Designated Nationals (SDN) - Treasury Department'
+ISN_SOURCE = 'Nonproliferation Sanctions (ISN) - State Department'
+DPL_SOURCE = 'Denied Persons List (DPL) - Bureau of Industry and Security'
+
+
+class CheckSDNFallbackTestsMixin:
+    """
+    Tests for the checkSDNFallback function.
+    """
+    def setUp(self):
+        super().setUp()
+        self.sdn_metadata = SDNFallbackMetadataFactory.create(import_state='Current')
+
+    def _create_record(self, source, sdn_type, names='maria giuseppe', addresses='123 main street boston',
+                       countries='US'):
+        return SDNFallbackDataFactory.create(
+            sdn_fallback_metadata=self.sdn_metadata,
+            source=source,
+            sdn_type=sdn_type,
+            names=names,
+            addresses=addresses,
+            countries=countries,
+        )
+
+    def test_hit_on_sdn_individual(self):
+        self._create_record(SDN_SOURCE, 'Individual')
+        self.assertEqual(checkSDNFallback('Giuseppe, Maria', 'Boston', 'US'), 1)
+
+    def test_no_hit_on_different_country_or_city(self):
+        self._create_record(SDN_SOURCE, 'Individual')
+        self.assertEqual(checkSDNFallback('Maria Giuseppe', 'Boston', 'CA'), 0)
+        self.assertEqual(checkSDNFallback('Maria Giuseppe', 'Cambridge', 'US'), 0)
+
+    def test_hit_on_untyped_isn_record(self):
+        """ Records from configured lists that have no type are screened too. """
+        self._create_record(ISN_SOURCE, '')
+        self.assertEqual(checkSDNFallback('Maria Giuseppe', 'Boston', 'US'), 1)
+
+    def test_hits_across_configured_sources(self):
+        self._create_record(SDN_SOURCE, 'Individual')
+        self._create_record(ISN_SOURCE, '')
+        self.assertEqual(checkSDNFallback('Maria Giuseppe', 'Boston', 'US'), 2)
+
+    def test_unconfigured_sources_and_types_are_ignored(self):
+        self._create_record(DPL_SOURCE, '')
+        self._create_record(SDN_SOURCE, 'Entity')
+        self.assertEqual(checkSDNFallback('Maria Giuseppe', 'Boston', 'US'), 0)
+
+    @override_settings(SDN_CHECK_API_LIST='SDN')
+    def test_honors_configured_source_list(self):
+        self._create_record(ISN_SOURCE, '')
+        self.assertEqual(checkSDNFallback('Maria Giuseppe', 'Boston', 'US'), 0)
+
+    def test_ignores_records_from_other_generations(self):
+        SDNFallbackDataFactory.create(
+            sdn_fallback_metadata=SDNFallbackMetadataFactory.create(import_state='Discard'),
+            source=SDN_SOURCE,
+            sdn_type='Individual',
+            names='maria giuseppe',
+            addresses='boston',
+            countries='US',
+        )
+        self.assertEqual(checkSDNFallback('Maria Giuseppe', 'Boston', 'US'), 0)
+
+    @override_settings(SDN_FALLBACK_LIST_SOURCES=['CSL', 'EU'])
+    def test_hits_across_list_generations(self):
+        """ The current generations of all configured lists are screened. """
+        self._create_record(SDN_SOURCE, 'Individual')
+        SDNFallbackDataFactory.create(
+            sdn_fallback_metadata=SDNFallbackMetadataFactory.create(list_source='EU', import_state='Current'),
+            source=EUConsolidatedListSource.source,
+            sdn_type='Individual',
+            names='maria giuseppe',
+            addresses='boston',
+            countries='US',
+        )
+        self.assertEqual(checkSDNFallback('Maria Giuseppe', 'Boston', 'US'), 2)
+
+
+class CheckSDNFallbackTests(CheckSDNFallbackTestsMixin, TestCase):
+    """
+    Tests for the checkSDNFallback function, reading records from the record store.
+    """
+
+
+@override_settings(SDN_FALLBACK_RECORD_STORE_ENABLED=False)
+class CheckSDNFallbackDatabaseTests(CheckSDNFallbackTestsMixin, TestCase):
+    """
+    Tests for the checkSDNFallback function, reading records from the database instead of the record store.
+    """
+
+
+class ProcessQueryTextTests(TestCase):
+    """
+    Tests for the process_query_text function.
+    """
+    def test_processes_text_once(self):
+        with mock.patch('sanctions.apps.sanctions.utils.process_text', wraps=process_text) as mock_process_text:
+            self.assertEqual(process_query_text('María GIUSEPPE'), frozenset({'maria', 'giuseppe'}))
+            self.assertEqual(process_query_text('María GIUSEPPE'), frozenset({'maria', 'giuseppe'}))
+            self.assertEqual(process_query_text(''), frozenset())
+        self.assertEqual(mock_process_text.call_count, 2)
+        self.assertEqual(processed_text_cache.stats['hits'], 1)
+        self.assertEqual(processed_text_cache.stats['misses'], 2)
+
+    def test_cache_is_bounded(self):
+        with mock.patch.object(processed_text_cache, 'max_size', 2):
+            for text in ('Boston', 'Milan', 'Madrid'):
+                process_query_text(text)
+        self.assertEqual(processed_text_cache.stats['size'], 2)
+        self.assertEqual(processed_text_cache.stats['evictions'], 1)
+
+
+class GetSDNFallbackSourcesTests(TestCase):
+    """
+    Tests for the get_sdn_fallback_sources function.
+    """
+    LOGGER_NAME = 'sanctions.apps.sanctions.utils'
+
+    def test_maps_abbreviations(self):
+        self.assertEqual(get_sdn_fallback_sources('ISN,SDN'), [ISN_SOURCE, SDN_SOURCE])
+        self.assertEqual(get_sdn_fallback_sources(' sdn , '), [SDN_SOURCE])
+
+    def test_skips_unknown_abbreviations(self):
+        with LogCapture(self.LOGGER_NAME) as log:
+            self.assertEqual(get_sdn_fallback_sources('FOO,SDN'), [SDN_SOURCE])
+            log.check(
+                (
+                    self.LOGGER_NAME,
+                    'WARNING',
+                    'Sanctions SDNFallback: Unknown source [FOO] in SDN_CHECK_API_LIST, skipping it in the fallback.'
+                ),
+            )
+
+    @override_settings(SDN_CHECK_API_LIST='SDN', SDN_FALLBACK_LIST_SOURCES=['CSL', 'EU'])
+    def test_screened_sources_include_other_lists(self):
+        self.assertEqual(get_sdn_fallback_screened_sources(), [SDN_SOURCE, EUConsolidatedListSource.source])
+
+
+@override_settings(SDN_FALLBACK_IMPORT_CHUNK_SIZE=2)
+class PopulateSDNFallbackDataTests(TestCase):
+    """
+    Tests for the processing and import of the SDN csv rows.
+    """
+    LOGGER_NAME = 'sanctions.apps.sanctions.models'
+
+    SDN_CSV = (
+        'source,type,name,addresses,alt_names,ids\n'
+        f'"{SDN_SOURCE}",Individual,María GIUSEPPE,"123 Main St, Boston, US",Maria G.,"IT, 123"\n'
+        f'"{ISN_SOURCE}",,Mario Rossi,"Via Roma 1, Milan, IT",,\n'
+        f'"{SDN_SOURCE}",Entity,ACME Corp,"1 Harbour Road, Dubai, AE; 2 Bay St, Toronto, CA",ACME,\n'
+        f'"{DPL_SOURCE}",,Jane Doe,,,\n'
+        f'"{SDN_SOURCE}",Individual,Juan Pérez,"Calle 5, Madrid, ES",,"ES, 987; MX, 654"\n'
+    )
+
+    def _rows(self):
+        return ConsolidatedScreeningListSource().iter_rows(io.BytesIO(self.SDN_CSV.encode('utf-8')))
+
+    def _processed_rows(self, **kwargs):
+        # Tokens are joined from sets, compare them regardless of their order
+        return [
+            (source, sdn_type, set(names.split()), set(addresses.split()), set(countries.split()))
+            for source, sdn_type, names, addresses, countries in iter_normalized_sdn_rows(self._rows(), **kwargs)
+        ]
+
+    def test_processes_rows_in_order(self):
+        rows = self._processed_rows()
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(
+            rows[0],
+            (SDN_SOURCE, 'Individual', {'maria', 'giuseppe', 'g'}, {'123', 'main', 'st', 'boston', 'us'}, {'US', 'IT'})
+        )
+        self.assertEqual(rows[2][4], {'AE', 'CA'})
+        self.assertEqual(rows[3], (DPL_SOURCE, '', {'jane', 'doe'}, set(), set()))
+        self.assertEqual(rows[4][2], {'juan', 'perez'})
+
+    def test_worker_processes_preserve_order(self):
+        self.assertEqual(self._processed_rows(workers=2), self._processed_rows())
+
+    def test_inserts_records_in_chunks(self):
+        metadata = SDNFallbackMetadataFactory.create(import_state='New')
+        # One insert per chunk of 2 rows
+        with self.assertNumQueries(3):
+            populate_sdn_fallback_data(self._rows(), metadata)
+        self.assertEqual(
+            list(SDNFallbackData.objects.filter(sdn_fallback_metadata=metadata).order_by('id').values_list(
+                'source', flat=True
+            )),
+            [SDN_SOURCE, ISN_SOURCE, SDN_SOURCE, DPL_SOURCE, SDN_SOURCE]
+        )
+
+    def test_imports_lists_into_their_own_generations(self):
+        csl_metadata = populate_sdn_fallback_data_and_metadata(io.BytesIO(self.SDN_CSV.encode('utf-8')))
+        eu_metadata = populate_sdn_fallback_data_and_metadata(
+            io.BytesIO(self.SDN_CSV.encode('utf-8')), list_source=ConsolidatedScreeningListSource()
+        )
+        # Same list and checksum, nothing to import
+        self.assertIsNone(eu_metadata)
+
+        eu_xml = (
+            b'<export xmlns="http://eu.europa.ec/fpi/fsd/export"><sanctionEntity>'
+            b'<subjectType code="person"/><nameAlias wholeName="Maria Giuseppe"/>'
+            b'<address city="Boston" countryIso2Code="US"/></sanctionEntity></export>'
+        )
+        eu_metadata = populate_sdn_fallback_data_and_metadata(
+            io.BytesIO(eu_xml), list_source=EUConsolidatedListSource()
+        )
+        self.assertEqual((csl_metadata.list_source, eu_metadata.list_source), ('CSL', 'EU'))
+        self.assertEqual(
+            SDNFallbackMetadata.get_current_metadata_ids(), tuple(sorted([csl_metadata.id, eu_metadata.id]))
+        )
+        self.assertEqual(SDNFallbackData.objects.filter(sdn_fallback_metadata=csl_metadata).count(), 5)
+        self.assertEqual(SDNFallbackData.objects.filter(sdn_fallback_metadata=eu_metadata).count(), 1)
+
+    def test_failed_import_leaves_no_partial_generation(self):
+        def load(_records, metadata_entry):
+            SDNFallbackDataFactory.create(sdn_fallback_metadata=metadata_entry)
+            raise ValueError('Lost the database connection')
+
+        with mock.patch('sanctions.apps.sanctions.import_backends.ORMImportBackend.load', side_effect=load):
+            with self.assertRaises(ValueError):
+                populate_sdn_fallback_data_and_metadata(io.BytesIO(self.SDN_CSV.encode('utf-8')))
+
+        self.assertFalse(SDNFallbackMetadata.objects.exists())
+        self.assertFalse(SDNFallbackData.objects.exists())
+
+    def test_import_builds_token_filter(self):
+        metadata = populate_sdn_fallback_data_and_metadata(io.BytesIO(self.SDN_CSV.encode('utf-8')))
+        self.assertIsNotNone(SDNFallbackMetadata.objects.get(id=metadata.id).token_filter)
+
+        # Until the record store is loaded, checks ruled out by the filter don't load it
+        with mock.patch('sanctions.apps.sanctions.utils.get_current_record_store') as mock_get_record_store:
+            self.assertEqual(checkSDNFallback('Jane Smith', 'Boston', 'US'), 0)
+            self.assertEqual(checkSDNFallback('Maria Giuseppe', 'Boston', 'CA'), 0)
+        mock_get_record_store.assert_not_called()
+
+        # Once it is loaded, the store is read instead of the filter
+        self.assertEqual(checkSDNFallback('Maria Giuseppe', 'Boston', 'US'), 1)
+        with mock.patch('sanctions.apps.sanctions.utils.rules_out_hits') as mock_rules_out_hits, \
+                self.assertNumQueries(0):
+            self.assertEqual(checkSDNFallback('Jane Smith', 'Boston', 'US'), 0)
+        mock_rules_out_hits.assert_not_called()
+
+    def test_dry_run_doesnt_touch_the_database(self):
+        with self.assertNumQueries(0):
+            summary = dry_run_sdn_fallback_import(io.BytesIO(self.SDN_CSV.encode('utf-8')))
+        self.assertEqual(summary['row_count'], 5)
+        self.assertEqual(summary['rows_by_source_and_type'], {
+            (SDN_SOURCE, 'Individual'): 2, (SDN_SOURCE, 'Entity'): 1, (ISN_SOURCE, ''): 1, (DPL_SOURCE, ''): 1,
+        })
+        self.assertEqual(summary['rows_with_countries'], 4)
+        self.assertEqual(summary['rows_by_country'], {'US': 1, 'IT': 2, 'AE': 1, 'CA': 1, 'ES': 1, 'MX': 1})
+
+
+class RecordSanctionsCheckFailureTests(TestCase):
+    """
+    Tests for record_sanctions_check_failure.
+    """
+
+    def setUp(self):
+        super().setUp()
+        SDNFallbackMetadataFactory(import_state='Current')
+
+    def _record(self, full_name='Din Grogu', city='Jedi Temple', **fields):
+        return record_sanctions_check_failure(
+            42, full_name, city, 'SW', sanctions_type='ISN,SDN', metadata=fields.pop('metadata', {}), **fields
+        )
+
+    def test_not_deduplicated_by_default(self):
+        self._record()
+        self._record()
+
+        self.assertEqual(SanctionsCheckFailure.objects.count(), 2)
+        self.assertEqual(set(SanctionsCheckFailure.objects.values_list('fingerprint', flat=True)), {None})
+
+    @override_settings(SANCTIONS_CHECK_FAILURE_DEDUPLICATION_WINDOW=3600)
+    def test_repeated_hits_are_counted(self):
+        first = self._record(metadata={'order_identifer': 'EDX-1'})
+        # The lookup and update of the failure, in their savepoint
+        with self.assertNumQueries(4):
+            repeated = self._record(full_name='grogu, DIN', metadata={'order_identifer': 'EDX-2'})
+        self._record(metadata={'order_identifer': 'EDX-3'})
+
+        self.assertEqual(repeated.id, first.id)
+        self.assertEqual(repeated.repeated_order_identifiers, ['EDX-2'])
+        failure = SanctionsCheckFailure.objects.get()
+        self.assertEqual(failure.occurrence_count, 3)
+        self.assertGreater(failure.last_seen, first.last_seen)
+        self.assertEqual(failure.metadata, {'order_identifer': 'EDX-1'})
+        self.assertEqual(failure.repeated_order_identifiers, ['EDX-2', 'EDX-3'])
+        # Counting a hit doesn't add a history row
+        self.assertEqual(failure.history.count(), 1)
+
+    @override_settings(
+        SANCTIONS_CHECK_FAILURE_DEDUPLICATION_WINDOW=3600, SANCTIONS_CHECK_FAILURE_REPEATED_ORDER_IDENTIFIERS_MAX=2
+    )
+    def test_repeated_order_identifiers_are_capped(self):
+        for order_identifier in ('EDX-1', 'EDX-2', 'EDX-3', 'EDX-4'):
+            self._record(metadata={'order_identifer': order_identifier})
+
+        failure = SanctionsCheckFailure.objects.get()
+        self.assertEqual(failure.occurrence_count, 4)
+        self.assertEqual(failure.repeated_order_identifiers, ['EDX-3', 'EDX-4'])
+
+    def test_get_order_identifier(self):
+        self.assertEqual(get_order_identifier({'order_identifer': 'EDX-1'}), 'EDX-1')
+        self.assertEqual(get_order_identifier({'order_identifier': 'EDX-1'}), 'EDX-1')
+        self.assertIsNone(get_order_identifier({'purchase_type': 'program'}))
+        self.assertIsNone(get_order_identifier(None))
+
+    @override_settings(SANCTIONS_CHECK_FAILURE_DEDUPLICATION_WINDOW=3600)
+    def test_different_hits_are_recorded(self):
+        self._record()
+        self._record(city='Coruscant')
+        record_sanctions_check_failure(43, 'Din Grogu', 'Jedi Temple', 'SW', sanctions_type='ISN,SDN')
+        self._record(system_identifier='other-system')
+        self._record(username='other-user')
+        record_sanctions_check_failure(42, 'Din Grogu', 'Jedi Temple', 'SW', sanctions_type='SDN')
+
+        self.assertEqual(SanctionsCheckFailure.objects.count(), 6)
+
+    @override_settings(SANCTIONS_CHECK_FAILURE_DEDUPLICATION_WINDOW=3600)
+    def test_hits_after_window_are_recorded(self):
+        fingerprint = get_sanctions_check_failure_fingerprint(
+            42, 'Din Grogu', 'Jedi Temple', 'SW', sanctions_type='ISN,SDN'
+        )
+        SanctionsCheckFailureFactory(fingerprint=fingerprint, created=timezone.now() - timedelta(hours=2))
+
+        self._record()
+
+        self.assertEqual(list(SanctionsCheckFailure.objects.values_list('occurrence_count', flat=True)), [1, 1])
+
+    def test_fingerprint(self):
+        fingerprint = get_sanctions_check_failure_fingerprint(42, 'Din Grogu', 'Jedi Temple', 'SW')
+
+        self.assertEqual(len(fingerprint), 64)
+        self.assertEqual(get_sanctions_check_failure_fingerprint('42', 'Grogu  DÍN', 'jedi temple', 'sw'), fingerprint)
+        self.assertNotEqual(get_sanctions_check_failure_fingerprint(42, 'Din Grogu', 'Jedi Temple', 'US'), fingerprint)
+
+        # Hits are no longer identical once a new generation of the lists is activated
+        SDNFallbackMetadataFactory(import_state='New')
+        SDNFallbackMetadata.swap_all_states()
+        # Done on commit of the swap otherwise
+        SDNFallbackMetadata.invalidate_current_metadata_ids_cache()
+        self.assertNotEqual(get_sanctions_check_failure_fingerprint(42, 'Din Grogu', 'Jedi Temple', 'SW'), fingerprint)
@@ -0,0 +1,190 @@
+"""
+Bloom filters answering "definitely no hit" for most SDN fallback checks.
+
+Most checks are for people who are on none of the lists. When an import completes, a Bloom filter is built
+over the (country, name token) and (country, address token) pairs of the records of the new generation, and
+stored along with its SDNFallbackMetadata. A record can only match a check if each of the check's name and city
+tokens is paired with the check's country in that record, so if any of these pairs is missing from the filter
+of every current generation, the check has no hit, and neither the record store nor the database is consulted.
+
+A filter may report a pair that isn't in the generation (with a probability of
+SDN_FALLBACK_TOKEN_FILTER_FALSE_POSITIVE_RATE per pair), in which case the check simply goes on to the record
+store, but never misses a pair that is.
+"""
+import hashlib
+import logging
+import math
+import struct
+import threading
+
+from sanctions.apps.core.cache import ProcessCache
+from sanctions.apps.sanctions.models import SDNFallbackMetadata
+
+logger = logging.getLogger(__name__)
+
+# Number of bits and of hash functions of a serialized filter, followed by its bits
+HEADER = struct.Struct('<IB')
+
+
+class TokenFilter:
+    """
+    Bloom filter over the filter keys of the records of one SDN fallback generation.
+
+    Each key sets hash_count bits, at positions derived from one 64 bit BLAKE2b digest of the key through
+    double hashing.
+
+    Example:
+        >>> token_filter = TokenFilter.build(get_filter_keys('maria', 'boston', 'US'), false_positive_rate=0.01)
+        >>> token_filter.might_match({'maria'}, {'boston'}, 'US')
+        True
+    """
+
+    def __init__(self, bits, hash_count):
+        self.bits = bits
+        self.bit_count = len(bits) * 8
+        self.hash_count = hash_count
+
+    @classmethod
+    def build(cls, keys, false_positive_rate):
+        """
+        Build the smallest filter over the given (distinct) keys with the given false positive rate.
+        """
+        keys = list(keys)
+        key_count = max(len(keys), 1)
+        bit_count = max(math.ceil(-key_count * math.log(false_positive_rate) / math.log(2) ** 2), 8)
+        hash_count = max(round(bit_count / key_count * math.log(2)), 1)
+        token_filter = cls(bytearray((bit_count + 7) // 8), hash_count)
+        for key in keys:
+            for position in token_filter._get_positions(key):
+                token_filter.bits[position >> 3] |= 1 << (position & 7)
+        return token_filter
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Load a filter serialized by to_bytes.
+        """
+        _bit_count, hash_count = HEADER.unpack_from(data)
+        return cls(bytes(data[HEADER.size:]), hash_count)
+
+    def to_bytes(self):
+        """
+        Serialize the filter, to be stored in SDNFallbackMetadata.token_filter.
+        """
+        return HEADER.pack(self.bit_count, self.hash_count) + bytes(self.bits)
+
+    def __contains__(self, key):
+        bits, bit_count = self.bits, self.bit_count
+        position, step = self._get_hashes(key)
+        for _ in range(self.hash_count):
+            position %= bit_count
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+            position += step
+        return True
+
+    def might_match(self, name_tokens, city_tokens, country):
+        """
+        Return whether a record of the generation might match the check, i.e. whether all of its keys might be in
+        the generation.
+
+        Args:
+            name_tokens (set): processed name tokens, as returned by process_text
+            city_tokens (set): processed city tokens, as returned by process_text
+            country (str): alpha_2 country code
+        """
+        return all(key in self for key in get_check_keys(name_tokens, city_tokens, country))
+
+    def _get_positions(self, key):
+        """
+        Return the positions of the bits set by the key.
+        """
+        position, step = self._get_hashes(key)
+        return [(position + index * step) % self.bit_count for index in range(self.hash_count)]
+
+    @staticmethod
+    def _get_hashes(key):
+        """
+        Return the first position and the step of the key's positions, from one 64 bit digest of the key.
+        """
+        digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+        # The step is odd, so that the positions don't repeat before going through all the bits
+        return digest & 0xFFFFFFFF, (digest >> 32) | 1
+
+
+def get_filter_keys(names, addresses, countries):
+    """
+    Yield the filter keys of a record: each of its countries, alone and paired with each name and address token.
+
+    Args:
+        names (str): space separated processed name tokens
+        addresses (str): space separated processed address tokens
+        countries (str): space separated alpha_2 country codes
+    """
+    names, addresses = set(names.split()), set(addresses.split())
+    for country in set(countries.split()):
+        yield country
+        for token in names:
+            yield f'{country}:n:{token}'
+        for token in addresses:
+            yield f'{country}:a:{token}'
+
+
+def get_check_keys(name_tokens, city_tokens, country):
+    """
+    Yield the filter keys that the matching records of a check have, the most selective first.
+    """
+    if not (name_tokens or city_tokens):
+        # Otherwise implied by the country's token pairs
+        yield country
+    for token in name_tokens or ():
+        yield f'{country}:n:{token}'
+    for token in city_tokens or ():
+        yield f'{country}:a:{token}'
+
+
+# Only the filters of the current generations are kept, a new generation of any list replaces them
+token_filters_cache = ProcessCache('sdn_fallback_token_filters', timeout=24 * 60 * 60, max_size=1)
+token_filters_lock = threading.Lock()
+
+
+def get_token_filters(generation_ids):
+    """
+    Return this process' filters of the given generations, loading them if needed.
+
+    Generations imported before filters were built have no filter, and are left out along with their
+    records: the caller can't rule out a hit if the returned filters don't cover all the generations.
+    """
+    key = tuple(generation_ids)
+    cached_response = token_filters_cache.get_cached_response(key)
+    if cached_response.is_found:
+        return cached_response.value
+
+    with token_filters_lock:
+        # Another thread may have loaded the filters while we were waiting for the lock
+        cached_response = token_filters_cache.get_cached_response(key)
+        if cached_response.is_found:
+            return cached_response.value
+
+        token_filters = [
+            TokenFilter.from_bytes(token_filter)
+            for token_filter in SDNFallbackMetadata.objects.filter(
+                id__in=list(key), token_filter__isnull=False
+            ).values_list('token_filter', flat=True)
+        ]
+        logger.info(
+            "Sanctions SDNFallback: Loaded %d token filters for generations %s (%d bytes).",
+            len(token_filters), key, sum(len(token_filter.bits) for token_filter in token_filters)
+        )
+        token_filters_cache.set(key, token_filters)
+    return token_filters
+
+
+def rules_out_hits(generation_ids, name_tokens, city_tokens, country):
+    """
+    Return whether the token filters of the given generations show that the check has no hit in them.
+    """
+    token_filters = get_token_filters(generation_ids)
+    if len(token_filters) < len(generation_ids):
+        return False
+    return not any(token_filter.might_match(name_tokens, city_tokens, country) for token_filter in token_filters)
@@ -1,27 +1,54 @@
 """
 Helpers for the sanctions app.
 """
-import csv
 import hashlib
-import io
+import itertools
 import logging
+import multiprocessing
 import re
+import time
 import unicodedata
-from datetime import datetime, timezone
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+
+from sanctions.apps.core.cache import ProcessCache
+from sanctions.apps.core.profiling import StageProfiler
+from sanctions.apps.sanctions.constants import (
+    SDN_FALLBACK_DEFAULT_LIST_SOURCE,
+    SDN_FALLBACK_SOURCES_BY_ABBREVIATION,
+    SDN_FALLBACK_TYPES
+)
+from sanctions.apps.sanctions.country_codes import COUNTRY_INDEXES
+from sanctions.apps.sanctions.fallback_store import get_current_record_store, get_loaded_record_store
+from sanctions.apps.sanctions.import_backends import get_import_backend
+from sanctions.apps.sanctions.list_sources import ConsolidatedScreeningListSource, get_list_sources
+from sanctions.apps.sanctions.models import SanctionsCheckFailure, SDNFallbackData, SDNFallbackMetadata
+from sanctions.apps.sanctions.token_filter import TokenFilter, get_filter_keys, get_token_filters, rules_out_hits
 
-import pycountry
+logger = logging.getLogger(__name__)
 
-from sanctions.apps.sanctions.models import SDNFallbackData, SDNFallbackMetadata
+# Keys of the order identifier in the metadata of a sanctions hit, the one callers send first
+ORDER_IDENTIFIER_METADATA_KEYS = ('order_identifer', 'order_identifier')
 
-logger = logging.getLogger(__name__)
-COUNTRY_CODES = {country.alpha_2 for country in pycountry.countries}
+# Processed names and cities of fallback checks, which recur heavily across checks. Processing text is a pure
+# function of the text, so entries never go stale.
+processed_text_cache = ProcessCache(
+    'sdn_fallback_processed_text', timeout=24 * 60 * 60, max_size=settings.SDN_FALLBACK_PROCESSED_TEXT_CACHE_SIZE
+)
 
 
 def checkSDNFallback(name, city, country):
     """
     Performs an SDN check against the SDNFallbackData.
 
-    First, filter the SDNFallbackData records by source, type and country.
+    First, filter the SDNFallbackData records by the sources configured in SDN_CHECK_API_LIST
+    (along with the sources of the other screening lists in SDN_FALLBACK_LIST_SOURCES), by type and by country.
     Then, compare the provided name/city against each record and return whether we find a match.
     The check uses the following properties:
     1. Order of words doesn’t matter
@@ -29,13 +56,32 @@ def checkSDNFallback(name, city, country):
     3. Punctuation between words or at the beginning/end of a given word doesn’t matter
     4. If a subset of words match, it still counts as a match
     5. Capitalization doesn’t matter
+
+    When SDN_FALLBACK_RECORD_STORE_ENABLED is set, the records are read from this process'
+    SDNFallbackRecordStore instead of the database.
+
+    When SDN_FALLBACK_TOKEN_FILTER_ENABLED is set, checks that the token filters of the current generations
+    rule out are answered without reading the records. Once the record store is loaded, counting the hits
+    in the store is as cheap as probing the filters, so they are only probed until then.
     """
+    sources = get_sdn_fallback_screened_sources()
+    processed_name, processed_city = process_query_text(name), process_query_text(city)
+    record_store = None
+    if settings.SDN_FALLBACK_RECORD_STORE_ENABLED:
+        record_store = get_loaded_record_store(sources, SDN_FALLBACK_TYPES)
+    if record_store is None and settings.SDN_FALLBACK_TOKEN_FILTER_ENABLED and rules_out_hits(
+        SDNFallbackData.get_current_generation_ids(), processed_name, processed_city, country
+    ):
+        return 0
+
+    if settings.SDN_FALLBACK_RECORD_STORE_ENABLED:
+        if record_store is None:
+            record_store = get_current_record_store(sources, SDN_FALLBACK_TYPES)
+        return record_store.count_hits(processed_name, processed_city, country)
+
     hit_count = 0
-    records = SDNFallbackData.get_current_records_and_filter_by_source_and_type(
-        'Specially Designated Nationals (SDN) - Treasury Department', 'Individual'
-    )
+    records = SDNFallbackData.get_current_records_and_filter_by_sources_and_types(sources, SDN_FALLBACK_TYPES)
     records = records.filter(countries__contains=country)
-    processed_name, processed_city = process_text(name), process_text(city)
     for record in records:
         record_names, record_addresses = set(record.names.split()), set(record.addresses.split())
         if (processed_name.issubset(record_names) and processed_city.issubset(record_addresses)):
@@ -43,6 +89,196 @@ def checkSDNFallback(name, city, country):
     return hit_count
 
 
+def get_order_identifier(metadata):
+    """
+    Return the order identifier of the metadata of a sanctions hit, or None if it has none.
+
+    Callers send it as order_identifer (sic), the correctly spelled order_identifier is accepted too.
+    """
+    if not isinstance(metadata, dict):
+        return None
+    return next(
+        (metadata[key] for key in ORDER_IDENTIFIER_METADATA_KEYS if metadata.get(key) is not None), None
+    )
+
+
+def record_sanctions_check_failure(lms_user_id, full_name, city, country, **fields):
+    """
+    Record a sanctions hit, and return its SanctionsCheckFailure.
+
+    When SANCTIONS_CHECK_FAILURE_DEDUPLICATION_WINDOW is set, a hit with the same fingerprint (see
+    get_sanctions_check_failure_fingerprint) as a failure recorded less than that many seconds before is counted
+    on that failure, incrementing its occurrence_count, updating its last_seen and appending the order identifier
+    of its metadata to its repeated_order_identifiers (which keeps the last
+    SANCTIONS_CHECK_FAILURE_REPEATED_ORDER_IDENTIFIERS_MAX of them), instead of inserting a new failure and its
+    history row. Only the first hit's other fields (metadata, sanctions_response...) are kept.
+
+    Args:
+        lms_user_id, full_name, city, country: the checked user, name, city and country
+        fields: the other fields of the failure
+
+    Returns:
+        SanctionsCheckFailure: the recorded failure, or the one the hit was counted on
+    """
+    window = settings.SANCTIONS_CHECK_FAILURE_DEDUPLICATION_WINDOW
+    if not window:
+        return SanctionsCheckFailure.objects.create(
+            lms_user_id=lms_user_id, full_name=full_name, city=city, country=country, **fields
+        )
+
+    now = datetime.now(timezone.utc)
+    fingerprint = get_sanctions_check_failure_fingerprint(
+        lms_user_id, full_name, city, country, username=fields.get('username'),
+        sanctions_type=fields.get('sanctions_type'), system_identifier=fields.get('system_identifier'),
+    )
+    # Read from the writer, as a lagging replica would miss the failures just recorded
+    failures = SanctionsCheckFailure.objects.using('default')
+    with transaction.atomic(using='default'):
+        # Locked until the hit is counted, so that concurrent identical hits don't drop each other's order identifier
+        failure = failures.select_for_update().filter(
+            fingerprint=fingerprint, created__gte=now - timedelta(seconds=window)
+        ).order_by('-created').only('id', 'occurrence_count', 'repeated_order_identifiers').first()
+        if failure:
+            order_identifiers = failure.repeated_order_identifiers + [get_order_identifier(fields.get('metadata'))]
+            # Only the last ones are kept, so that the failures of frequently repeated hits don't grow unbounded
+            max_order_identifiers = settings.SANCTIONS_CHECK_FAILURE_REPEATED_ORDER_IDENTIFIERS_MAX
+            dropped_count = max(len(order_identifiers) - max_order_identifiers, 0)
+            failure.occurrence_count += 1
+            failure.last_seen = now
+            failure.repeated_order_identifiers = order_identifiers[dropped_count:]
+            # A plain UPDATE, which adds no history row
+            failures.filter(id=failure.id).update(
+                occurrence_count=F('occurrence_count') + 1, last_seen=now, modified=now,
+                repeated_order_identifiers=failure.repeated_order_identifiers,
+            )
+            return failure
+
+    return SanctionsCheckFailure.objects.create(
+        lms_user_id=lms_user_id,
+        full_name=full_name,
+        city=city,
+        country=country,
+        fingerprint=fingerprint,
+        last_seen=now,
+        **fields
+    )
+
+
+def get_sanctions_check_failure_fingerprint(
+    lms_user_id, full_name, city, country, username=None, sanctions_type=None, system_identifier=None
+):
+    """
+    Return the fingerprint of a sanctions hit, the digest of its user, normalized name and city and country, of the
+    system that made the check and the sanctions type it checked, and of the current screening list generations, so
+    that hits are no longer identical once the lists are updated.
+
+    Names and cities are normalized as for fallback checks (see process_text): case, accents, punctuation and
+    word order don't matter.
+    """
+    try:
+        generation_ids = SDNFallbackMetadata.get_current_metadata_ids()
+    except SDNFallbackMetadata.DoesNotExist:
+        generation_ids = ()
+    parts = (
+        str(lms_user_id),
+        username or '',
+        ' '.join(sorted(process_query_text(full_name))),
+        ' '.join(sorted(process_query_text(city))),
+        country.upper(),
+        sanctions_type or '',
+        system_identifier or '',
+        ','.join(str(generation_id) for generation_id in generation_ids),
+    )
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def get_sdn_fallback_sources(sdn_api_list):
+    """
+    Map a comma separated list of SDN API source abbreviations (e.g. 'ISN,SDN') to the
+    source names used in the consolidated screening list CSV.
+
+    Unknown abbreviations are logged and skipped.
+
+    Args:
+        sdn_api_list (str): comma separated source abbreviations, as in SDN_CHECK_API_LIST
+
+    Returns:
+        sources (list): full source names, in the order they were configured
+    """
+    sources = []
+    for abbreviation in filter(None, (item.strip().upper() for item in sdn_api_list.split(','))):
+        try:
+            sources.append(SDN_FALLBACK_SOURCES_BY_ABBREVIATION[abbreviation])
+        except KeyError:
+            logger.warning(
+                "Sanctions SDNFallback: Unknown source [%s] in SDN_CHECK_API_LIST, skipping it in the fallback.",
+                abbreviation
+            )
+    return sources
+
+
+def get_sdn_fallback_screened_sources():
+    """
+    Return the sources screened by the fallback: the consolidated screening list sources configured in
+    SDN_CHECK_API_LIST, and the sources of the other screening lists configured in SDN_FALLBACK_LIST_SOURCES.
+    """
+    sources = get_sdn_fallback_sources(settings.SDN_CHECK_API_LIST)
+    for list_source in get_list_sources():
+        sources.extend(source for source in list_source.screened_sources if source not in sources)
+    return sources
+
+
+def warm_sdn_fallback():
+    """
+    Load the current SDNFallback generations for this process, so that the first fallback checks
+    don't pay the cold-start cost.
+
+    When SDN_FALLBACK_RECORD_STORE_ENABLED is set, this loads the process' SDNFallbackRecordStore, which
+    happens only once per generation. Otherwise, this counts the screened records in the database. The token
+    filters of the generations are loaded too, when SDN_FALLBACK_TOKEN_FILTER_ENABLED is set.
+
+    Raises:
+        Exception: if the fallback data is not yet populated
+
+    Returns:
+        warm_state (dict): list, checksum, import timestamp and age (in seconds) of each warm generation, along
+        with the number of screened records, how long it took to load them (in seconds), and the statistics of
+        this process' cache of processed check text
+    """
+    sources = get_sdn_fallback_screened_sources()
+    if settings.SDN_FALLBACK_TOKEN_FILTER_ENABLED:
+        get_token_filters(SDNFallbackData.get_current_generation_ids())
+    if settings.SDN_FALLBACK_RECORD_STORE_ENABLED:
+        record_store = get_current_record_store(sources, SDN_FALLBACK_TYPES)
+        generation_ids, record_count = record_store.generation_ids, len(record_store)
+        load_time = record_store.load_time
+    else:
+        start = time.perf_counter()
+        generation_ids = SDNFallbackData.get_current_generation_ids()
+        record_count = SDNFallbackData.get_current_records_and_filter_by_sources_and_types(
+            sources, SDN_FALLBACK_TYPES
+        ).count()
+        load_time = time.perf_counter() - start
+
+    now = datetime.now(timezone.utc)
+    generations = []
+    generations_metadata = SDNFallbackMetadata.objects.filter(id__in=generation_ids).defer('token_filter')
+    for metadata in generations_metadata.order_by('list_source'):
+        imported_at = metadata.import_timestamp or metadata.download_timestamp
+        generations.append({
+            'list_source': metadata.list_source,
+            'file_checksum': metadata.file_checksum,
+            'import_timestamp': imported_at.isoformat(),
+            'age': (now - imported_at).total_seconds(),
+        })
+    return {
+        'generations': generations,
+        'record_count': record_count,
+        'load_time': load_time,
+        'processed_text_cache': processed_text_cache.stats,
+    }
+
+
 def transliterate_text(text):
     """
     Transliterate unicode characters into ASCII (such as accented characters into non-accented characters).
@@ -89,6 +325,25 @@ def process_text(text):
     return text
 
 
+def process_query_text(text):
+    """
+    Process the name or city of a fallback check, as process_text does, caching the result in this process.
+
+    Args:
+        text (str): name or city to be processed
+
+    Returns:
+        text (frozenset): processed text, shared by the checks of the same text so it can't be modified
+    """
+    cached_response = processed_text_cache.get_cached_response(text)
+    if cached_response.is_found:
+        return cached_response.value
+
+    processed_text = frozenset(process_text(text))
+    processed_text_cache.set(text, processed_text)
+    return processed_text
+
+
 def extract_country_information(addresses, ids):
     """
     Extract any country codes that are present, if any, in the addresses and ids fields
@@ -117,38 +372,56 @@ def extract_country_information(addresses, ids):
     # We filter out regex groups with no match, deduplicate countries, and convert them to a space separated string
     # with the following format 'IQ JO TR'
     country_codes = {' '.join(tuple(filter(None, x))) for x in country_matches}
-    valid_country_codes = COUNTRY_CODES.intersection(country_codes)
+    valid_country_codes = [country_code for country_code in country_codes if country_code in COUNTRY_INDEXES]
     formatted_countries = ' '.join(valid_country_codes)
     return formatted_countries
 
 
-def populate_sdn_fallback_metadata(sdn_csv_string):
+def populate_sdn_fallback_metadata(sdn_file, list_source=SDN_FALLBACK_DEFAULT_LIST_SOURCE):
     """
-    Insert a new SDNFallbackMetadata entry if the new csv differs from the current one
+    Insert a new SDNFallbackMetadata entry if the new file differs from the list's current one
 
     Args:
-        sdn_csv_string (bytes): Bytes of the sdn csv
+        sdn_file (file): binary file object of the downloaded list, rewound once its checksum is computed
+        list_source (str): name of the list source the file was downloaded from
 
     Returns:
         sdn_fallback_metadata_entry (SDNFallbackMetadata): Instance of the current SDNFallbackMetadata class
         or None if none exists
     """
-    file_checksum = hashlib.sha256(sdn_csv_string.encode('utf-8')).hexdigest()
-    metadata_entry = SDNFallbackMetadata.insert_new_sdn_fallback_metadata_entry(file_checksum)
+    file_checksum = get_file_checksum(sdn_file)
+    metadata_entry = SDNFallbackMetadata.insert_new_sdn_fallback_metadata_entry(file_checksum, list_source)
     return metadata_entry
 
 
-def populate_sdn_fallback_data(sdn_csv_string, metadata_entry):
+def get_file_checksum(sdn_file):
     """
-    Process CSV data and create SDNFallbackData records
+    Return the sha256 hex digest of a downloaded list, and rewind it
 
     Args:
-        sdn_csv_string (str): String of the sdn csv
-        metadata_entry (SDNFallbackMetadata): Instance of the current SDNFallbackMetadata class
+        sdn_file (file): binary file object of the downloaded list
+    """
+    file_hash = hashlib.sha256()
+    for block in iter(lambda: sdn_file.read(2 ** 20), b''):
+        file_hash.update(block)
+    sdn_file.seek(0)
+    return file_hash.hexdigest()
+
+
+def normalize_sdn_csv_rows(rows):
+    """
+    Process rows of the sdn csv (or rows of other lists shaped like them) into the fields stored in SDNFallbackData
+
+    Runs in the import worker processes, so it must not use the database.
+
+    Args:
+        rows (list): rows of the sdn csv, as dicts
+
+    Returns:
+        records (list): (source, sdn_type, names, addresses, countries) tuples, in the order of the rows
     """
-    sdn_csv_reader = csv.DictReader(io.StringIO(sdn_csv_string))
-    processed_records = []
-    for row in sdn_csv_reader:
+    records = []
+    for row in rows:
         sdn_source, sdn_type, names, addresses, alt_names, ids = (
             row['source'] or '', row['type'] or '', row['name'] or '',
             row['addresses'] or '', row['alt_names'] or '', row['ids'] or ''
@@ -156,32 +429,140 @@ def populate_sdn_fallback_data(sdn_csv_string, metadata_entry):
         processed_names = ' '.join(process_text(' '.join(filter(None, [names, alt_names]))))
         processed_addresses = ' '.join(process_text(addresses))
         countries = extract_country_information(addresses, ids)
-        processed_records.append(SDNFallbackData(
-            sdn_fallback_metadata=metadata_entry,
-            source=sdn_source,
-            sdn_type=sdn_type,
-            names=processed_names,
-            addresses=processed_addresses,
-            countries=countries
-        ))
-    # Bulk create should be more efficient for a few thousand records without needing to use SQL directly.
-    SDNFallbackData.objects.bulk_create(processed_records)
+        records.append((sdn_source, sdn_type, processed_names, processed_addresses, countries))
+    return records
 
 
-def populate_sdn_fallback_data_and_metadata(sdn_csv_string):
+def iter_normalized_sdn_rows(rows, workers=1, chunk_size=None):
+    """
+    Yield the processed rows of a list, in order
+
+    With more than one worker, chunks of rows are processed in a pool of worker processes. At most two chunks
+    per worker are in flight, so the processed rows are streamed rather than all held in memory.
+
+    Args:
+        rows (iterable): rows of the list, as yielded by ListSource.iter_rows
+        workers (int): number of worker processes, or 1 to process the rows in this process
+        chunk_size (int): number of rows per chunk, defaults to SDN_FALLBACK_IMPORT_CHUNK_SIZE
+
+    Yields:
+        record (tuple): (source, sdn_type, names, addresses, countries)
+    """
+    chunk_size = chunk_size or settings.SDN_FALLBACK_IMPORT_CHUNK_SIZE
+    rows = iter(rows)
+    chunks = iter(lambda: list(itertools.islice(rows, chunk_size)), [])
+    if workers <= 1:
+        for chunk in chunks:
+            yield from normalize_sdn_csv_rows(chunk)
+        return
+
+    # Workers are started from a fork server rather than forked from this process, so that they don't inherit
+    # its database connections (or the locks of other threads); they set up Django to import this module.
+    # Connections are closed beforehand all the same, the fork server itself being forked from this process.
+    connections.close_all()
+    mp_context = multiprocessing.get_context('forkserver')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=django.setup) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(normalize_sdn_csv_rows, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def populate_sdn_fallback_data(rows, metadata_entry, workers=1):
+    """
+    Process the rows of a list and create SDNFallbackData records
+
+    Along the way, builds the token filter of the records, and sets it on the metadata entry for the caller to save.
+
+    Args:
+        rows (iterable): rows of the list, as yielded by ListSource.iter_rows
+        metadata_entry (SDNFallbackMetadata): Instance of the current SDNFallbackMetadata class
+        workers (int): number of worker processes used to process the rows
+    """
+    filter_keys = set()
+
+    def collect_filter_keys(records):
+        for record in records:
+            _source, _sdn_type, names, addresses, countries = record
+            filter_keys.update(get_filter_keys(names, addresses, countries))
+            yield record
+
+    records = iter_normalized_sdn_rows(rows, workers=workers, chunk_size=settings.SDN_FALLBACK_IMPORT_CHUNK_SIZE)
+    get_import_backend().load(collect_filter_keys(records), metadata_entry)
+    metadata_entry.token_filter = TokenFilter.build(
+        filter_keys, settings.SDN_FALLBACK_TOKEN_FILTER_FALSE_POSITIVE_RATE
+    ).to_bytes()
+
+
+def populate_sdn_fallback_data_and_metadata(sdn_file, list_source=None, workers=1):
     """
     1. Create the SDNFallbackMetadata entry
-    2. Populate the SDNFallbackData from the csv
+    2. Populate the SDNFallbackData from the file
+    3. Activate the new generation
+
+    Only the activation runs in a transaction. Until then, the new generation is in the 'New' import_state,
+    which readers never use, so the data can be inserted without holding locks for the whole import.
 
     Args:
-        sdn_csv_string (str): String of the sdn csv
+        sdn_file (file): binary file object of the downloaded list
+        list_source (ListSource): list the file was downloaded from, the consolidated screening list by default
+        workers (int): number of worker processes used to process the rows of the list
     """
-    metadata_entry = populate_sdn_fallback_metadata(sdn_csv_string)
+    list_source = list_source or ConsolidatedScreeningListSource()
+    metadata_entry = populate_sdn_fallback_metadata(sdn_file, list_source.name)
     if metadata_entry:
-        populate_sdn_fallback_data(sdn_csv_string, metadata_entry)
+        try:
+            populate_sdn_fallback_data(list_source.iter_rows(sdn_file), metadata_entry, workers=workers)
+        except Exception:
+            # The data is not imported in a transaction, don't leave a partial generation behind
+            metadata_entry.delete()
+            raise
         # Once data is successfully imported, update the metadata import timestamp and state
         now = datetime.now(timezone.utc)
         metadata_entry.import_timestamp = now
         metadata_entry.save()
-        metadata_entry.swap_all_states()
+        metadata_entry.swap_all_states(metadata_entry.list_source)
     return metadata_entry
+
+
+def dry_run_sdn_fallback_import(sdn_file, list_source=None, workers=1, profiler=None):
+    """
+    Parse and normalize a downloaded list as populate_sdn_fallback_data_and_metadata would, without touching
+    the database
+
+    Args:
+        sdn_file (file): binary file object of the downloaded list
+        list_source (ListSource): list the file was downloaded from, the consolidated screening list by default
+        workers (int): number of worker processes used to process the rows of the list
+        profiler (StageProfiler): times the checksum, parse and normalize stages, if given
+
+    Returns:
+        summary (dict): file checksum, number of rows, rows per (source, sdn_type), number of rows with
+        countries, and rows per extracted country
+    """
+    list_source = list_source or ConsolidatedScreeningListSource()
+    profiler = profiler or StageProfiler()
+    with profiler.stage('checksum'):
+        file_checksum = get_file_checksum(sdn_file)
+
+    rows = profiler.timed('parse', list_source.iter_rows(sdn_file))
+    records = profiler.timed('normalize', iter_normalized_sdn_rows(rows, workers=workers))
+    row_count = rows_with_countries = 0
+    rows_by_source_and_type, rows_by_country = Counter(), Counter()
+    for sdn_source, sdn_type, _names, _addresses, countries in records:
+        row_count += 1
+        rows_by_source_and_type[(sdn_source, sdn_type)] += 1
+        countries = countries.split()
+        if countries:
+            rows_with_countries += 1
+            rows_by_country.update(countries)
+    return {
+        'file_checksum': file_checksum,
+        'row_count': row_count,
+        'rows_by_source_and_type': rows_by_source_and_type,
+        'rows_with_countries': rows_with_countries,
+        'rows_by_country': rows_by_country,
+    }
@@ -83,6 +83,22 @@ MIDDLEWARE = (
     'edx_rest_framework_extensions.auth.jwt.middleware.EnsureJWTAuthSettingsMiddleware',
 )
 
+# Requests to these paths are handled with API_MIDDLEWARE instead of MIDDLEWARE, see
+# sanctions/apps/core/handlers.py. The SDN check API is called machine to machine with JWTs in the Authorization
+# header, so it only needs the request cache, monitoring, common and JWT middleware. TieredCacheMiddleware is left
+# out too, as its force_cache_miss support reads the user of the session. The other API paths keep the full
+# MIDDLEWARE.
+API_FAST_LANE_PATH_PREFIXES = ('/api/v1/sdn-check/',)
+API_MIDDLEWARE = (
+    'edx_django_utils.cache.middleware.RequestCacheMiddleware',
+    'edx_django_utils.monitoring.DeploymentMonitoringMiddleware',
+    'edx_django_utils.monitoring.CachedCustomMonitoringMiddleware',
+    'edx_django_utils.monitoring.MonitoringMemoryMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'edx_rest_framework_extensions.middleware.RequestCustomAttributesMiddleware',
+    'edx_rest_framework_extensions.auth.jwt.middleware.EnsureJWTAuthSettingsMiddleware',
+)
+
 # Enable CORS
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_HEADERS = corsheaders_default_headers + (
@@ -98,12 +114,64 @@ WSGI_APPLICATION = 'sanctions.wsgi.application'
 # SDN Check
 SDN_CHECK_REQUEST_TIMEOUT = 5  # Value is in seconds.
 SDN_BACKUP_REQUEST_TIMEOUT = 15  # Value is in seconds.
+# Readiness probes warm up the connection to the SDN API with this (short) timeout, in seconds, and don't try again
+# for SDN_CHECK_WARM_UP_RETRY_INTERVAL seconds after a failure, so an SDN API outage doesn't slow the probes down.
+SDN_CHECK_WARM_UP_TIMEOUT = 1
+SDN_CHECK_WARM_UP_RETRY_INTERVAL = 10
 # Settings to download the government CSL
 CONSOLIDATED_SCREENING_LIST_URL = 'https://data.trade.gov/downloadable_consolidated_screening_list/v1/consolidated.csv'
+# Screening lists imported into the SDN fallback, see sanctions/apps/sanctions/list_sources.py.
+# OFAC (the SDN advanced XML) is an alternative to the SDN records of CSL, only one of them should be imported.
+SDN_FALLBACK_LIST_SOURCES = ['CSL']
+EU_CONSOLIDATED_LIST_URL = 'https://webgate.ec.europa.eu/fsd/fsf/public/files/xmlFullSanctionsList_1_1/content?token=replace-me'
+OFAC_SDN_ADVANCED_XML_URL = 'https://sanctionslistservice.ofac.treas.gov/api/PublicationPreview/exports/SDN_ADVANCED.XML'
 # Settings to check government purchase restriction lists
 SDN_CHECK_API_URL = 'https://data.trade.gov/consolidated_screening_list/v1/search'
 SDN_CHECK_API_KEY = 'replace-me'
 SDN_CHECK_API_LIST = 'ISN,SDN'
+# Number of sanctions check failures read at a time when streaming the report as JSON Lines, or an export
+SANCTIONS_CHECK_FAILURE_REPORT_STREAM_CHUNK_SIZE = 1000
+# Sanctions check failures older than this many days are moved, with their history, to gzip compressed JSON Lines
+# archives by the archive_sanctions_check_failures command, this many at a time, pausing this many seconds between
+# batches. Archives are saved to an instance of the SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE Django storage class
+# (e.g. 'storages.backends.s3boto3.S3Boto3Storage'), created with SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE_OPTIONS
+# (e.g. {'bucket_name': ..., 'location': ...}), or else to the local SANCTIONS_CHECK_FAILURE_ARCHIVE_DIR directory.
+SANCTIONS_CHECK_FAILURE_RETENTION_DAYS = 5 * 365
+SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE = None
+SANCTIONS_CHECK_FAILURE_ARCHIVE_STORAGE_OPTIONS = {}
+SANCTIONS_CHECK_FAILURE_ARCHIVE_DIR = None
+SANCTIONS_CHECK_FAILURE_ARCHIVE_BATCH_SIZE = 1000
+SANCTIONS_CHECK_FAILURE_ARCHIVE_PAUSE = 1
+# When over 0, a sanctions hit identical to one recorded less than this many seconds before (same user, name,
+# city, country and screening list generations) is counted on the failure of that hit instead of recording a new
+# failure. See record_sanctions_check_failure.
+SANCTIONS_CHECK_FAILURE_DEDUPLICATION_WINDOW = 0
+# How many order identifiers of the hits counted on a failure are kept, the last ones received. Every hit is
+# counted in its occurrence_count all the same.
+SANCTIONS_CHECK_FAILURE_REPEATED_ORDER_IDENTIFIERS_MAX = 100
+# How long (in seconds) the id of the current SDN fallback generation is cached in the shared Django cache
+# and in each process. Processes other than the importing one may use the previous generation for that long.
+# Well under the 15 minutes between imports, as the generation before the current one is deleted by the next swap.
+SDN_FALLBACK_CURRENT_METADATA_CACHE_TIMEOUT = 5 * 60
+SDN_FALLBACK_CURRENT_METADATA_PROCESS_CACHE_TIMEOUT = 60
+# Keep the screened records of the current SDN fallback generation in each process, instead of querying them.
+SDN_FALLBACK_RECORD_STORE_ENABLED = True
+# Answer the SDN fallback checks ruled out by the token filters of the current generations without reading their
+# records, see sanctions/apps/sanctions/token_filter.py. The false positive rate is per probed token.
+SDN_FALLBACK_TOKEN_FILTER_ENABLED = True
+SDN_FALLBACK_TOKEN_FILTER_FALSE_POSITIVE_RATE = 0.01
+# Number of processed names and cities of SDN fallback checks cached in each process, the least recently used
+# ones being evicted first.
+SDN_FALLBACK_PROCESSED_TEXT_CACHE_SIZE = 10000
+# Number of csv rows processed and inserted at a time when importing the SDN fallback data
+SDN_FALLBACK_IMPORT_CHUNK_SIZE = 1000
+# How the SDN fallback data is inserted, see sanctions/apps/sanctions/import_backends.py: 'orm' bulk creates
+# the records, 'bulk_load' loads them with the database's bulk loader (LOAD DATA LOCAL INFILE on MySQL, which
+# needs 'OPTIONS': {'local_infile': 1} in DATABASES).
+SDN_FALLBACK_IMPORT_BACKEND = 'orm'
+# How long (in seconds) an SDN fallback import may take. A list's 'New' generation older than this is considered
+# left over by an interrupted import, and is deleted by the next import of the list.
+SDN_FALLBACK_IMPORT_TIMEOUT = 30 * 60
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -119,6 +187,13 @@ DATABASES = {
     }
 }
 
+# Fallback and reporting reads go to a read replica, if one is configured in DATABASES under this alias,
+# as long as it has caught up with the current SDN fallback generation.
+SANCTIONS_READ_REPLICA_DATABASE = 'read_replica'
+# How long (in seconds) each process trusts the result of a read replica freshness check.
+SANCTIONS_READ_REPLICA_FRESHNESS_CACHE_TIMEOUT = 30
+DATABASE_ROUTERS = ['sanctions.apps.sanctions.db_routers.ReadReplicaRouter']
+
 # New DB primary keys default to an IntegerField.
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
@@ -225,6 +300,16 @@ SOCIAL_AUTH_EDX_OAUTH2_LOGOUT_URL = 'replace-me'
 BACKEND_SERVICE_EDX_OAUTH2_KEY = 'replace-me'
 BACKEND_SERVICE_EDX_OAUTH2_SECRET = 'replace-me'
 
+# How long (in seconds) each process caches the claims of the JWTs it verified, at most until they expire, and
+# how many tokens it caches, see sanctions/apps/api/authentication.py.
+JWT_CLAIMS_CACHE_TIMEOUT = 5 * 60
+JWT_CLAIMS_CACHE_SIZE = 1000
+# How long (in seconds) the users resolved from the claims of JWTs are cached in each process and in the shared
+# Django cache, and how many users each process caches. A process other than the one saving a user may use its
+# cached copy for that long.
+JWT_USER_CACHE_TIMEOUT = 60
+JWT_USER_CACHE_SIZE = 100
+
 JWT_AUTH = {
     'JWT_AUTH_HEADER_PREFIX': 'JWT',
     'JWT_ISSUER': 'http://127.0.0.1:8000/oauth2',
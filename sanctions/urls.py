@@ -25,7 +25,6 @@ from auth_backends.urls import oauth2_urlpatterns
 from django.conf import settings
 from django.contrib import admin
 from django.urls import include, re_path
-from rest_framework_swagger.views import get_swagger_view
 
 from sanctions.apps.api import urls as api_urls
 from sanctions.apps.core import views as core_views
@@ -35,10 +34,11 @@ admin.autodiscover()
 urlpatterns = oauth2_urlpatterns + [
     re_path(r'^admin/', admin.site.urls),
     re_path(r'^api/', include(api_urls)),
-    re_path(r'^api-docs/', get_swagger_view(title='sanctions API')),
+    re_path(r'^api-docs/', core_views.api_docs),
     re_path(r'^auto_auth/$', core_views.AutoAuth.as_view(), name='auto_auth'),
     re_path(r'', include('csrf.urls')),  # Include csrf urls from edx-drf-extensions
     re_path(r'^health/$', core_views.health, name='health'),
+    re_path(r'^health/ready/$', core_views.readiness, name='readiness'),
 ]
 
 if settings.DEBUG and os.environ.get('ENABLE_DJANGO_TOOLBAR', False):  # pragma: no cover
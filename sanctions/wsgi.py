@@ -14,6 +14,8 @@ from django.conf import settings
 from django.contrib.staticfiles.handlers import StaticFilesHandler
 from django.core.wsgi import get_wsgi_application
 
+from sanctions.apps.core.handlers import APIWSGIHandler, FastLaneDispatcher
+
 SITE_ROOT = dirname(dirname(abspath(__file__)))
 path.append(SITE_ROOT)
 
@@ -22,6 +24,8 @@ application = get_wsgi_application()  # pylint: disable=invalid-name
 # Allows the gunicorn app to serve static files in development environment.
 # Without this, css in django admin will not be served locally.
 if settings.DEBUG:
-    application = StaticFilesHandler(get_wsgi_application())
-else:
-    application = get_wsgi_application()
+    application = StaticFilesHandler(application)
+
+# API routes skip the middleware that only the browser-facing pages need
+if settings.API_FAST_LANE_PATH_PREFIXES:
+    application = FastLaneDispatcher(application, APIWSGIHandler(), settings.API_FAST_LANE_PATH_PREFIXES)